@@ -0,0 +1,166 @@
+# HTTP statuses of API responses that are worth retrying
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RateLimiter:
+    """
+    Spaces out the starts of requests made from one event loop so that at
+    most `rate` start per second. Requests wait for their slot without
+    holding a connection.
+    
+    Args:
+        rate (float, optional): Requests per second; unlimited when None
+    """
+    
+    def __init__(self, rate=None):
+        self.interval = 1 / rate if rate else 0
+        self._next_start = 0
+    
+    async def wait(self):
+        """
+        Wait until the next request may start.
+        """
+        if not self.interval:
+            return
+        import asyncio
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next_start)
+        self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class PooledApiClient:
+    """
+    Base of the HTTP API clients. Requests are sent over a pool of keep-alive
+    http.client connections, driven from an event loop through executor
+    threads, so up to `concurrency` requests are in flight while the event
+    loop schedules, rate limits and retries them.
+    
+    Subclasses call open() on their event loop before sending requests with
+    request() and close() when done.
+    
+    Args:
+        base_url (str): URL the request paths are relative to
+        headers (dict): Headers sent with every request
+        concurrency (int, optional): Number of requests in flight, and of
+            pooled connections
+        requests_per_second (float, optional): Limit on the rate requests
+            are started at
+        retries (int, optional): Number of retries of a request that fails
+            to connect or gets a status in HTTP_RETRY_STATUSES
+        backoff (float, optional): Seconds before the first retry, doubled
+            for every further one. A Retry-After header takes precedence.
+        timeout (float, optional): Socket timeout of a request in seconds
+    """
+    
+    # Name of the API in error messages
+    service = 'HTTP'
+    
+    def __init__(self, base_url, headers, concurrency=8, requests_per_second=None, retries=4, backoff=0.5,
+                 timeout=30):
+        from urllib.parse import urlsplit
+        url = urlsplit(base_url)
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise ValueError(f"{self.service} URL must start with http:// or https://, got '{base_url}'")
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be a positive integer, got {concurrency}")
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port
+        self.base_path = url.path.rstrip('/')
+        self.headers = headers
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.request_count = 0
+    
+    def _connect(self):
+        import http.client
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout)
+    
+    def _send(self, connection, method, target, body, headers):
+        """
+        Send a request on a pooled connection (in an executor thread).
+        """
+        connection.request(method, target, body=body, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        headers = {name.lower(): value for name, value in response.getheaders()}
+        return response.status, headers, body
+    
+    def open(self):
+        """
+        Create the connection pool and executor on the running event loop.
+        """
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        self._rate_limiter = RateLimiter(self.requests_per_second)
+        self._connections = asyncio.Queue()
+        for _ in range(self.concurrency):
+            self._connections.put_nowait(self._connect())
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+    
+    def close(self):
+        """
+        Wait for requests still running in the executor and close the pool.
+        """
+        self._executor.shutdown()
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+    
+    async def request(self, method, path, body=None, headers=None, **params):
+        """
+        Send a request, retrying connection errors and retryable statuses
+        with exponential backoff.
+        
+        Args:
+            method (str): HTTP method
+            path (str): Path relative to the base URL
+            body (bytes, optional): Request body
+            headers (dict, optional): Headers added to the shared ones
+            **params: Query string parameters
+        
+        Returns:
+            tuple: The response headers (lower-case names) and body
+        
+        Raises:
+            ValueError: If the response has a status that is not retried
+            ConnectionError: If every attempt failed
+        """
+        import asyncio
+        import http.client
+        from urllib.parse import urlencode
+        target = f"{self.base_path}{path}" + (f"?{urlencode(params)}" if params else '')
+        headers = dict(self.headers, **(headers or {}))
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            await self._rate_limiter.wait()
+            connection = await self._connections.get()
+            self.request_count += 1
+            try:
+                status, response_headers, response_body = await loop.run_in_executor(
+                    self._executor, self._send, connection, method, target, body, headers)
+            except (OSError, http.client.HTTPException) as e:
+                # The connection reconnects on its next request
+                connection.close()
+                status, response_headers, error = None, {}, str(e)
+            finally:
+                self._connections.put_nowait(connection)
+            
+            if status is not None and 200 <= status < 300:
+                return response_headers, response_body
+            if status is not None:
+                error = f"HTTP {status}: {response_body[:200].decode('utf-8', 'replace')}"
+                if status not in HTTP_RETRY_STATUSES:
+                    raise ValueError(f"{self.service} request {target} failed with {error}")
+            if attempt < self.retries:
+                try:
+                    delay = float(response_headers['retry-after'])
+                except (KeyError, ValueError):
+                    delay = self.backoff * 2 ** attempt
+                await asyncio.sleep(delay)
+        raise ConnectionError(f"{self.service} request {target} failed after {self.retries + 1} attempts: {error}")
@@ -0,0 +1,155 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Columns of a WooCommerce export as read by convert_woo_to_shopify, plus the
+# long-text description column real exports carry
+WOO_COLUMNS = [
+    'title', 'vendor', 'product_type', 'tags', 'Variant Price',
+    'additional_image_link', 'inventory_quantity', 'handle', 'description'
+]
+
+# Rows generated per block; each block has its own seed so the catalog does
+# not depend on how the caller chunks the output
+BLOCK_SIZE = 100000
+
+ADJECTIVES = ['Smart', 'Wireless', 'Portable', 'Pro', 'Ultra', 'Compact', 'Classic', 'Rugged', 'Mini', 'Premium']
+NOUNS = ['Speaker', 'Console', 'Controller', 'Lamp', 'Headphones', 'Tent', 'Camera', 'Thermostat', 'Keyboard', 'Backpack']
+VENDORS = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark Industries', 'Wayne Tech', 'Soylent']
+TYPE_KEYWORDS = ['Gaming', 'Smart Home', 'Music', 'Hi-Tech', 'Outdoor', 'Office', 'Kitchen', 'Garden', 'Toys', 'Fitness']
+TYPE_QUALIFIERS = ['', 'Accessories', 'Devices', 'Gear', 'Essentials', 'Bundles', 'Parts', 'Deals', 'Refurbished',
+                   'Kids', 'Pro', 'Travel', 'Home', 'Premium', 'Budget', 'Limited', 'Vintage', 'Eco', 'Digital',
+                   'Wearables', 'Sets', 'Spares', 'Classics', 'Imports', 'Outlet', 'Seasonal', 'Custom', 'Basics',
+                   'Plus', 'Max']
+TAGS = ['new', 'sale', 'bestseller', 'gift', 'eco', 'wireless', 'bundle', 'limited', 'clearance', 'premium']
+DESCRIPTION_SENTENCE = ('<p>This product is built to last and ships with everything you need to get started. '
+                        '<strong>Free returns</strong> within 30 days.</p>')
+# Prices a real export contains besides well-formed decimals
+BAD_PRICES = ['', 'not-a-number', '1,999.00', '€ 19,99', '24.99 USD', 'N/A']
+
+# Every combination of keyword and qualifier: a few hundred distinct product types
+PRODUCT_TYPES = [f"{keyword} {qualifier}".strip() for keyword in TYPE_KEYWORDS for qualifier in TYPE_QUALIFIERS]
+
+# Tag lists of zero to three tags, and descriptions from empty to a few KB of HTML
+TAG_LISTS = [''] + TAGS + [f"{a},{b}" for a in TAGS for b in TAGS if a < b] + [f"{a},{b},sale" for a in TAGS[:5] for b in TAGS[5:]]
+DESCRIPTIONS = [DESCRIPTION_SENTENCE * n for n in range(20)]
+
+
+def _choice(rng, values, size):
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), size)]
+
+
+def _generate_block(seed, block_index, rows, first_product_id):
+    """
+    Generate one block of rows. Products never straddle blocks.
+    
+    Returns:
+        tuple: (DataFrame, id of the next product)
+    """
+    rng = np.random.default_rng([seed, block_index])
+    
+    # 70% simple products, the rest variable products with 2-6 variant rows
+    sizes = np.where(rng.random(rows) < 0.7, 1, rng.integers(2, 7, rows))
+    sizes = sizes[:np.searchsorted(np.cumsum(sizes), rows) + 1]
+    sizes[-1] -= sizes.sum() - rows
+    product_ids = np.repeat(np.arange(first_product_id, first_product_id + len(sizes)), sizes)
+    is_parent = np.concatenate([[True], product_ids[1:] != product_ids[:-1]])
+    
+    products = len(sizes)
+    names = pd.Series(_choice(rng, ADJECTIVES, products)) + ' ' + pd.Series(_choice(rng, NOUNS, products))
+    ids = pd.Series(np.arange(first_product_id, first_product_id + products)).astype(str)
+    titles = (names + ' ' + ids).to_numpy(dtype=object)
+    handles = (names.str.lower().str.replace(' ', '-') + '-' + ids).to_numpy(dtype=object)
+    
+    prices = pd.Series(np.round(rng.uniform(0.5, 2000, rows), 2)).astype(str).to_numpy(dtype=object)
+    bad = rng.random(rows) < 0.02
+    prices[bad] = _choice(rng, BAD_PRICES, bad.sum())
+    
+    quantities = pd.Series(rng.integers(-5, 500, rows)).astype(str).to_numpy(dtype=object)
+    quantities[rng.random(rows) < 0.01] = ''
+    
+    tags = _choice(rng, TAG_LISTS, products)
+    descriptions = _choice(rng, DESCRIPTIONS, products)
+    
+    block = pd.DataFrame({
+        'title': titles[product_ids - first_product_id],
+        'vendor': _choice(rng, VENDORS, products)[product_ids - first_product_id],
+        'product_type': _choice(rng, PRODUCT_TYPES, products)[product_ids - first_product_id],
+        'tags': tags[product_ids - first_product_id],
+        'Variant Price': prices,
+        'additional_image_link': ('https://cdn.example.com/images/' + pd.Series(handles[product_ids - first_product_id])
+                                  + '.jpg').to_numpy(dtype=object),
+        'inventory_quantity': quantities,
+        'handle': handles[product_ids - first_product_id],
+        'description': descriptions[product_ids - first_product_id],
+    }, columns=WOO_COLUMNS)
+    
+    # Variant rows only carry their own price, stock and the parent handle
+    for column in ('title', 'vendor', 'product_type', 'tags', 'additional_image_link', 'description'):
+        block.loc[~is_parent, column] = ''
+    
+    return block, first_product_id + products
+
+
+def iter_catalog(rows, seed=0):
+    """
+    Yield a synthetic WooCommerce catalog in blocks of at most BLOCK_SIZE rows.
+    
+    The catalog is fully determined by rows and seed.
+    
+    Args:
+        rows (int): Total number of rows
+        seed (int): Random seed
+    
+    Yields:
+        DataFrame: Consecutive blocks of the catalog
+    """
+    next_product_id = 1
+    for block_index, start in enumerate(range(0, rows, BLOCK_SIZE)):
+        block, next_product_id = _generate_block(seed, block_index, min(BLOCK_SIZE, rows - start), next_product_id)
+        yield block
+
+
+def generate_catalog(rows, seed=0):
+    """
+    Generate a synthetic WooCommerce catalog as a single DataFrame.
+    """
+    blocks = list(iter_catalog(rows, seed))
+    if not blocks:
+        return pd.DataFrame(columns=WOO_COLUMNS)
+    return pd.concat(blocks, ignore_index=True)
+
+
+def write_catalog(path, rows, seed=0):
+    """
+    Write a synthetic WooCommerce catalog to a CSV file block by block, so
+    catalogs larger than memory can be generated.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        pd.DataFrame(columns=WOO_COLUMNS).to_csv(f, index=False)
+        for block in iter_catalog(rows, seed):
+            block.to_csv(f, index=False, header=False)
+
+
+def main():
+    """
+    Main function to handle command line arguments and generate a catalog.
+    """
+    parser = argparse.ArgumentParser(description='Generate a synthetic WooCommerce product CSV')
+    parser.add_argument('--rows', '-n', type=int, default=10000,
+                        help='Number of rows to generate (default: 10000)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed (default: 0)')
+    parser.add_argument('--output', '-o', default='benchmarks/data/woo_10000.csv',
+                        help='Path of the generated CSV (default: benchmarks/data/woo_10000.csv)')
+    
+    args = parser.parse_args()
+    write_catalog(args.output, args.rows, args.seed)
+    print(f"Wrote {args.rows} rows to '{args.output}'")
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
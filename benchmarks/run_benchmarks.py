@@ -0,0 +1,174 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Make the converter and the generator importable when run as a script
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCHMARK_DIR))
+sys.path.append(BENCHMARK_DIR)
+
+DEFAULT_SIZES = [10000, 100000, 1000000, 10000000]
+
+# A rows/sec drop larger than this fraction is reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of the current process in bytes.
+    """
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure_conversion(woo_csv_path, shopify_csv_path, chunk_size):
+    """
+    Convert a file in chunks and time every stage of the pipeline.
+    
+    Meant to run in a fresh process (see run_size) so that the peak RSS
+    belongs to this conversion only.
+    
+    Returns:
+        dict: Row count, total seconds, rows/sec, peak RSS and per-stage seconds
+    """
+    from woo_to_shopify import StageProfiler, convert_woo_to_shopify
+    
+    profiler = StageProfiler()
+    start = time.perf_counter()
+    rows = convert_woo_to_shopify(woo_csv_path, shopify_csv_path, chunk_size=chunk_size, profiler=profiler)
+    seconds = time.perf_counter() - start
+    
+    return {
+        'rows': rows,
+        'seconds': round(seconds, 4),
+        'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+        'peak_rss_mb': round(peak_rss_bytes() / 2 ** 20, 1),
+        'stages': {entry['stage']: round(entry['seconds'], 4) for entry in profiler.summary()},
+    }
+
+
+def run_size(rows, data_dir, seed, chunk_size):
+    """
+    Generate (or reuse) a catalog of the given size and measure its
+    conversion in a separate process.
+    """
+    from generate_catalog import write_catalog
+    
+    woo_csv_path = os.path.join(data_dir, f"woo_{rows}_seed{seed}.csv")
+    if not os.path.exists(woo_csv_path):
+        write_catalog(woo_csv_path, rows, seed)
+    shopify_csv_path = os.path.join(data_dir, f"shopify_{rows}_seed{seed}.csv")
+    
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--measure', woo_csv_path,
+         '--measure-output', shopify_csv_path, '--chunk-size', str(chunk_size)],
+        check=True, capture_output=True, text=True)
+    os.remove(shopify_csv_path)
+    
+    result = json.loads(completed.stdout)
+    result['input_mb'] = round(os.path.getsize(woo_csv_path) / 2 ** 20, 1)
+    return result
+
+
+def compare_results(baseline, current):
+    """
+    Compare two result files size by size.
+    
+    Returns:
+        list: (rows, baseline rows/sec, current rows/sec, relative change,
+        regressed) for every size present in both
+    """
+    baseline_by_rows = {result['rows']: result for result in baseline['results']}
+    comparison = []
+    for result in current['results']:
+        before = baseline_by_rows.get(result['rows'])
+        if before is None or not before['rows_per_sec']:
+            continue
+        change = result['rows_per_sec'] / before['rows_per_sec'] - 1
+        comparison.append((result['rows'], before['rows_per_sec'], result['rows_per_sec'], change,
+                           change < -REGRESSION_THRESHOLD))
+    return comparison
+
+
+def print_results(results):
+    print(f"{'Rows':>10}  {'Seconds':>8}  {'Rows/sec':>10}  {'Peak RSS MB':>11}  Stages (s)")
+    for result in results:
+        stages = ', '.join(f"{stage} {seconds:.2f}" for stage, seconds in result['stages'].items())
+        print(f"{result['rows']:>10}  {result['seconds']:>8.2f}  {result['rows_per_sec']:>10.0f}  "
+              f"{result['peak_rss_mb']:>11.1f}  {stages}")
+
+
+def main():
+    """
+    Main function to handle command line arguments and run the benchmarks.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the WooCommerce to Shopify converter')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Catalog sizes in rows (default: 10000 100000 1000000 10000000)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed of the generated catalogs (default: 0)')
+    parser.add_argument('--chunk-size', type=int, default=100000,
+                        help='Rows per chunk of the measured conversion (default: 100000)')
+    parser.add_argument('--data-dir', default=os.path.join(BENCHMARK_DIR, 'data'),
+                        help='Directory for generated catalogs, reused between runs (default: benchmarks/data)')
+    parser.add_argument('--output', '-o', default=None,
+                        help='Path of the JSON results (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--label', default=None,
+                        help='Label stored with the results, e.g. a version or commit')
+    parser.add_argument('--compare', default=None,
+                        help='Baseline results JSON to compare against')
+    # Internal: measure a single conversion in this process and print JSON
+    parser.add_argument('--measure', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--measure-output', default=None, help=argparse.SUPPRESS)
+    
+    args = parser.parse_args()
+    
+    if args.measure:
+        print(json.dumps(measure_conversion(args.measure, args.measure_output, args.chunk_size)))
+        return 0
+    
+    import pandas as pd
+    results = []
+    for rows in args.sizes:
+        print(f"Benchmarking {rows} rows...", flush=True)
+        results.append(run_size(rows, args.data_dir, args.seed, args.chunk_size))
+    print_results(results)
+    
+    report = {
+        'label': args.label,
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'chunk_size': args.chunk_size,
+        'results': results,
+    }
+    output = args.output or os.path.join(BENCHMARK_DIR, 'results',
+                                         f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to '{output}'")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressed = False
+        for rows, before, after, change, is_regression in compare_results(baseline, report):
+            flag = '  REGRESSION' if is_regression else ''
+            print(f"{rows:>10} rows: {before:>10.0f} -> {after:>10.0f} rows/sec ({change:+.1%}){flag}")
+            regressed = regressed or is_regression
+        return 1 if regressed else 0
+    
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
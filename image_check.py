@@ -0,0 +1,314 @@
+import csv
+import io
+import os
+import time
+
+from api_client import HTTP_RETRY_STATUSES
+from woo_to_shopify import _open_text_input, open_output, split_data_path
+
+
+# Resolver errors (names in the socket module) meaning a host name does not
+# exist; other lookup failures, e.g. EAI_AGAIN, are retried like connection errors
+DNS_NOT_FOUND_ERRORS = ('EAI_NONAME', 'EAI_NODATA')
+
+# Seconds a cached image URL check stays valid
+IMAGE_CACHE_TTL = 7 * 24 * 3600
+
+
+class ImageUrlValidator:
+    """
+    Checks image URLs concurrently, remembering the answers in an on-disk
+    cache so later runs only check new or expired URLs.
+    
+    Every URL gets a HEAD request (a GET when the server does not allow
+    HEAD), following redirects. Requests go over keep-alive connections
+    pooled per host, with at most `per_host` in flight to any one host and
+    `concurrency` overall, driven from an event loop through executor
+    threads. Connection errors, timeouts, 429 and 5xx are retried; a URL
+    that still fails this way is reported as unreachable and not cached, so
+    a host that is down for a moment does not mark its images dead.
+    
+    Args:
+        cache_path (str, optional): SQLite file of earlier results; nothing
+            is cached when None
+        ttl (float, optional): Seconds a cached result stays valid
+        concurrency (int, optional): Number of requests in flight
+        per_host (int, optional): Number of requests in flight per host
+        timeout (float, optional): Socket timeout of a request in seconds
+        retries (int, optional): Retries of a request that failed transiently
+        backoff (float, optional): Seconds before the first retry, doubled
+            for every further one
+        max_redirects (int, optional): Redirects followed per URL
+    """
+    
+    def __init__(self, cache_path=None, ttl=IMAGE_CACHE_TTL, concurrency=64, per_host=8, timeout=10, retries=2,
+                 backoff=0.5, max_redirects=5):
+        if concurrency < 1 or per_host < 1:
+            raise ValueError("concurrency and per_host must be positive integers")
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_redirects = max_redirects
+        self.request_count = 0
+        self.cached_count = 0
+    
+    def _open_cache(self):
+        import sqlite3
+        cache = sqlite3.connect(self.cache_path)
+        cache.execute("CREATE TABLE IF NOT EXISTS image_urls "
+                      "(url TEXT PRIMARY KEY, alive INTEGER NOT NULL, detail TEXT, checked_at REAL NOT NULL)")
+        return cache
+    
+    def _cached_results(self, cache, urls):
+        """
+        Results of the URLs that were checked less than `ttl` seconds ago.
+        """
+        results = {}
+        fresh_after = time.time() - self.ttl
+        # Stay below SQLite's limit on query parameters
+        for start in range(0, len(urls), 900):
+            batch = urls[start:start + 900]
+            placeholders = ','.join('?' * len(batch))
+            for url, alive, detail in cache.execute(
+                    f"SELECT url, alive, detail FROM image_urls WHERE checked_at >= ? AND url IN ({placeholders})",
+                    [fresh_after] + batch):
+                results[url] = (bool(alive), detail)
+        return results
+    
+    def _send(self, connection, method, target):
+        """
+        Send a request on a pooled connection (in an executor thread). The
+        body of a GET is not read; its connection is closed instead.
+        """
+        headers = {'User-Agent': 'woo-to-shopify image check', 'Accept': 'image/*'}
+        if method == 'GET':
+            headers['Range'] = 'bytes=0-0'
+        connection.request(method, target, headers=headers)
+        response = connection.getresponse()
+        if method == 'GET':
+            connection.close()
+        else:
+            response.read()
+        return response.status, response.getheader('Location')
+    
+    async def _request(self, url, method):
+        """
+        Send one request for a URL on its host's pool, retrying transient
+        failures.
+        
+        Returns:
+            tuple: The status (None when the URL could not be reached) and
+            the Location header, or an error message as the second item
+        """
+        import asyncio
+        import http.client
+        import socket
+        from urllib.parse import urlsplit
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        if key not in self._hosts:
+            connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+            connections = asyncio.Queue()
+            for _ in range(self.per_host):
+                connections.put_nowait(connection_class(parts.hostname, parts.port, timeout=self.timeout))
+            self._hosts[key] = connections
+        connections = self._hosts[key]
+        target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            connection = await connections.get()
+            self.request_count += 1
+            try:
+                status, location = await loop.run_in_executor(self._executor, self._send, connection, method,
+                                                              target)
+            except socket.gaierror as e:
+                connection.close()
+                if e.errno in {getattr(socket, name) for name in DNS_NOT_FOUND_ERRORS if hasattr(socket, name)}:
+                    return None, 'host not found'
+                status, location = None, f"DNS lookup failed: {e.strerror or e}"
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                status, location = None, str(e) or type(e).__name__
+            finally:
+                connections.put_nowait(connection)
+            if status is not None and status not in HTTP_RETRY_STATUSES:
+                return status, location
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        return None, f'HTTP {status}' if status is not None else location
+    
+    async def _check(self, url):
+        """
+        Whether a URL serves a resource (True), is gone for good (False) or
+        could not be checked (None), with a short explanation.
+        """
+        from urllib.parse import urljoin, urlsplit
+        for _ in range(self.max_redirects + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https') or not parts.hostname:
+                return False, 'not an http(s) URL'
+            status, location = await self._request(url, 'HEAD')
+            if status in (405, 501):
+                status, location = await self._request(url, 'GET')
+            if status is None:
+                return (False if location == 'host not found' else None), location
+            if 300 <= status < 400 and location:
+                url = urljoin(url, location)
+                continue
+            return 200 <= status < 300, f'HTTP {status}'
+        return False, 'too many redirects'
+    
+    async def _check_all(self, urls, results, cache):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        self._hosts = {}
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        pending_urls = iter(urls)
+        checked = []
+        
+        async def worker():
+            for url in pending_urls:
+                results[url] = await self._check(url)
+                if cache is not None and results[url][0] is not None:
+                    checked.append((url, int(results[url][0]), results[url][1], time.time()))
+                    if len(checked) >= 1000:
+                        self._store(cache, checked)
+        
+        try:
+            await asyncio.gather(*[worker() for _ in range(min(self.concurrency, len(urls)))])
+        finally:
+            if cache is not None:
+                self._store(cache, checked)
+            self._executor.shutdown()
+            for connections in self._hosts.values():
+                while not connections.empty():
+                    connections.get_nowait().close()
+    
+    def _store(self, cache, checked):
+        cache.executemany("INSERT OR REPLACE INTO image_urls VALUES (?, ?, ?, ?)", checked)
+        cache.commit()
+        checked.clear()
+    
+    def validate(self, urls):
+        """
+        Check image URLs, taking fresh results from the cache.
+        
+        Args:
+            urls (iterable): URLs to check; duplicates are checked once
+        
+        Returns:
+            dict: (alive, detail) of each URL, where alive is True, False
+            (dead) or None (unreachable)
+        """
+        import asyncio
+        urls = list(dict.fromkeys(urls))
+        cache = self._open_cache() if self.cache_path else None
+        try:
+            results = self._cached_results(cache, urls) if cache is not None else {}
+            self.cached_count = len(results)
+            unchecked = [url for url in urls if url not in results]
+            if unchecked:
+                asyncio.run(self._check_all(unchecked, results, cache))
+            return results
+        finally:
+            if cache is not None:
+                cache.close()
+
+
+def _is_image_row(row):
+    """
+    Whether a row of the Shopify CSV layout only adds an image to its product.
+    """
+    return not (row['Title'] or row['SKU'] or row['Price'] or row['Option1 value'])
+
+
+def validate_output_images(shopify_csv_paths, validator, drop_dead=False, report_path=None):
+    """
+    Check the Product image URL and Variant image URL of converted outputs.
+    
+    Args:
+        shopify_csv_paths (list): Converted CSV files (e.g. all shards)
+        validator (ImageUrlValidator): Checks the URLs
+        drop_dead (bool, optional): Rewrite the outputs without dead URLs:
+            image rows pointing at one are removed, other rows keep their
+            fields but lose the image, and the remaining images of each
+            product are numbered again. Unreachable URLs are kept.
+        report_path (str, optional): Write every dead or unreachable URL with
+            the reason, the first handle using it and its number of rows to
+            this CSV file
+    
+    Returns:
+        dict: Number of distinct URLs, of those answered from the cache, of
+        dead and unreachable ones, of rows changed, seconds and URLs per
+        second
+    """
+    start = time.perf_counter()
+    usage = {}
+    for path in shopify_csv_paths:
+        with _open_text_input(path) as f:
+            for row in csv.DictReader(f):
+                for column in ('Product image URL', 'Variant image URL'):
+                    url = row[column]
+                    if url:
+                        handle, count = usage.get(url, (row['URL handle'], 0))
+                        usage[url] = (handle, count + 1)
+    
+    results = validator.validate(usage)
+    dead = {url for url, (alive, _) in results.items() if alive is False}
+    unreachable = [url for url, (alive, _) in results.items() if alive is None]
+    
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, lineterminator=os.linesep)
+            writer.writerow(['url', 'status', 'detail', 'handle', 'rows'])
+            for url, (alive, detail) in results.items():
+                if alive is not True:
+                    writer.writerow([url, 'dead' if alive is False else 'unreachable', detail, *usage[url]])
+    
+    changed_rows = 0
+    if drop_dead and dead:
+        for path in shopify_csv_paths:
+            temp_path = f"{path}.tmp{split_data_path(path)[2]}"
+            with _open_text_input(path) as input_file, \
+                    io.TextIOWrapper(open_output(temp_path), encoding='utf-8', newline='') as output_file:
+                reader = csv.DictReader(input_file)
+                writer = csv.DictWriter(output_file, reader.fieldnames, lineterminator=os.linesep)
+                writer.writeheader()
+                # Next image position of each product, so the kept images stay numbered 1, 2, ...
+                positions = {}
+                for row in reader:
+                    product_image_dead = row['Product image URL'] in dead
+                    variant_image_dead = row['Variant image URL'] in dead
+                    changed = product_image_dead or variant_image_dead
+                    if product_image_dead:
+                        if _is_image_row(row):
+                            changed_rows += 1
+                            continue
+                        row['Product image URL'] = row['Image position'] = row['Image alt text'] = ''
+                    if variant_image_dead:
+                        row['Variant image URL'] = ''
+                    if row['Image position'] and row['URL handle']:
+                        position = str(positions.get(row['URL handle'], 1))
+                        positions[row['URL handle']] = int(position) + 1
+                        changed |= row['Image position'] != position
+                        row['Image position'] = position
+                    changed_rows += changed
+                    writer.writerow(row)
+            os.replace(temp_path, path)
+    
+    seconds = time.perf_counter() - start
+    return {
+        'urls': len(results),
+        'cached': validator.cached_count,
+        'dead': len(dead),
+        'unreachable': len(unreachable),
+        'changed_rows': changed_rows,
+        'requests': validator.request_count,
+        'seconds': seconds,
+        'urls_per_second': len(results) / seconds if seconds else 0.0,
+    }
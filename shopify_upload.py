@@ -0,0 +1,421 @@
+import json
+import os
+import tempfile
+import time
+
+from api_client import PooledApiClient
+from woo_to_shopify import iter_shopify_products
+
+
+# Version of the Shopify Admin GraphQL API products are uploaded with
+SHOPIFY_API_VERSION = '2025-01'
+
+# Creates or updates (by handle) a product with its options, variants and media
+SHOPIFY_PRODUCT_SET_MUTATION = """
+mutation productSet($identifier: ProductSetIdentifiers, $input: ProductSetInput!) {
+  productSet(identifier: $identifier, input: $input) {
+    product { id }
+    userErrors { field message }
+  }
+}
+"""
+
+# States in which a Shopify bulk operation no longer changes
+SHOPIFY_BULK_FINAL_STATES = ('COMPLETED', 'FAILED', 'CANCELED', 'EXPIRED')
+
+
+def shopify_product_input(rows, location_id=None):
+    """
+    ProductSetInput of the Shopify Admin GraphQL API for the rows of one
+    product in the Shopify CSV layout.
+    
+    The product fields come from the first row. Every row with a SKU, price
+    or option value is a variant; rows with only an image add to the
+    product's media. A product without option names gets Shopify's single
+    'Title' option.
+    
+    Args:
+        rows (list): Rows of the product, see iter_shopify_products
+        location_id (str, optional): Location GID whose available inventory
+            is set to each variant's quantity; inventory is not tracked
+            without one
+    
+    Returns:
+        dict: The mutation input
+    """
+    first = rows[0]
+    variant_rows = [row for row in rows if row is first or row['SKU'] or row['Price'] or row['Option1 value']]
+    option_names = [first[f'Option{number} name'] for number in (1, 2, 3) if first[f'Option{number} name']]
+    if option_names:
+        option_values = [[row[f'Option{number} value'] for number in range(1, len(option_names) + 1)]
+                         for row in variant_rows]
+    elif len(variant_rows) == 1:
+        option_names, option_values = ['Title'], [['Default Title']]
+    else:
+        option_names = ['Title']
+        option_values = [[f'Variant {position}'] for position in range(1, len(variant_rows) + 1)]
+    
+    # Images in position order; variant images must be product media too
+    images = sorted((row for row in rows if row['Product image URL']),
+                    key=lambda row: int(row['Image position'] or 0))
+    media = {row['Product image URL']: row['Image alt text'] for row in images}
+    for row in variant_rows:
+        if row['Variant image URL']:
+            media.setdefault(row['Variant image URL'], '')
+    
+    variants = []
+    for row, values in zip(variant_rows, option_values):
+        inventory_item = {
+            'sku': row['SKU'],
+            'tracked': location_id is not None,
+            'requiresShipping': row['Requires shipping'] != 'FALSE',
+        }
+        if row['Weight value (grams)']:
+            inventory_item['measurement'] = {'weight': {'value': float(row['Weight value (grams)']),
+                                                        'unit': 'GRAMS'}}
+        if row['Cost per item']:
+            inventory_item['cost'] = row['Cost per item']
+        variant = {
+            'optionValues': [{'optionName': name, 'name': value} for name, value in zip(option_names, values)],
+            'inventoryItem': inventory_item,
+            'inventoryPolicy': 'CONTINUE' if row['Continue selling when out of stock'].lower() == 'continue'
+                               else 'DENY',
+            'taxable': row['Charge tax'] != 'FALSE',
+        }
+        if row['Price']:
+            variant['price'] = row['Price']
+        if row['Compare-at price']:
+            variant['compareAtPrice'] = row['Compare-at price']
+        if row['Barcode']:
+            variant['barcode'] = row['Barcode']
+        if location_id is not None and row['Inventory quantity']:
+            variant['inventoryQuantities'] = [{'locationId': location_id, 'name': 'available',
+                                               'quantity': int(float(row['Inventory quantity']))}]
+        if row['Variant image URL']:
+            variant['file'] = {'originalSource': row['Variant image URL'], 'contentType': 'IMAGE'}
+        variants.append(variant)
+    
+    product_options = []
+    for position, name in enumerate(option_names, start=1):
+        values = dict.fromkeys(row_values[position - 1] for row_values in option_values)
+        product_options.append({'name': name, 'position': position, 'values': [{'name': value} for value in values]})
+    
+    product = {
+        'handle': first['URL handle'],
+        'title': first['Title'],
+        'descriptionHtml': first['Description'],
+        'vendor': first['Vendor'],
+        'productType': first['Type'],
+        'tags': [tag.strip() for tag in first['Tags'].split(',') if tag.strip()],
+        'status': first['Status'].upper() or 'ACTIVE',
+        'giftCard': first['Gift card'] == 'TRUE',
+        'productOptions': product_options,
+        'variants': variants,
+    }
+    if first['SEO title'] or first['SEO description']:
+        product['seo'] = {'title': first['SEO title'], 'description': first['SEO description']}
+    if media:
+        product['files'] = [{'originalSource': url, 'alt': alt, 'contentType': 'IMAGE'}
+                            for url, alt in media.items()]
+    return product
+
+
+class CostThrottle:
+    """
+    Client-side model of the leaky bucket Shopify meters GraphQL query cost
+    with, so concurrent requests wait for enough cost to be restored instead
+    of being throttled by the server.
+    
+    The bucket follows the throttle status of each response, minus the cost
+    of the requests still in flight.
+    
+    Args:
+        maximum (float, optional): Bucket size until a response reports it
+        restore_rate (float, optional): Cost restored per second until a
+            response reports it
+    """
+    
+    def __init__(self, maximum=1000, restore_rate=50):
+        self.maximum = maximum
+        self.restore_rate = restore_rate
+        self.available = maximum
+        self.in_flight = 0
+        self.waits = 0
+        self._updated = None
+    
+    def _restore(self, now):
+        if self._updated is not None:
+            self.available = min(self.maximum, self.available + (now - self._updated) * self.restore_rate)
+        self._updated = now
+    
+    async def acquire(self, cost):
+        """
+        Wait until the bucket holds `cost`, then take it.
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        cost = min(cost, self.maximum)
+        self._restore(loop.time())
+        while self.available < cost:
+            self.waits += 1
+            await asyncio.sleep((cost - self.available) / self.restore_rate)
+            self._restore(loop.time())
+        self.available -= cost
+        self.in_flight += cost
+        return cost
+    
+    def settle(self, cost, response_cost):
+        """
+        Settle a request that took `cost` against the `extensions.cost`
+        object of its response (None when there was no response).
+        """
+        import asyncio
+        self.in_flight -= cost
+        status = (response_cost or {}).get('throttleStatus')
+        if status:
+            self.maximum = status['maximumAvailable']
+            self.restore_rate = status['restoreRate']
+            self.available = status['currentlyAvailable'] - self.in_flight
+            self._updated = asyncio.get_running_loop().time()
+
+
+class ShopifyUploader(PooledApiClient):
+    """
+    Uploads converted products to a store through the Shopify Admin GraphQL
+    API, creating or updating them by handle.
+    
+    The products are first sent as one bulk operation: a JSONL file of
+    productSet inputs is staged and imported by Shopify in the background.
+    When the bulk operation cannot be started or fails, every product is
+    sent as its own productSet mutation instead, `concurrency` at a time,
+    paced by a CostThrottle.
+    
+    Args:
+        shop (str): Shop domain, e.g. my-store.myshopify.com, or its URL
+        access_token (str): Admin API access token with write_products
+        location_id (str, optional): Location GID to set inventory at (see
+            shopify_product_input)
+        api_version (str, optional): Admin API version
+        poll_interval (float, optional): Seconds between polls of the bulk
+            operation's status
+        **client_options: concurrency, requests_per_second, retries,
+            backoff and timeout of PooledApiClient
+    """
+    
+    service = 'Shopify API'
+    
+    def __init__(self, shop, access_token, location_id=None, api_version=SHOPIFY_API_VERSION, poll_interval=2,
+                 **client_options):
+        shop_url = shop if '://' in shop else f"https://{shop}"
+        headers = {'X-Shopify-Access-Token': access_token, 'Content-Type': 'application/json',
+                   'Accept': 'application/json'}
+        super().__init__(f"{shop_url.rstrip('/')}/admin/api/{api_version}", headers, **client_options)
+        self.location_id = location_id
+        self.poll_interval = poll_interval
+        self.throttle = CostThrottle()
+        # Expected cost of a productSet mutation, refined from responses
+        self._mutation_cost = 10
+    
+    async def graphql(self, query, variables=None, cost=10):
+        """
+        Run a GraphQL query, waiting for `cost` in the throttle first and
+        again whenever Shopify reports the request as throttled.
+        
+        Returns:
+            dict: The response
+        
+        Raises:
+            ValueError: If the response has errors other than throttling
+        """
+        payload = json.dumps({'query': query, 'variables': variables or {}}).encode()
+        while True:
+            taken = await self.throttle.acquire(cost)
+            try:
+                _, body = await self.request('POST', '/graphql.json', payload)
+            except BaseException:
+                self.throttle.settle(taken, None)
+                raise
+            response = json.loads(body)
+            response_cost = response.get('extensions', {}).get('cost')
+            self.throttle.settle(taken, response_cost)
+            errors = response.get('errors') or []
+            if any(error.get('extensions', {}).get('code') == 'THROTTLED' for error in errors):
+                # Wait for what the query really costs before trying again
+                cost = max(cost, (response_cost or {}).get('requestedQueryCost') or cost)
+                continue
+            if errors:
+                raise ValueError(f"{self.service} query failed: {errors[0].get('message')}")
+            return response
+    
+    def _post_staged_upload(self, target, jsonl_path):
+        """
+        POST the JSONL file to a staged upload target as multipart form data
+        (in an executor thread; the target is not on the API host).
+        """
+        import urllib.request
+        boundary = f"woo-to-shopify-{os.urandom(16).hex()}"
+        parts = []
+        for parameter in target['parameters']:
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{parameter["name"]}"\r\n\r\n'
+                         f'{parameter["value"]}\r\n'.encode())
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="products.jsonl"\r\n'
+                     f'Content-Type: text/jsonl\r\n\r\n'.encode())
+        with open(jsonl_path, 'rb') as f:
+            parts.append(f.read())
+        parts.append(f'\r\n--{boundary}--\r\n'.encode())
+        request = urllib.request.Request(target['url'], data=b''.join(parts), method='POST',
+                                         headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+    
+    def _download(self, url):
+        import urllib.request
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            return response.read()
+    
+    async def _upload_bulk(self, shopify_csv_path, report):
+        """
+        Upload every product in one bulk operation and wait for it to finish.
+        
+        Raises:
+            ValueError, OSError: If the operation could not be started or did
+            not complete
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        handles = []
+        with tempfile.TemporaryDirectory() as temp_dir:
+            jsonl_path = os.path.join(temp_dir, 'products.jsonl')
+            with open(jsonl_path, 'w', encoding='utf-8') as f:
+                for rows in iter_shopify_products(shopify_csv_path):
+                    product = shopify_product_input(rows, self.location_id)
+                    handles.append(product['handle'])
+                    f.write(json.dumps({'identifier': {'handle': product['handle']}, 'input': product}) + '\n')
+            
+            response = await self.graphql("""
+                mutation stagedUploadsCreate($input: [StagedUploadInput!]!) {
+                  stagedUploadsCreate(input: $input) {
+                    stagedTargets { url resourceUrl parameters { name value } }
+                    userErrors { field message }
+                  }
+                }""", {'input': [{'resource': 'BULK_MUTATION_VARIABLES', 'filename': 'products.jsonl',
+                                  'mimeType': 'text/jsonl', 'httpMethod': 'POST'}]})
+            staged = response['data']['stagedUploadsCreate']
+            if staged['userErrors']:
+                raise ValueError(f"Staging the bulk upload failed: {staged['userErrors'][0]['message']}")
+            target = staged['stagedTargets'][0]
+            await loop.run_in_executor(self._executor, self._post_staged_upload, target, jsonl_path)
+        
+        staged_path = next(parameter['value'] for parameter in target['parameters'] if parameter['name'] == 'key')
+        response = await self.graphql("""
+            mutation bulkOperationRunMutation($mutation: String!, $path: String!) {
+              bulkOperationRunMutation(mutation: $mutation, stagedUploadPath: $path) {
+                bulkOperation { id status }
+                userErrors { field message }
+              }
+            }""", {'mutation': SHOPIFY_PRODUCT_SET_MUTATION, 'path': staged_path})
+        run = response['data']['bulkOperationRunMutation']
+        if run['userErrors']:
+            raise ValueError(f"Starting the bulk operation failed: {run['userErrors'][0]['message']}")
+        
+        operation = run['bulkOperation']
+        while operation['status'] not in SHOPIFY_BULK_FINAL_STATES:
+            await asyncio.sleep(self.poll_interval)
+            response = await self.graphql("""
+                query bulkOperation($id: ID!) {
+                  node(id: $id) { ... on BulkOperation { id status errorCode objectCount url } }
+                }""", {'id': operation['id']}, cost=1)
+            operation = response['data']['node']
+        if operation['status'] != 'COMPLETED':
+            raise ValueError(f"Bulk operation {operation['id']} ended {operation['status']} "
+                             f"({operation.get('errorCode')})")
+        
+        # The result file has a line per input line, identified by its number
+        report['products'] = len(handles)
+        if operation.get('url'):
+            results = await loop.run_in_executor(self._executor, self._download, operation['url'])
+            for line in results.decode('utf-8').splitlines():
+                result = json.loads(line)
+                user_errors = ((result.get('data') or {}).get('productSet') or {}).get('userErrors') or []
+                for error in user_errors:
+                    report['errors'].append((handles[result['__lineNumber']], error['message']))
+    
+    async def _set_product(self, product, report):
+        response = await self.graphql(SHOPIFY_PRODUCT_SET_MUTATION,
+                                      {'identifier': {'handle': product['handle']}, 'input': product},
+                                      self._mutation_cost)
+        requested_cost = response.get('extensions', {}).get('cost', {}).get('requestedQueryCost')
+        if requested_cost:
+            self._mutation_cost = requested_cost
+        report['products'] += 1
+        for error in response['data']['productSet']['userErrors']:
+            report['errors'].append((product['handle'], error['message']))
+    
+    async def _upload_mutations(self, shopify_csv_path, report):
+        """
+        Upload the products with a productSet mutation each, keeping up to
+        `concurrency` mutations in flight.
+        """
+        import asyncio
+        pending = set()
+        try:
+            for rows in iter_shopify_products(shopify_csv_path):
+                if len(pending) >= self.concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                product = shopify_product_input(rows, self.location_id)
+                pending.add(asyncio.ensure_future(self._set_product(product, report)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def _upload(self, shopify_csv_path, mode):
+        self.open()
+        report = {'mode': mode, 'products': 0, 'errors': [], 'bulk_error': None}
+        try:
+            if mode != 'mutations':
+                try:
+                    await self._upload_bulk(shopify_csv_path, report)
+                    report['mode'] = 'bulk'
+                    return report
+                except (ValueError, OSError) as e:
+                    if mode == 'bulk':
+                        raise
+                    report.update(products=0, errors=[], bulk_error=str(e))
+            await self._upload_mutations(shopify_csv_path, report)
+            report['mode'] = 'mutations'
+            return report
+        finally:
+            self.close()
+    
+    def upload(self, shopify_csv_path, mode='auto'):
+        """
+        Upload the products of a converted Shopify CSV.
+        
+        Args:
+            shopify_csv_path (str): Output of convert_woo_to_shopify, best
+                written with group_variants
+            mode (str, optional): 'bulk' for a bulk operation only,
+                'mutations' for per-product mutations only, or 'auto' for a
+                bulk operation with mutations as fallback
+        
+        Returns:
+            dict: Report with the mode used, the number of products, their
+            (handle, message) errors, why the bulk operation was abandoned
+            (bulk_error), and the requests, seconds and products per second
+        """
+        import asyncio
+        if mode not in ('auto', 'bulk', 'mutations'):
+            raise ValueError(f"mode must be 'auto', 'bulk' or 'mutations', got '{mode}'")
+        start = time.perf_counter()
+        report = asyncio.run(self._upload(shopify_csv_path, mode))
+        report['requests'] = self.request_count
+        report['seconds'] = time.perf_counter() - start
+        report['products_per_second'] = report['products'] / report['seconds'] if report['seconds'] else 0.0
+        return report
@@ -0,0 +1,58 @@
+import unittest
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+# Add parent and benchmark directories to path to import the benchmark modules
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'benchmarks'))
+from generate_catalog import WOO_COLUMNS, generate_catalog, write_catalog
+from run_benchmarks import compare_results, measure_conversion
+
+
+class TestBenchmarks(unittest.TestCase):
+    
+    def test_catalog_is_deterministic(self):
+        """Test that the same seed always produces the same catalog"""
+        pd.testing.assert_frame_equal(generate_catalog(5000, seed=7), generate_catalog(5000, seed=7))
+        self.assertFalse(generate_catalog(5000, seed=7).equals(generate_catalog(5000, seed=8)))
+    
+    def test_catalog_shape(self):
+        """Test that the catalog has the expected columns, variants and messy values"""
+        catalog = generate_catalog(20000, seed=1)
+        
+        self.assertEqual(list(catalog.columns), WOO_COLUMNS)
+        self.assertEqual(len(catalog), 20000)
+        # Variable products repeat their handle on variant rows with an empty title
+        self.assertLess(catalog['handle'].nunique(), len(catalog))
+        self.assertTrue((catalog['title'] == '').any())
+        self.assertGreater(catalog['product_type'].nunique(), 100)
+        self.assertTrue(pd.to_numeric(catalog['Variant Price'], errors='coerce').isna().any())
+    
+    def test_measure_conversion(self):
+        """Test that a measured conversion reports throughput, memory and stage times"""
+        with tempfile.TemporaryDirectory() as data_dir:
+            woo_csv_path = os.path.join(data_dir, 'woo.csv')
+            write_catalog(woo_csv_path, 3000, seed=2)
+            result = measure_conversion(woo_csv_path, os.path.join(data_dir, 'shopify.csv'), chunk_size=1000)
+        
+        self.assertEqual(result['rows'], 3000)
+        self.assertGreater(result['rows_per_sec'], 0)
+        self.assertGreater(result['peak_rss_mb'], 0)
+        for stage in ('read', 'category', 'render', 'write'):
+            self.assertIn(stage, result['stages'])
+    
+    def test_compare_results_flags_regressions(self):
+        """Test that a throughput drop beyond the threshold is reported"""
+        baseline = {'results': [{'rows': 10, 'rows_per_sec': 100.0}, {'rows': 20, 'rows_per_sec': 100.0}]}
+        current = {'results': [{'rows': 10, 'rows_per_sec': 95.0}, {'rows': 20, 'rows_per_sec': 50.0}]}
+        
+        comparison = compare_results(baseline, current)
+        
+        self.assertEqual([row[4] for row in comparison], [False, True])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,12 +4,224 @@ import sys
 import pandas as pd
 import csv
 import tempfile
+import gzip
+import io
 import json
 import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
 # Add parent directory to path to import the main module
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from woo_to_shopify import convert_woo_to_shopify
+import woo_to_shopify
+from woo_to_shopify import convert_woo_to_shopify, convert_batch, convert_incremental, StageProfiler, SkuIndex, \
+    NumberParseReport, watch_directory, validate_woo_input, iter_shopify_chunks
+from woo_api import WooCommerceApi
+from shopify_upload import ShopifyUploader
+from image_check import ImageUrlValidator, validate_output_images
+
+
+class ApiStub(ThreadingHTTPServer):
+    """Local HTTP server standing in for a remote API, recording the requests and client connections it sees"""
+    
+    def __init__(self, handler_class):
+        self.requests = []
+        self.clients = set()
+        super().__init__(('127.0.0.1', 0), handler_class)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+    
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+    
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class ApiStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, *args):
+        pass
+    
+    def record(self):
+        self.server.requests.append(self.path)
+        self.server.clients.add(self.client_address)
+        return self.rfile.read(int(self.headers['Content-Length'] or 0))
+    
+    def send_json(self, status, body, headers=()):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class WooApiStub(ApiStub):
+    """WooCommerce REST API serving products and variations page by page"""
+    
+    def __init__(self, products, variations, failures=()):
+        self.products = products
+        self.variations = variations
+        # Paths answered with a 503 the first time they are requested
+        self.failures = set(failures)
+        super().__init__(WooApiStubHandler)
+
+
+class WooApiStubHandler(ApiStubHandler):
+    
+    def do_GET(self):
+        self.record()
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if self.headers['Authorization'] != 'Basic Y2tfdGVzdDpjc190ZXN0':
+            return self.send_json(401, {'code': 'woocommerce_rest_cannot_view'})
+        if self.path in self.server.failures:
+            self.server.failures.discard(self.path)
+            return self.send_json(503, {}, [('Retry-After', '0')])
+        
+        parts = url.path.split('/')
+        items = self.server.products if parts[-1] == 'products' else self.server.variations[int(parts[-2])]
+        page, per_page = int(query['page'][0]), int(query['per_page'][0])
+        total_pages = max(1, -(-len(items) // per_page))
+        self.send_json(200, items[(page - 1) * per_page:page * per_page], [('X-WP-TotalPages', str(total_pages))])
+
+
+class ShopifyApiStub(ApiStub):
+    """Shopify Admin GraphQL API that accepts bulk operations and productSet mutations"""
+    
+    def __init__(self, bulk_busy=False, throttled=0):
+        # Products received, by handle
+        self.products = {}
+        self.bulk_busy = bulk_busy
+        # Number of mutations answered as throttled before any is accepted
+        self.throttled = throttled
+        self.staged_upload = None
+        super().__init__(ShopifyApiStubHandler)
+
+
+class ShopifyApiStubHandler(ApiStubHandler):
+    
+    def send_graphql(self, data, errors=None, available=990):
+        cost = {'requestedQueryCost': 10, 'throttleStatus': {'maximumAvailable': 1000,
+                                                              'currentlyAvailable': available, 'restoreRate': 1000}}
+        body = {'data': data, 'extensions': {'cost': cost}}
+        if errors:
+            body['errors'] = errors
+        self.send_json(200, body)
+    
+    def do_GET(self):
+        self.record()
+        # Results of the bulk operation, with a user error for the first product
+        lines = [{'data': {'productSet': {'product': {'id': f'gid://shopify/Product/{number}'},
+                                          'userErrors': [{'message': 'Invalid image'}] if number == 0 else []}},
+                  '__lineNumber': number}
+                 for number in range(len(self.server.products))]
+        self.send_json(200, '\n'.join(json.dumps(line) for line in reversed(lines)).encode())
+    
+    def do_POST(self):
+        body = self.record()
+        server = self.server
+        if self.path == '/staged-uploads':
+            server.staged_upload = body
+            return self.send_json(201, b'')
+        if self.headers['X-Shopify-Access-Token'] != 'shpat_test':
+            return self.send_json(401, {'errors': '[API] Invalid API key or access token'})
+        
+        request = json.loads(body)
+        query, variables = request['query'], request['variables']
+        if 'stagedUploadsCreate' in query:
+            target = {'url': f'{server.url}/staged-uploads', 'resourceUrl': None,
+                      'parameters': [{'name': 'key', 'value': 'tmp/bulk/products.jsonl'},
+                                     {'name': 'policy', 'value': 'signed'}]}
+            self.send_graphql({'stagedUploadsCreate': {'stagedTargets': [target], 'userErrors': []}})
+        elif 'bulkOperationRunMutation' in query:
+            if server.bulk_busy:
+                error = {'field': None, 'message': 'A bulk mutation operation for this app and shop is already in progress'}
+                return self.send_graphql({'bulkOperationRunMutation': {'bulkOperation': None, 'userErrors': [error]}})
+            jsonl = server.staged_upload.split(b'Content-Type: text/jsonl\r\n\r\n')[1].rsplit(b'\r\n--', 1)[0]
+            for line in jsonl.decode().splitlines():
+                product = json.loads(line)
+                server.products[product['identifier']['handle']] = product['input']
+            operation = {'id': 'gid://shopify/BulkOperation/1', 'status': 'CREATED'}
+            self.send_graphql({'bulkOperationRunMutation': {'bulkOperation': operation, 'userErrors': []}})
+        elif 'BulkOperation' in query:
+            operation = {'id': variables['id'], 'status': 'COMPLETED', 'errorCode': None,
+                         'objectCount': str(len(server.products)), 'url': f'{server.url}/results.jsonl'}
+            self.send_graphql({'node': operation})
+        elif 'productSet' in query:
+            if server.throttled > 0:
+                server.throttled -= 1
+                return self.send_graphql(None, [{'message': 'Throttled', 'extensions': {'code': 'THROTTLED'}}],
+                                         available=0)
+            server.products[variables['identifier']['handle']] = variables['input']
+            self.send_graphql({'productSet': {'product': {'id': 'gid://shopify/Product/1'}, 'userErrors': []}})
+
+
+class ImageHostStub(ApiStub):
+    """Image host with live, missing, redirected, HEAD-less, flaky and failing images"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.failed_once = set()
+        super().__init__(ImageHostStubHandler)
+
+
+class ImageHostStubHandler(ApiStubHandler):
+    
+    def respond(self, status, headers=()):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(0.01)
+        with server.lock:
+            server.active -= 1
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+    
+    def do_HEAD(self):
+        self.record()
+        if self.path == '/ok.jpg':
+            return self.respond(200, [('Content-Type', 'image/jpeg')])
+        if self.path == '/moved.jpg':
+            return self.respond(301, [('Location', '/ok.jpg')])
+        if self.path == '/nohead.jpg':
+            return self.respond(405)
+        if self.path == '/flaky.jpg' and self.path in self.server.failed_once:
+            return self.respond(200)
+        if self.path in ('/flaky.jpg', '/down.jpg'):
+            self.server.failed_once.add(self.path)
+            return self.respond(503)
+        self.respond(404)
+    
+    def do_GET(self):
+        self.record()
+        self.respond(206 if self.path == '/nohead.jpg' else 404)
+
+
+def failing_watched_conversion(woo_path, shopify_path, convert_kwargs, convert=woo_to_shopify._convert_watched_file):
+    """Stands in for the conversion of a watched file, failing the way a full disk or a dying worker would"""
+    name = os.path.basename(woo_path)
+    if name.startswith('full_disk'):
+        raise OSError(28, 'No space left on device')
+    if name.startswith('crash'):
+        os._exit(1)
+    return convert(woo_path, shopify_path, convert_kwargs)
+
 
 class TestWooToShopify(unittest.TestCase):
     
@@ -165,6 +377,148 @@ class TestWooToShopify(unittest.TestCase):
         self.assertTrue(pd.isna(shopify_df.loc[3, 'Price']))
         self.assertEqual(shopify_df.loc[3, 'Inventory quantity'], 0)
         
+    def test_locale_number_parsing(self):
+        """Test that prices and quantities are parsed in the number format of the store's rules file"""
+        rules_file = os.path.join(self.test_dir, 'test_rules.json')
+        with open(woo_to_shopify.DEFAULT_RULES_PATH) as f:
+            rules = json.load(f)
+        rules['number_locale'] = 'de_DE'
+        with open(rules_file, 'w') as f:
+            json.dump(rules, f)
+        locale_file = os.path.join(self.test_dir, 'test_locale_woo.csv')
+        with open(locale_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(woo_to_shopify.WOO_INPUT_COLUMNS + ['Variant Compare At Price', 'Variant Cost'])
+            writer.writerow(['A', '', 'Gaming', '', '1.234,56', '', '1.200', 'a', '1.499,00 €', 'EUR 800'])
+            writer.writerow(['B', '', 'Music', '', '€ 19,99', '', '12 Stk.', 'b', '', '9,5'])
+            writer.writerow(['C', '', 'Music', '', '19.99', '', 'viele', 'c', '-', ''])
+        lite_output = os.path.join(self.test_dir, 'test_shopify_lite.csv')
+        
+        try:
+            reports = []
+            for output, engine in ((self.shopify_output_file, 'c'), (lite_output, 'lite')):
+                reports.append(NumberParseReport())
+                convert_woo_to_shopify(locale_file, output, rules_path=rules_file, engine=engine,
+                                       number_report=reports[-1])
+        finally:
+            os.remove(rules_file)
+            os.remove(locale_file)
+        
+        shopify_df = pd.read_csv(self.shopify_output_file)
+        self.assertEqual(shopify_df['Price'].tolist()[:2], [1234.56, 19.99])
+        self.assertEqual(shopify_df['Inventory quantity'].tolist(), [1200, 12, 0])
+        self.assertEqual(shopify_df.loc[0, 'Compare-at price'], 1499.0)
+        self.assertEqual(shopify_df['Cost per item'].tolist()[:2], [800.0, 9.5])
+        
+        # A point is a thousands separator here, so '19.99' is reported rather than misread
+        self.assertTrue(pd.isna(shopify_df.loc[2, 'Price']))
+        for report in reports:
+            summary = report.summary()
+            self.assertEqual(summary['failures'], 3)
+            self.assertEqual(summary['columns'], {'Variant Price': 1, 'inventory_quantity': 1,
+                                                  'Variant Compare At Price': 1})
+            self.assertIn(('Variant Price', 'c', '19.99'), summary['examples'])
+        with open(lite_output, 'rb') as f:
+            lite_bytes = f.read()
+        with open(self.shopify_output_file, 'rb') as f:
+            self.assertEqual(lite_bytes, f.read())
+        
+        with self.assertRaises(ValueError):
+            woo_to_shopify.number_format('xx')
+    
+    def test_html_descriptions_and_seo_descriptions(self):
+        """Test that descriptions are sanitized and SEO descriptions derived from their text"""
+        description_file = os.path.join(self.test_dir, 'test_description_woo.csv')
+        unsafe = ('<h1>Big</h1><p onclick="x()">Fast <b>console</b> [gallery ids="1,2"]</p>'
+                  '<script>alert(1)</script><a href="javascript:x()">bad</a> <a href="https://example.com">ok</a>'
+                  '<ul><li>one<li>two</ul><p></p><div>Unclosed <strong>tag')
+        long_text = 'word ' * 100
+        with open(description_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(woo_to_shopify.WOO_INPUT_COLUMNS + ['description'])
+            writer.writerow(['A', '', 'Gaming', '', '10', '', '1', 'a', unsafe])
+            writer.writerow(['B', '', 'Music', '', '10', '', '1', 'b', 'First line\nsecond line\n\nMore & more'])
+            writer.writerow(['C', '', 'Music', '', '10', '', '1', 'c', long_text])
+            writer.writerow(['D', '', 'Music', '', '10', '', '1', 'd', ''])
+            writer.writerow(['E', '', 'Music', '', '10', '', '1', 'e', unsafe])
+        lite_output = os.path.join(self.test_dir, 'test_shopify_lite.csv')
+        
+        try:
+            convert_woo_to_shopify(description_file, self.shopify_output_file, engine='c', chunk_size=2, workers=2)
+            convert_woo_to_shopify(description_file, lite_output, engine='lite')
+        finally:
+            os.remove(description_file)
+        
+        shopify_df = pd.read_csv(self.shopify_output_file, keep_default_na=False)
+        self.assertEqual(shopify_df.loc[0, 'Description'],
+                         '<h2>Big</h2><p>Fast <b>console</b></p><a>bad</a> <a href="https://example.com">ok</a>'
+                         '<ul><li>one</li><li>two</li></ul><div>Unclosed <strong>tag</strong></div>')
+        self.assertEqual(shopify_df.loc[0, 'SEO description'], 'Big Fast console bad ok one two Unclosed tag')
+        self.assertEqual(shopify_df.loc[1, 'Description'], '<p>First line<br>second line</p><p>More &amp; more</p>')
+        self.assertEqual(shopify_df.loc[1, 'SEO description'], 'First line second line More & more')
+        self.assertEqual(shopify_df.loc[4, 'Description'], shopify_df.loc[0, 'Description'])
+        
+        # Long descriptions are cut at a word; products without one keep the generic SEO description
+        seo_description = shopify_df.loc[2, 'SEO description']
+        self.assertLessEqual(len(seo_description), woo_to_shopify.SHOPIFY_SEO_DESCRIPTION_MAX_LENGTH)
+        self.assertTrue(seo_description.endswith('word…'))
+        self.assertEqual(shopify_df.loc[3, 'Description'], '')
+        self.assertTrue(shopify_df.loc[3, 'SEO description'].startswith('Shop D at our store.'))
+        
+        with open(lite_output, 'rb') as f:
+            lite_bytes = f.read()
+        with open(self.shopify_output_file, 'rb') as f:
+            self.assertEqual(lite_bytes, f.read())
+        
+        # The cache of converted descriptions is bounded by size, and very long descriptions are not kept
+        cache = woo_to_shopify._DescriptionCache(max_chars=2000, max_length=500)
+        for number in range(100):
+            description = f"<p>Product {number} {'x' * 40}</p>"
+            cache.put(description, woo_to_shopify.convert_description(description))
+        self.assertLessEqual(cache.chars, 2000)
+        self.assertIsNone(cache.get(f"<p>Product 0 {'x' * 40}</p>"))
+        self.assertIsNotNone(cache.get(f"<p>Product 99 {'x' * 40}</p>"))
+        cache.put(long_text * 2, woo_to_shopify.convert_description(long_text * 2))
+        self.assertIsNone(cache.get(long_text * 2))
+    
+    def test_validate_only_reports_problems_without_output(self):
+        """Test that validation streams the input and reports each kind of problem with its row"""
+        validate_file = os.path.join(self.test_dir, 'test_validate_woo.csv')
+        with open(validate_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(woo_to_shopify.WOO_INPUT_COLUMNS)
+            writer.writerow(['Shirt', '', 'Apparel', '', '10', '', '1', 'shirt'])
+            writer.writerow(['Shirt', '', 'Apparel', '', '12', '', '1', 'shirt'])
+            writer.writerow(['', '', 'Apparel', '', 'ten', '', '2', 'no-title'])
+            writer.writerow(['No Handle', '', 'Apparel', '', '5', '', 'some', ''])
+            writer.writerow(['T' * 300, '', 'Apparel', '', '5', '', '1', 'long'])
+            writer.writerow(['Shirt', '', 'Apparel', '', '14', '', '1', 'shirt'])
+        
+        report = validate_woo_input(validate_file, chunk_size=2)
+        self.assertEqual(report.rows, 6)
+        self.assertFalse(report.valid)
+        self.assertEqual(report.problems, {
+            'duplicate handle': 2, 'empty title': 1, 'unparseable Variant Price': 1, 'empty handle': 1,
+            'unparseable inventory_quantity': 1, 'long title': 1})
+        self.assertIn((2, 'duplicate handle', 'shirt'), report.examples)
+        self.assertIn((3, 'unparseable Variant Price', 'ten'), report.examples)
+        self.assertFalse(os.path.exists(self.shopify_output_file))
+        
+        # Rows sharing a handle are variants when grouped, unless the product reappears later
+        grouped = validate_woo_input(validate_file, chunk_size=2, group_variants=True)
+        self.assertEqual(grouped.problems['duplicate handle'], 1)
+        self.assertIn((6, 'duplicate handle', 'shirt'), grouped.examples)
+        
+        # Missing columns and a template the output does not follow are reported for the whole file
+        template_file = os.path.join(self.test_dir, 'test_template.csv')
+        with open(template_file, 'w') as f:
+            f.write(','.join(woo_to_shopify.SHOPIFY_COLUMNS[1:] + ['Extra']) + '\n')
+        with open(validate_file, 'w', newline='') as f:
+            csv.writer(f).writerows([['title', 'handle'], ['Shirt', 'shirt']])
+        report = validate_woo_input(validate_file, template_path=template_file)
+        self.assertEqual(report.problems, {'template column': 2, 'missing column': 6})
+        self.assertIn((None, 'missing column', 'Variant Price'), report.examples)
+    
     def test_product_type_mapping(self):
         # Test that product type mapping works correctly for weights and categories
         convert_woo_to_shopify(self.woo_test_file, self.shopify_output_file)
@@ -184,6 +538,34 @@ class TestWooToShopify(unittest.TestCase):
         self.assertEqual(shopify_df.loc[5, 'Product category'], 'Electronics > Video Game Consoles & Accessories')
         self.assertEqual(shopify_df.loc[6, 'Product category'], 'Electronics > Audio')
     
+    def test_custom_product_type_rules(self):
+        """Test that category and weight rules can be loaded from a config file"""
+        rules_file = os.path.join(self.test_dir, 'test_rules.json')
+        with open(rules_file, 'w') as f:
+            json.dump({
+                'category': {'default': 'Other', 'rules': [
+                    {'keywords': ['music', 'gaming'], 'value': 'Entertainment'},
+                ]},
+                'weight': {'default': 100, 'rules': [
+                    {'keywords': ['SMART'], 'value': 250},
+                    {'keywords': ['smart home'], 'value': 999},
+                ]},
+            }, f)
+        
+        try:
+            convert_woo_to_shopify(self.woo_test_file, self.shopify_output_file, rules_path=rules_file)
+        finally:
+            os.remove(rules_file)
+        
+        shopify_df = pd.read_csv(self.shopify_output_file)
+        
+        # Keywords are case-insensitive and the first matching rule wins
+        self.assertEqual(shopify_df.loc[4, 'Weight value (grams)'], 250)
+        self.assertEqual(shopify_df.loc[5, 'Weight value (grams)'], 100)
+        self.assertEqual(shopify_df.loc[5, 'Product category'], 'Entertainment')
+        self.assertEqual(shopify_df.loc[6, 'Product category'], 'Entertainment')
+        self.assertEqual(shopify_df.loc[0, 'Product category'], 'Other')
+    
     def test_generated_fields(self):
         # Test that SEO fields and SKUs are generated correctly
         convert_woo_to_shopify(self.woo_test_file, self.shopify_output_file)
@@ -199,6 +581,47 @@ class TestWooToShopify(unittest.TestCase):
         # Check SKU generation
         self.assertEqual(shopify_df.loc[0, 'SKU'], 'testproduc-sku')
     
+    def test_sku_collisions_are_resolved(self):
+        """Test that colliding generated SKUs get suffixes and avoid source SKUs, which are kept"""
+        collision_test_file = os.path.join(self.test_dir, 'test_collision_woo.csv')
+        header = ['title', 'vendor', 'product_type', 'tags', 'Variant Price', 'additional_image_link',
+                  'inventory_quantity', 'handle', 'variant_sku']
+        rows = [
+            ['Wireless Speaker Black', 'V', 'Music', '', '10', '', '1', 'wireless-speaker-black', ''],
+            ['Wireless Speaker White', 'V', 'Music', '', '10', '', '1', 'wireless-speaker-white', ''],
+            ['Wireless Speaker Red', 'V', 'Music', '', '10', '', '1', 'wireless-speaker-red', ''],
+            ['Own SKU', 'V', 'Music', '', '10', '', '1', 'own-sku', 'wirelesssp-sku-3'],
+            ['Own SKU Again', 'V', 'Music', '', '10', '', '1', 'own-sku-again', 'wirelesssp-sku-3'],
+            ['Wireless Speaker Blue', 'V', 'Music', '', '10', '', '1', 'wireless-speaker-blue', ''],
+        ]
+        with open(collision_test_file, 'w', newline='') as f:
+            csv.writer(f).writerows([header] + rows)
+        
+        sku_index = SkuIndex()
+        convert_woo_to_shopify(collision_test_file, self.shopify_output_file, sku_index=sku_index)
+        with open(self.shopify_output_file, 'rb') as f:
+            expected = f.read()
+        shopify_df = pd.read_csv(self.shopify_output_file, dtype=str)
+        
+        # The third generated SKU skips 'wirelesssp-sku-3', which a later row brings as its source SKU
+        self.assertEqual(list(shopify_df['SKU']), ['wirelesssp-sku', 'wirelesssp-sku-2', 'wirelesssp-sku-4',
+                                                   'wirelesssp-sku-3', 'wirelesssp-sku-3', 'wirelesssp-sku-5'])
+        self.assertEqual(sku_index.resolved, 3)
+        self.assertEqual(sku_index.duplicates, 1)
+        self.assertIn(('wirelesssp-sku', 'wirelesssp-sku-2'), sku_index.examples)
+        
+        # Resolution only depends on row order, not on how the input is split
+        for kwargs in ({'chunk_size': 1}, {'chunk_size': 4}, {'chunk_size': 1, 'workers': 2}, {'engine': 'lite'}):
+            convert_woo_to_shopify(collision_test_file, self.shopify_output_file, **kwargs)
+            with open(self.shopify_output_file, 'rb') as f:
+                self.assertEqual(f.read(), expected)
+        woo_df = pd.read_csv(collision_test_file, dtype=str)
+        with open(collision_test_file, 'rb') as woo_file:
+            for woo_input in (woo_df, woo_file):
+                output = io.BytesIO()
+                convert_woo_to_shopify(woo_input, output, chunk_size=2)
+                self.assertEqual(output.getvalue(), expected)
+    
     def test_complex_data_variants(self):
         """Test handling of product variants and more complex data structures"""
         # Create a more complex test file
@@ -237,6 +660,46 @@ class TestWooToShopify(unittest.TestCase):
         if os.path.exists(complex_output_file):
             os.remove(complex_output_file)
     
+    def test_grouped_variants_and_image_rows(self):
+        """Test that rows sharing a handle become one product with variant rows and image rows"""
+        complex_test_file = os.path.join(self.test_dir, 'test_complex_woo.csv')
+        grouped_data = [row[:] for row in self.extended_test_data]
+        grouped_data[1][5] = 'https://example.com/variant.jpg, https://example.com/variant-back.jpg'
+        grouped_data[4][5] = 'https://example.com/variant-blue.jpg'
+        with open(complex_test_file, 'w', newline='') as f:
+            csv.writer(f).writerows(grouped_data)
+        
+        result_df = convert_woo_to_shopify(complex_test_file, self.shopify_output_file, group_variants=True)
+        shopify_df = pd.read_csv(self.shopify_output_file, dtype=str, keep_default_na=False)
+        self.assertEqual(len(result_df), len(shopify_df))
+        
+        product = shopify_df[shopify_df['URL handle'] == 'variant-product'].reset_index(drop=True)
+        # Parent, four variants, then one image row per extra image
+        self.assertEqual(len(product), 7)
+        self.assertEqual(product.loc[0, 'Title'], 'Variant Product')
+        self.assertEqual(product.loc[0, 'Option1 name'], 'Size')
+        self.assertEqual(product.loc[0, 'Option2 name'], 'Color')
+        self.assertEqual(list(product['Option1 value'][:5]), ['Small', 'Medium', 'Large', 'Small', 'Medium'])
+        self.assertEqual(list(product['Price'][:5]), ['24.99', '24.99', '24.99', '29.99', '29.99'])
+        self.assertTrue((product.loc[1:, ['Title', 'Option1 name', 'Status', 'SEO title']] == '').all().all())
+        self.assertEqual(product.loc[3, 'Variant image URL'], 'https://example.com/variant-blue.jpg')
+        self.assertEqual(list(product['Product image URL']),
+                         ['https://example.com/variant.jpg', '', '', '', '',
+                          'https://example.com/variant-back.jpg', 'https://example.com/variant-blue.jpg'])
+        self.assertEqual(list(product['Image position']), ['1', '', '', '', '', '2', '3'])
+        self.assertTrue((product.loc[5:, ['SKU', 'Price', 'Inventory quantity']] == '').all().all())
+        
+        # Single-row products stay a single row
+        self.assertEqual((shopify_df['URL handle'] == 'free-product').sum(), 1)
+        
+        with open(self.shopify_output_file, 'rb') as f:
+            expected = f.read()
+        for chunk_size in (1, 2, 3):
+            convert_woo_to_shopify(complex_test_file, self.shopify_output_file, chunk_size=chunk_size,
+                                   group_variants=True)
+            with open(self.shopify_output_file, 'rb') as f:
+                self.assertEqual(f.read(), expected)
+    
     def test_long_text_fields(self):
         """Test handling of extremely long text fields"""
         # Create a test file with long text
@@ -291,6 +754,16 @@ class TestWooToShopify(unittest.TestCase):
                 val_str = str(val).upper()
                 self.assertTrue(val_str in ['TRUE', 'FALSE'], f"Value {val} in column {col} at row {idx} is not 'TRUE' or 'FALSE'")
     
+    def test_constant_columns_are_stored_compactly(self):
+        """Test that constant and empty columns are stored once rather than per row"""
+        shopify_df = convert_woo_to_shopify(self.woo_test_file, self.shopify_output_file)
+        
+        for column in ('Status', 'Fulfillment service', 'Barcode', 'Gift card', 'Google Shopping / Gender'):
+            self.assertIsInstance(shopify_df[column].dtype, pd.CategoricalDtype, column)
+        self.assertEqual(list(shopify_df['Status'].cat.categories), ['active'])
+        self.assertEqual(set(shopify_df['Gift card']), {'FALSE'})
+        self.assertEqual(set(shopify_df['Barcode']), {''})
+    
     def test_schema_validation(self):
         """Test that the output conforms to the Shopify product import schema"""
         # Skip this test if the template file wasn't found
@@ -379,6 +852,759 @@ class TestWooToShopify(unittest.TestCase):
         if os.path.exists(second_output_file):
             os.remove(second_output_file)
     
+    def test_chunked_conversion_matches_full_conversion(self):
+        """Test that streaming in chunks produces byte-identical output"""
+        complex_test_file = os.path.join(self.test_dir, 'test_complex_woo.csv')
+        chunked_output_file = os.path.join(self.test_dir, 'test_chunked_shopify.csv')
+        
+        with open(complex_test_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerows(self.extended_test_data)
+        
+        convert_woo_to_shopify(complex_test_file, self.shopify_output_file)
+        row_count = convert_woo_to_shopify(complex_test_file, chunked_output_file, chunk_size=3)
+        
+        self.assertEqual(row_count, len(self.extended_test_data) - 1)
+        with open(self.shopify_output_file, 'rb') as f:
+            full_bytes = f.read()
+        with open(chunked_output_file, 'rb') as f:
+            chunked_bytes = f.read()
+        self.assertEqual(full_bytes, chunked_bytes)
+    
+    def test_parallel_conversion_preserves_row_order(self):
+        """Test that converting chunks in worker processes keeps the input order"""
+        complex_test_file = os.path.join(self.test_dir, 'test_complex_woo.csv')
+        parallel_output_file = os.path.join(self.test_dir, 'test_parallel_shopify.csv')
+        
+        with open(complex_test_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerows(self.extended_test_data)
+        
+        convert_woo_to_shopify(complex_test_file, self.shopify_output_file)
+        row_count = convert_woo_to_shopify(complex_test_file, parallel_output_file, chunk_size=2, workers=2)
+        
+        self.assertEqual(row_count, len(self.extended_test_data) - 1)
+        with open(self.shopify_output_file, 'rb') as f:
+            full_bytes = f.read()
+        with open(parallel_output_file, 'rb') as f:
+            parallel_bytes = f.read()
+        self.assertEqual(full_bytes, parallel_bytes)
+    
+    def test_sharded_output_keeps_products_together(self):
+        """Test that sharded output respects the limits without splitting a product's rows"""
+        complex_test_file = os.path.join(self.test_dir, 'test_complex_woo.csv')
+        with open(complex_test_file, 'w', newline='') as f:
+            csv.writer(f).writerows(self.extended_test_data)
+        
+        full_df = convert_woo_to_shopify(complex_test_file, self.shopify_output_file)
+        
+        with tempfile.TemporaryDirectory() as shard_dir:
+            shard_base = os.path.join(shard_dir, 'shopify.csv')
+            row_count = convert_woo_to_shopify(complex_test_file, shard_base, chunk_size=2, max_shard_rows=3)
+            shard_files = sorted(os.listdir(shard_dir))
+            shards = [pd.read_csv(os.path.join(shard_dir, name)) for name in shard_files]
+        
+        self.assertEqual(row_count, len(full_df))
+        self.assertEqual(shard_files[0], 'shopify_001.csv')
+        # The five variant rows exceed the limit and get a shard of their own
+        self.assertEqual([len(shard) for shard in shards], [5, 3, 3])
+        self.assertEqual(set(shards[0]['URL handle']), {'variant-product'})
+        self.assertEqual(list(pd.concat(shards)['URL handle']), list(full_df['URL handle']))
+    
+    def test_chunked_conversion_of_header_only_file(self):
+        """Test that a chunked conversion of an empty export still writes the header"""
+        empty_file = os.path.join(self.test_dir, 'test_empty_woo.csv')
+        with open(empty_file, 'w', newline='') as f:
+            csv.writer(f).writerow(self.extended_test_data[0])
+        
+        row_count = convert_woo_to_shopify(empty_file, self.shopify_output_file, chunk_size=100)
+        
+        self.assertEqual(row_count, 0)
+        shopify_df = pd.read_csv(self.shopify_output_file)
+        self.assertEqual(len(shopify_df), 0)
+        self.assertIn('Title', shopify_df.columns)
+    
+    def test_in_memory_inputs_and_file_object_outputs(self):
+        """Test that DataFrames, file objects and chunk iterators convert like files, into any sink"""
+        convert_woo_to_shopify(self.woo_test_file, self.shopify_output_file, group_variants=True)
+        with open(self.shopify_output_file, 'rb') as f:
+            expected = f.read()
+        with open(self.woo_test_file, 'rb') as f:
+            woo_bytes = f.read()
+        woo_df = pd.read_csv(self.woo_test_file, dtype=str)
+        
+        inputs = [woo_df, io.BytesIO(woo_bytes), io.StringIO(woo_bytes.decode('utf-8')),
+                  iter([woo_df.iloc[:3], woo_df.iloc[3:]])]
+        for woo_input in inputs:
+            sink = io.BytesIO()
+            convert_woo_to_shopify(woo_input, sink, group_variants=True)
+            self.assertEqual(sink.getvalue(), expected)
+        
+        # Text sinks, chunked conversions and conversions that only return the row count
+        sink = io.StringIO()
+        rows = convert_woo_to_shopify(woo_df, sink, group_variants=True, return_frame=False)
+        self.assertEqual(sink.getvalue().encode('utf-8'), expected)
+        self.assertEqual(rows, len(pd.read_csv(self.shopify_output_file)))
+        sink = io.StringIO()
+        self.assertEqual(convert_woo_to_shopify(woo_df, sink, group_variants=True, chunk_size=2, workers=2), rows)
+        self.assertEqual(sink.getvalue().encode('utf-8'), expected)
+        shopify_df = convert_woo_to_shopify(woo_df, None)
+        self.assertEqual(list(shopify_df.columns), woo_to_shopify.SHOPIFY_COLUMNS)
+        
+        # Chunks can be consumed as DataFrames instead of being written
+        chunks = list(iter_shopify_chunks(woo_df, chunk_size=2, group_variants=True))
+        self.assertGreater(len(chunks), 1)
+        sink = io.StringIO()
+        pd.concat(chunks, ignore_index=True).to_csv(sink, index=False)
+        self.assertEqual(sink.getvalue().encode('utf-8'), expected)
+        
+        # A chunked DataFrame is turned into text one chunk at a time, never copied whole
+        with mock.patch.object(woo_to_shopify, '_woo_text_frame', wraps=woo_to_shopify._woo_text_frame) as text_frame:
+            list(iter_shopify_chunks(woo_df, chunk_size=2))
+        self.assertEqual([len(call.args[0]) for call in text_frame.call_args_list],
+                         [2] * (len(woo_df) // 2) + [1] * (len(woo_df) % 2))
+        
+        with self.assertRaises(ValueError):
+            convert_woo_to_shopify(woo_df, io.StringIO(), max_shard_rows=2)
+        with self.assertRaises(ValueError):
+            convert_woo_to_shopify(woo_df, self.shopify_output_file, engine='lite')
+    
+    def test_incremental_conversion_reuses_unchanged_rows(self):
+        """Test that the incremental mode only reconverts new or changed rows"""
+        complex_test_file = os.path.join(self.test_dir, 'test_complex_woo.csv')
+        incremental_output_file = os.path.join(self.test_dir, 'test_incremental_shopify.csv')
+        # Products without a SKU, whose generated SKUs depend on each other
+        generated_rows = [['Speaker ' + letter, 'Vendor', 'Music', '', '9.99', '', '1', 'wireless-speaker-' + letter,
+                           '', '', '', '', '', ''] for letter in 'abc']
+        
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache_path = os.path.join(cache_dir, 'rows.cache')
+            
+            # A cache file left by an older version is replaced
+            with open(cache_path, 'wb') as f:
+                f.write(b'not a cache')
+            with open(complex_test_file, 'w', newline='') as f:
+                csv.writer(f).writerows(self.extended_test_data + generated_rows)
+            rows, stats = convert_incremental(complex_test_file, incremental_output_file, cache_path)
+            self.assertEqual(rows, len(self.extended_test_data) + 2)
+            self.assertEqual(stats, {'reused': 0, 'converted': len(self.extended_test_data) + 2})
+            
+            # Change one variant row and add a new product
+            changed_data = [list(row) for row in self.extended_test_data + generated_rows]
+            changed_data[3][4] = '26.99'
+            changed_data.append(['New Product', 'New Vendor', 'Gaming', 'new', '5.00', '', '1', 'new-product',
+                                 '', 'NEW-001', '', '', '', ''])
+            with open(complex_test_file, 'w', newline='') as f:
+                csv.writer(f).writerows(changed_data)
+            _, stats = convert_incremental(complex_test_file, incremental_output_file, cache_path)
+            self.assertEqual(stats, {'reused': len(changed_data) - 3, 'converted': 2})
+            
+            # Deleting a product renumbers the generated SKUs after it, but the other rows stay cached
+            del changed_data[-4]
+            with open(complex_test_file, 'w', newline='') as f:
+                csv.writer(f).writerows(changed_data)
+            _, stats = convert_incremental(complex_test_file, incremental_output_file, cache_path)
+            self.assertEqual(stats, {'reused': len(changed_data) - 1, 'converted': 0})
+            
+            # The reassembled output matches a full conversion
+            convert_woo_to_shopify(complex_test_file, self.shopify_output_file)
+            with open(self.shopify_output_file, 'rb') as f:
+                full_bytes = f.read()
+            with open(incremental_output_file, 'rb') as f:
+                incremental_bytes = f.read()
+            self.assertEqual(full_bytes, incremental_bytes)
+            self.assertIn(b',wirelesssp-sku-2,', incremental_bytes)
+            self.assertNotIn(b'wirelesssp-sku-3', incremental_bytes)
+            
+            # Diffing against the full conversion writes nothing; the first
+            # diff maps the rows again for their content hashes, later ones do not
+            for converted in (len(changed_data) - 1, 0):
+                rows, stats = convert_incremental(complex_test_file, incremental_output_file, cache_path,
+                                                  diff_against=self.shopify_output_file)
+                self.assertEqual(rows, 0)
+                self.assertEqual(stats['converted'], converted)
+    
+    def test_diff_against_existing_export(self):
+        """Test that only added or changed rows are written when diffing against an export"""
+        export_file = os.path.join(self.test_dir, 'test_shopify_export.csv')
+        
+        # Simulate the store's export: the current conversion, formatted the way Shopify does
+        export_df = convert_woo_to_shopify(self.woo_test_file, export_file)
+        export_df['Price'] = export_df['Price'].map(lambda x: f"{x:.2f}" if x != '' else '')
+        export_df['Gift card'] = 'false'
+        # Values Shopify fills or rewrites itself must not make rows look changed
+        export_df['Inventory tracker'] = 'shopify'
+        export_df['Barcode'] = '4006381333931'
+        export_df['Tax code'] = 'P0000000'
+        export_df['Status'] = 'draft'
+        export_df.to_csv(export_file, index=False)
+        
+        unchanged_df = convert_woo_to_shopify(self.woo_test_file, self.shopify_output_file, diff_against=export_file)
+        self.assertEqual(len(unchanged_df), 0)
+        
+        # Change one product and add a new one
+        with open(self.woo_test_file, 'a', newline='') as f:
+            csv.writer(f).writerow(['Added Product', 'Vendor', 'Music', 'new', '9.99', '', '1', 'added-product'])
+        woo_df = pd.read_csv(self.woo_test_file, dtype=str)
+        woo_df.loc[1, 'Variant Price'] = '31.50'
+        woo_df.to_csv(self.woo_test_file, index=False)
+        
+        row_count = convert_woo_to_shopify(self.woo_test_file, self.shopify_output_file,
+                                           chunk_size=3, diff_against=export_file)
+        self.assertEqual(row_count, 2)
+        shopify_df = pd.read_csv(self.shopify_output_file)
+        self.assertEqual(list(shopify_df['URL handle']), ['empty-fields-product', 'added-product'])
+    
+    def test_diff_grouped_products(self):
+        """Test that diffing grouped products writes every row of a product with a changed variant or image"""
+        complex_test_file = os.path.join(self.test_dir, 'test_complex_woo.csv')
+        export_file = os.path.join(self.test_dir, 'test_shopify_export.csv')
+        grouped_data = [row[:] for row in self.extended_test_data]
+        grouped_data[1][5] = 'https://example.com/variant.jpg, https://example.com/variant-back.jpg'
+        grouped_data[6][5] = 'https://example.com/international.jpg, https://example.com/international-back.jpg'
+        with open(complex_test_file, 'w', newline='') as f:
+            csv.writer(f).writerows(grouped_data)
+        convert_woo_to_shopify(complex_test_file, export_file, group_variants=True)
+        
+        # Change the price of one variant and the second image of another product
+        grouped_data[3][4] = '26.99'
+        grouped_data[6][5] = 'https://example.com/international.jpg, https://example.com/international-side.jpg'
+        with open(complex_test_file, 'w', newline='') as f:
+            csv.writer(f).writerows(grouped_data)
+        convert_woo_to_shopify(complex_test_file, self.shopify_output_file, group_variants=True)
+        full_df = pd.read_csv(self.shopify_output_file, dtype=str, keep_default_na=False)
+        expected = full_df[full_df['URL handle'].isin(['variant-product', 'international-product'])]
+        self.assertEqual(len(expected), 8)
+        
+        for options in ({}, {'chunk_size': 2}, {'chunk_size': 2, 'workers': 2}):
+            convert_woo_to_shopify(complex_test_file, self.shopify_output_file, group_variants=True,
+                                   diff_against=export_file, **options)
+            shopify_df = pd.read_csv(self.shopify_output_file, dtype=str, keep_default_na=False)
+            pd.testing.assert_frame_equal(shopify_df, expected.reset_index(drop=True))
+    
+    def test_batch_conversion(self):
+        """Test that a directory of exports is converted file by file"""
+        with tempfile.TemporaryDirectory() as batch_dir:
+            input_dir = os.path.join(batch_dir, 'input')
+            output_dir = os.path.join(batch_dir, 'output')
+            os.makedirs(input_dir)
+            for name in ('store_a.csv', 'store_b.csv'):
+                with open(os.path.join(input_dir, name), 'w', newline='') as f:
+                    csv.writer(f).writerows(self.extended_test_data)
+            # A file without the WooCommerce columns must not abort the batch
+            with open(os.path.join(input_dir, 'broken.csv'), 'w', newline='') as f:
+                f.write('unrelated\n1\n')
+            
+            results = convert_batch(input_dir, output_dir, workers=2)
+            
+            self.assertEqual([os.path.basename(r['input']) for r in results],
+                             ['broken.csv', 'store_a.csv', 'store_b.csv'])
+            self.assertIsNotNone(results[0]['error'])
+            for result in results[1:]:
+                self.assertIsNone(result['error'])
+                self.assertEqual(result['rows'], len(self.extended_test_data) - 1)
+                self.assertTrue(os.path.exists(result['output']))
+            self.assertEqual(sorted(os.listdir(output_dir)), ['store_a_shopify.csv', 'store_b_shopify.csv'])
+    
+    def test_batch_inputs_with_the_same_name(self):
+        """Test that same-named exports of different stores get their own outputs, and clashes fail the batch"""
+        with tempfile.TemporaryDirectory() as batch_dir:
+            output_dir = os.path.join(batch_dir, 'output')
+            for store, rows in (('store_a', 3), ('store_b', 5)):
+                os.makedirs(os.path.join(batch_dir, 'exports', store))
+                with open(os.path.join(batch_dir, 'exports', store, 'products.csv'), 'w', newline='') as f:
+                    csv.writer(f).writerows(self.extended_test_data[:rows + 1])
+            
+            results = convert_batch(os.path.join(batch_dir, 'exports', '*', 'products.csv'), output_dir, workers=2)
+            
+            self.assertEqual([result['error'] for result in results], [None, None])
+            self.assertEqual([result['output'] for result in results],
+                             [os.path.join(output_dir, 'store_a', 'products_shopify.csv'),
+                              os.path.join(output_dir, 'store_b', 'products_shopify.csv')])
+            for result, rows in zip(results, (3, 5)):
+                self.assertEqual(len(pd.read_csv(result['output'])), rows)
+            
+            # Two inputs of one directory that only differ in their extension cannot both be written
+            with open(os.path.join(batch_dir, 'exports', 'store_a', 'products.parquet'), 'w') as f:
+                f.write('')
+            with self.assertRaisesRegex(ValueError, 'products_shopify.csv'):
+                convert_batch(os.path.join(batch_dir, 'exports', 'store_a'), output_dir)
+    
+    def test_watch_mode_converts_arriving_files(self):
+        """Test that watch mode converts files as they appear and only publishes complete outputs"""
+        with tempfile.TemporaryDirectory() as watch_dir:
+            input_dir = os.path.join(watch_dir, 'input')
+            output_dir = os.path.join(watch_dir, 'output')
+            os.makedirs(input_dir)
+            results = []
+            stop = threading.Event()
+            watcher = threading.Thread(target=watch_directory, args=(input_dir, output_dir),
+                                       kwargs={'poll_interval': 0.02, 'stop_event': stop,
+                                               'on_result': results.append})
+            watcher.start()
+            
+            def wait_for(count):
+                deadline = time.monotonic() + 10
+                while len(results) < count and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                self.assertEqual(len(results), count)
+            
+            try:
+                with open(os.path.join(input_dir, 'store_a.csv'), 'w', newline='') as f:
+                    csv.writer(f).writerows(self.extended_test_data)
+                wait_for(1)
+                with open(os.path.join(input_dir, 'broken.csv'), 'w', newline='') as f:
+                    f.write('unrelated\n1\n')
+                wait_for(2)
+                # Unchanged files are not converted again
+                time.sleep(0.1)
+                self.assertEqual(len(results), 2)
+            finally:
+                stop.set()
+                watcher.join()
+            
+            self.assertIsNone(results[0]['error'])
+            self.assertEqual(results[0]['rows'], len(self.extended_test_data) - 1)
+            self.assertIsNotNone(results[1]['error'])
+            self.assertEqual(os.listdir(output_dir), ['store_a_shopify.csv'])
+            convert_woo_to_shopify(os.path.join(input_dir, 'store_a.csv'), self.shopify_output_file)
+            with open(self.shopify_output_file, 'rb') as f:
+                expected = f.read()
+            with open(results[0]['output'], 'rb') as f:
+                self.assertEqual(f.read(), expected)
+            
+            # A new watcher skips files converted by an earlier run and only retries the failed one
+            stop = threading.Event()
+            stop_soon = threading.Timer(0.2, stop.set)
+            stop_soon.start()
+            self.assertEqual(watch_directory(input_dir, output_dir, poll_interval=0.02, stop_event=stop), 1)
+    
+    def test_watch_mode_survives_failing_conversions(self):
+        """Test that a conversion raising or killing its worker is reported as failed while watching goes on"""
+        with tempfile.TemporaryDirectory() as watch_dir:
+            input_dir = os.path.join(watch_dir, 'input')
+            output_dir = os.path.join(watch_dir, 'output')
+            os.makedirs(input_dir)
+            results = []
+            stop = threading.Event()
+            watcher = threading.Thread(target=watch_directory, args=(input_dir, output_dir, 2),
+                                       kwargs={'poll_interval': 0.02, 'stop_event': stop,
+                                               'on_result': results.append})
+            
+            def wait_for(count):
+                deadline = time.monotonic() + 20
+                while len(results) < count and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                self.assertEqual(len(results), count)
+            
+            with mock.patch.object(woo_to_shopify, '_convert_watched_file', failing_watched_conversion):
+                watcher.start()
+                try:
+                    for count, name in enumerate(('full_disk.csv', 'crash.csv', 'store_a.csv'), start=1):
+                        with open(os.path.join(input_dir, name), 'w', newline='') as f:
+                            csv.writer(f).writerows(self.extended_test_data)
+                        wait_for(count)
+                finally:
+                    stop.set()
+                    watcher.join()
+            
+            self.assertIn('No space left on device', results[0]['error'])
+            self.assertEqual(os.path.basename(results[1]['input']), 'crash.csv')
+            self.assertIsNotNone(results[1]['error'])
+            # The pool the crash broke was replaced
+            self.assertIsNone(results[2]['error'])
+            self.assertEqual(os.listdir(output_dir), ['store_a_shopify.csv'])
+    
+    def test_resumed_conversion_matches_uninterrupted_run(self):
+        """Test that a conversion interrupted after some chunks resumes from its last checkpoint"""
+        complex_test_file = os.path.join(self.test_dir, 'test_complex_woo.csv')
+        with open(complex_test_file, 'w', newline='') as f:
+            csv.writer(f).writerows(self.extended_test_data)
+        original_write = woo_to_shopify.ShardedCsvWriter.write
+        writes = []
+        
+        def interrupted_write(writer, csv_text, handles):
+            # The third chunk is written but not committed, as if the process died
+            original_write(writer, csv_text, handles)
+            writes.append(len(handles))
+            if len(writes) % 3 == 0:
+                raise RuntimeError('interrupted')
+        
+        def read_outputs(directory):
+            outputs = {}
+            for name in sorted(os.listdir(directory)):
+                opener = gzip.open if name.endswith('.gz') else open
+                with opener(os.path.join(directory, name), 'rb') as f:
+                    outputs[name] = f.read()
+            return outputs
+        
+        for output_name, options in (('shopify.csv', {}),
+                                      ('shopify.csv.gz', {'group_variants': True, 'max_shard_rows': 3})):
+            with tempfile.TemporaryDirectory() as expected_dir, tempfile.TemporaryDirectory() as resumed_dir:
+                expected_rows = convert_woo_to_shopify(complex_test_file, os.path.join(expected_dir, output_name),
+                                                       chunk_size=2, **options)
+                
+                output_path = os.path.join(resumed_dir, output_name)
+                checkpoint_path = os.path.join(resumed_dir, 'checkpoint.json')
+                with mock.patch.object(woo_to_shopify.ShardedCsvWriter, 'write', interrupted_write):
+                    with self.assertRaises(RuntimeError):
+                        convert_woo_to_shopify(complex_test_file, output_path, chunk_size=2,
+                                               checkpoint_path=checkpoint_path, **options)
+                with open(checkpoint_path) as f:
+                    self.assertGreater(json.load(f)['input_rows'], 0)
+                
+                row_count = convert_woo_to_shopify(complex_test_file, output_path, chunk_size=3,
+                                                   checkpoint_path=checkpoint_path, **options)
+                self.assertEqual(row_count, expected_rows)
+                self.assertFalse(os.path.exists(checkpoint_path))
+                self.assertEqual(read_outputs(resumed_dir), read_outputs(expected_dir))
+        
+        # A checkpoint is only resumed for the input it was written for
+        with tempfile.TemporaryDirectory() as resumed_dir:
+            checkpoint_path = os.path.join(resumed_dir, 'checkpoint.json')
+            with mock.patch.object(woo_to_shopify.ShardedCsvWriter, 'write', interrupted_write):
+                with self.assertRaises(RuntimeError):
+                    convert_woo_to_shopify(complex_test_file, self.shopify_output_file, chunk_size=2,
+                                           checkpoint_path=checkpoint_path)
+            with open(complex_test_file, 'a', newline='') as f:
+                csv.writer(f).writerow(self.extended_test_data[1])
+            with self.assertRaises(ValueError):
+                convert_woo_to_shopify(complex_test_file, self.shopify_output_file, chunk_size=2,
+                                       checkpoint_path=checkpoint_path)
+    
+    def test_woo_api_input_matches_csv_export(self):
+        """Test that products read from the WooCommerce REST API convert like the same products in a CSV export"""
+        products = [
+            {'id': 1, 'type': 'simple', 'name': 'Desk Lamp', 'slug': 'desk-lamp', 'sku': 'LAMP-1', 'price': '39.99',
+             'stock_quantity': 12, 'brands': [{'name': 'Brightly'}], 'categories': [{'name': 'Smart Home'}],
+             'tags': [{'name': 'light'}, {'name': 'desk'}],
+             'images': [{'src': 'https://example.com/lamp.jpg'}, {'src': 'https://example.com/lamp-side.jpg'}]},
+            {'id': 2, 'type': 'variable', 'name': 'Hoodie', 'slug': 'hoodie', 'sku': '', 'price': '49.99',
+             'stock_quantity': None, 'categories': [{'name': 'Clothing'}], 'tags': [],
+             'images': [{'src': 'https://example.com/hoodie.jpg'}]},
+            {'id': 3, 'type': 'simple', 'name': 'Controller', 'slug': 'controller', 'sku': '', 'price': '59.99',
+             'stock_quantity': 0, 'categories': [{'name': 'Gaming'}], 'tags': [], 'images': []},
+            {'id': 4, 'type': 'simple', 'name': 'Speaker', 'slug': 'speaker', 'sku': '', 'price': '',
+             'stock_quantity': None, 'categories': [{'name': 'Music'}], 'tags': [], 'images': []},
+            {'id': 5, 'type': 'simple', 'name': 'Plug', 'slug': 'plug', 'sku': '', 'price': '19.99',
+             'stock_quantity': None, 'categories': [{'name': 'Smart Home'}], 'tags': [], 'images': []},
+        ]
+        variations = {2: [
+            {'id': 21, 'sku': 'HD-S', 'price': '49.99', 'stock_quantity': 5,
+             'image': {'src': 'https://example.com/hoodie-red.jpg'},
+             'attributes': [{'name': 'Size', 'option': 'S'}, {'name': 'Color', 'option': 'Red'}]},
+            {'id': 22, 'sku': '', 'price': '49.99', 'stock_quantity': None, 'image': None,
+             'attributes': [{'name': 'Size', 'option': 'M'}, {'name': 'Color', 'option': 'Red'}]},
+            {'id': 23, 'sku': 'HD-L', 'price': '54.99', 'stock_quantity': 2,
+             'image': {'src': 'https://example.com/hoodie-blue.jpg'},
+             'attributes': [{'name': 'Size', 'option': 'L'}, {'name': 'Color', 'option': 'Blue'}]},
+        ]}
+        csv_export = [
+            ['title', 'vendor', 'product_type', 'tags', 'Variant Price', 'additional_image_link',
+             'inventory_quantity', 'handle', 'variant_sku', 'option1_name', 'option1_value', 'option2_name',
+             'option2_value'],
+            ['Desk Lamp', 'Brightly', 'Smart Home', 'light,desk', '39.99',
+             'https://example.com/lamp.jpg, https://example.com/lamp-side.jpg', '12', 'desk-lamp', 'LAMP-1',
+             '', '', '', ''],
+            ['Hoodie', '', 'Clothing', '', '49.99',
+             'https://example.com/hoodie-red.jpg, https://example.com/hoodie.jpg', '5', 'hoodie', 'HD-S',
+             'Size', 'S', 'Color', 'Red'],
+            ['Hoodie', '', 'Clothing', '', '49.99', '', '', 'hoodie', '', 'Size', 'M', 'Color', 'Red'],
+            ['Hoodie', '', 'Clothing', '', '54.99', 'https://example.com/hoodie-blue.jpg', '2', 'hoodie', 'HD-L',
+             'Size', 'L', 'Color', 'Blue'],
+            ['Controller', '', 'Gaming', '', '59.99', '', '0', 'controller', '', '', '', '', ''],
+            ['Speaker', '', 'Music', '', '', '', '', 'speaker', '', '', '', '', ''],
+            ['Plug', '', 'Smart Home', '', '19.99', '', '', 'plug', '', '', '', '', ''],
+        ]
+        api_test_file = os.path.join(self.test_dir, 'test_api_woo.csv')
+        with open(api_test_file, 'w', newline='') as f:
+            csv.writer(f).writerows(csv_export)
+        convert_woo_to_shopify(api_test_file, self.shopify_output_file, group_variants=True)
+        with open(self.shopify_output_file, 'rb') as f:
+            expected = f.read()
+        
+        failing_page = '/wp-json/wc/v3/products?page=2&per_page=2&orderby=id&order=asc'
+        stub = WooApiStub(products, variations, failures=[failing_page])
+        try:
+            api = WooCommerceApi(stub.url, 'ck_test', 'cs_test', concurrency=2, backoff=0, per_page=2)
+            row_count = convert_woo_to_shopify(api, self.shopify_output_file, chunk_size=2, group_variants=True)
+            with open(self.shopify_output_file, 'rb') as f:
+                self.assertEqual(f.read(), expected)
+            # Seven product and variant rows plus three image rows
+            self.assertEqual(row_count, 10)
+            # Three product pages (one retried) and two pages of variations
+            self.assertEqual(stub.requests.count(failing_page), 2)
+            self.assertEqual(len(stub.requests), 6)
+            # Requests share the pooled keep-alive connections
+            self.assertLessEqual(len(stub.clients), 2)
+            
+            api = WooCommerceApi(stub.url, 'ck_test', 'wrong', backoff=0)
+            with self.assertRaises(ValueError):
+                convert_woo_to_shopify(api, self.shopify_output_file)
+        finally:
+            stub.stop()
+            os.remove(api_test_file)
+    
+    def test_shopify_upload_with_bulk_operation_and_fallback(self):
+        """Test that converted products are uploaded in a bulk operation, or one mutation each when it is refused"""
+        complex_test_file = os.path.join(self.test_dir, 'test_complex_woo.csv')
+        with open(complex_test_file, 'w', newline='') as f:
+            csv.writer(f).writerows(self.extended_test_data)
+        convert_woo_to_shopify(complex_test_file, self.shopify_output_file, group_variants=True)
+        handles = list(dict.fromkeys(pd.read_csv(self.shopify_output_file, dtype=str)['URL handle']))
+        
+        stub = ShopifyApiStub()
+        try:
+            uploader = ShopifyUploader(stub.url, 'shpat_test', location_id='gid://shopify/Location/1',
+                                       poll_interval=0)
+            report = uploader.upload(self.shopify_output_file)
+            self.assertEqual(report['mode'], 'bulk')
+            self.assertEqual(report['products'], len(handles))
+            self.assertEqual(list(stub.products), handles)
+            # Errors in the result file are matched to the products by line number
+            self.assertEqual(report['errors'], [(handles[0], 'Invalid image')])
+            
+            product = stub.products['variant-product']
+            self.assertEqual([option['name'] for option in product['productOptions']], ['Size', 'Color'])
+            self.assertEqual(len(product['variants']), 5)
+            self.assertEqual(product['variants'][0]['optionValues'],
+                             [{'optionName': 'Size', 'name': 'Small'}, {'optionName': 'Color', 'name': 'Red'}])
+            self.assertEqual(product['variants'][0]['inventoryQuantities'][0]['quantity'], 15)
+            single = stub.products['free-product']
+            self.assertEqual(single['variants'][0]['optionValues'], [{'optionName': 'Title', 'name': 'Default Title'}])
+        finally:
+            stub.stop()
+        
+        stub = ShopifyApiStub(bulk_busy=True, throttled=3)
+        try:
+            uploader = ShopifyUploader(stub.url, 'shpat_test', concurrency=2, poll_interval=0)
+            report = uploader.upload(self.shopify_output_file)
+            self.assertEqual(report['mode'], 'mutations')
+            self.assertIn('already in progress', report['bulk_error'])
+            self.assertEqual(report['products'], len(handles))
+            self.assertEqual(report['errors'], [])
+            self.assertEqual(set(stub.products), set(handles))
+            # Throttled mutations were retried after waiting for the cost to be restored
+            self.assertEqual(stub.throttled, 0)
+            self.assertGreater(uploader.throttle.waits, 0)
+            # Two pooled API connections, plus one for the staged upload
+            self.assertLessEqual(len(stub.clients), 3)
+            self.assertGreater(report['products_per_second'], 0)
+            
+            with self.assertRaises(ValueError):
+                ShopifyUploader(stub.url, 'shpat_test').upload(self.shopify_output_file, mode='bulk')
+        finally:
+            stub.stop()
+    
+    def test_shopify_upload_reads_zstandard_output(self):
+        """Test that a Zstandard-compressed output written in several frames is uploaded whole"""
+        try:
+            import zstandard
+        except ImportError:
+            self.skipTest("zstandard not installed")
+        
+        complex_test_file = os.path.join(self.test_dir, 'test_complex_woo.csv')
+        zst_output_file = os.path.join(self.test_dir, 'test_shopify_output.csv.zst')
+        with open(complex_test_file, 'w', newline='') as f:
+            csv.writer(f).writerows(self.extended_test_data)
+        convert_woo_to_shopify(complex_test_file, self.shopify_output_file, group_variants=True)
+        handles = list(dict.fromkeys(pd.read_csv(self.shopify_output_file, dtype=str)['URL handle']))
+        # A resumable conversion commits one frame per chunk
+        convert_woo_to_shopify(complex_test_file, zst_output_file, chunk_size=2, group_variants=True,
+                               checkpoint_path=os.path.join(self.test_dir, 'checkpoint.json'))
+        
+        stub = ShopifyApiStub()
+        try:
+            uploader = ShopifyUploader(stub.url, 'shpat_test', poll_interval=0)
+            report = uploader.upload(zst_output_file, mode='mutations')
+            self.assertEqual(report['products'], len(handles))
+            self.assertEqual(set(stub.products), set(handles))
+            self.assertEqual(len(stub.products['variant-product']['variants']), 5)
+        finally:
+            stub.stop()
+            os.remove(zst_output_file)
+    
+    def test_image_url_validation_with_cache(self):
+        """Test that dead image URLs are reported and dropped, and checked URLs are cached"""
+        stub = ImageHostStub()
+        image_test_file = os.path.join(self.test_dir, 'test_images_woo.csv')
+        image_data = [row[:] for row in self.extended_test_data]
+        for row, link in ((1, 'ok.jpg, gone.jpg, moved.jpg'), (4, 'gone.jpg'), (6, 'moved.jpg'), (7, 'nohead.jpg'),
+                          (8, 'down.jpg'), (9, 'flaky.jpg'), (10, 'missing.png')):
+            image_data[row][5] = ', '.join(f'{stub.url}/{name}' for name in link.split(', '))
+        image_data[11][5] = 'ftp://example.com/backorder.jpg'
+        with open(image_test_file, 'w', newline='') as f:
+            csv.writer(f).writerows(image_data)
+        
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                convert_woo_to_shopify(image_test_file, self.shopify_output_file, group_variants=True)
+                rows_before = len(pd.read_csv(self.shopify_output_file))
+                cache_path = os.path.join(temp_dir, 'images.sqlite')
+                report_path = os.path.join(temp_dir, 'report.csv')
+                validator = ImageUrlValidator(cache_path, per_host=2, backoff=0)
+                stats = validate_output_images([self.shopify_output_file], validator, drop_dead=True,
+                                               report_path=report_path)
+                
+                self.assertEqual(stats['urls'], 8)
+                self.assertEqual((stats['dead'], stats['unreachable'], stats['changed_rows']), (3, 1, 5))
+                self.assertLessEqual(stub.max_active, 2)
+                report = pd.read_csv(report_path, dtype=str).set_index('url')
+                self.assertEqual(report.loc[f'{stub.url}/gone.jpg', 'status'], 'dead')
+                self.assertEqual(report.loc[f'{stub.url}/gone.jpg', 'rows'], '2')
+                self.assertEqual(report.loc[f'{stub.url}/down.jpg', 'status'], 'unreachable')
+                self.assertEqual(report.loc['ftp://example.com/backorder.jpg', 'detail'], 'not an http(s) URL')
+                
+                shopify_df = pd.read_csv(self.shopify_output_file, dtype=str, keep_default_na=False)
+                # The gallery row of the dead image is gone, other rows only lose the image
+                self.assertEqual(len(shopify_df), rows_before - 1)
+                images = ' '.join(shopify_df['Product image URL']) + ' '.join(shopify_df['Variant image URL'])
+                self.assertNotIn('gone.jpg', images)
+                self.assertNotIn('missing.png', images)
+                expensive = shopify_df[shopify_df['URL handle'] == 'expensive-product'].iloc[0]
+                self.assertEqual((expensive['Product image URL'], expensive['Image position']), ('', ''))
+                self.assertEqual(expensive['Title'], 'Expensive Product')
+                html = shopify_df[shopify_df['URL handle'] == 'html-product'].iloc[0]
+                self.assertEqual(html['Product image URL'], f'{stub.url}/down.jpg')
+                # The images after a dropped one move up
+                product = shopify_df[shopify_df['URL handle'] == 'variant-product']
+                self.assertEqual([(url.rsplit('/', 1)[-1], position) for url, position in
+                                  zip(product['Product image URL'], product['Image position']) if url],
+                                 [('ok.jpg', '1'), ('moved.jpg', '2')])
+                
+                # A re-run only checks what was not answered for certain
+                validator = ImageUrlValidator(cache_path, per_host=2, backoff=0)
+                stats = validate_output_images([self.shopify_output_file], validator)
+                self.assertEqual(stats['cached'], stats['urls'] - 1)
+                self.assertEqual(stats['requests'], 3)
+                
+                # Only a host name that does not exist is dead; a failing resolver is retried and not cached
+                getaddrinfo = socket.getaddrinfo
+                
+                def resolve(host, *args, **kwargs):
+                    if host == 'no-such-host.test':
+                        raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+                    if host == 'busy-resolver.test':
+                        raise socket.gaierror(socket.EAI_AGAIN, 'Temporary failure in name resolution')
+                    return getaddrinfo(host, *args, **kwargs)
+                
+                urls = ['http://no-such-host.test/a.jpg', 'http://busy-resolver.test/a.jpg']
+                validator = ImageUrlValidator(cache_path, backoff=0)
+                with mock.patch('socket.getaddrinfo', side_effect=resolve) as lookups:
+                    results = validator.validate(urls)
+                self.assertEqual(results[urls[0]], (False, 'host not found'))
+                self.assertIsNone(results[urls[1]][0])
+                self.assertEqual(sum(call.args[0] == 'busy-resolver.test' for call in lookups.call_args_list),
+                                 validator.retries + 1)
+                validator = ImageUrlValidator(cache_path, backoff=0)
+                with mock.patch('socket.getaddrinfo', side_effect=resolve):
+                    validator.validate(urls)
+                self.assertEqual(validator.cached_count, 1)
+        finally:
+            stub.stop()
+            os.remove(image_test_file)
+    
+    def test_compressed_input_and_output(self):
+        """Test that gzip-compressed exports are read and gzip output is written"""
+        gzip_input = os.path.join(self.test_dir, 'test_woo_gzip.csv.gz')
+        gzip_output = os.path.join(self.test_dir, 'test_shopify_gzip.csv.gz')
+        with open(self.woo_test_file, 'rb') as src, gzip.open(gzip_input, 'wb') as dst:
+            dst.write(src.read())
+        
+        try:
+            convert_woo_to_shopify(self.woo_test_file, self.shopify_output_file)
+            convert_woo_to_shopify(gzip_input, gzip_output, chunk_size=3)
+            with open(self.shopify_output_file, 'rb') as f:
+                expected = f.read()
+            with gzip.open(gzip_output, 'rb') as f:
+                self.assertEqual(f.read(), expected)
+        finally:
+            for path in (gzip_input, gzip_output):
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def test_csv_engines_and_parquet_input_match(self):
+        """Test that the Arrow CSV engine and Parquet input give the same output as the pandas parser"""
+        try:
+            import pyarrow
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+        
+        complex_test_file = os.path.join(self.test_dir, 'test_complex_woo.csv')
+        with open(complex_test_file, 'w', newline='') as f:
+            csv.writer(f).writerows(self.extended_test_data)
+        parquet_file = os.path.join(self.test_dir, 'test_complex_woo.parquet')
+        pd.read_csv(complex_test_file, dtype=str).to_parquet(parquet_file)
+        
+        outputs = []
+        try:
+            for path, kwargs in [(complex_test_file, {'engine': 'c'}),
+                                 (complex_test_file, {'engine': 'pyarrow'}),
+                                 (complex_test_file, {'engine': 'pyarrow', 'chunk_size': 4}),
+                                 (parquet_file, {}),
+                                 (parquet_file, {'chunk_size': 4})]:
+                convert_woo_to_shopify(path, self.shopify_output_file, **kwargs)
+                with open(self.shopify_output_file, 'rb') as f:
+                    outputs.append(f.read())
+        finally:
+            os.remove(parquet_file)
+        
+        for output in outputs[1:]:
+            self.assertEqual(output, outputs[0])
+    
+    def test_lite_engine_matches_pandas_engine(self):
+        """Test that the pandas-free lite engine writes the same bytes as the pandas parser"""
+        complex_test_file = os.path.join(self.test_dir, 'test_complex_woo.csv')
+        with open(complex_test_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerows(self.extended_test_data)
+            # Numbers float() reads differently from pandas, missing markers and a short row
+            writer.writerow(['Odd Numbers', 'NA', 'Gaming', 'null', '1_000', '', '1e400', 'odd-numbers'])
+            writer.writerow(['Infinite', '', 'Music', '', 'inf', '', ' 7.9 ', 'infinite'])
+            writer.writerow(['Short Row', 'Vendor'])
+            writer.writerow(['Negative Zero', 'Vendor', 'Music', '', '-0.00', '', '-0', 'negative-zero'])
+        # pandas reads '-0' differently when every price is an integer
+        zero_test_file = os.path.join(self.test_dir, 'test_zero_woo.csv')
+        with open(zero_test_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.extended_test_data[0][:8])
+            writer.writerow(['Free Sample', 'Vendor', 'Music', '', '-0', '', '1', 'free-sample'])
+            writer.writerow(['Paid Sample', 'Vendor', 'Music', '', '5', '', '1', 'paid-sample'])
+        lite_output = os.path.join(self.test_dir, 'test_shopify_lite.csv')
+        
+        for path in (self.woo_test_file, complex_test_file, zero_test_file):
+            convert_woo_to_shopify(path, self.shopify_output_file, engine='c')
+            rows = convert_woo_to_shopify(path, lite_output, engine='lite')
+            with open(self.shopify_output_file, 'rb') as f:
+                expected = f.read()
+            with open(lite_output, 'rb') as f:
+                self.assertEqual(f.read(), expected)
+            self.assertEqual(rows, len(pd.read_csv(self.shopify_output_file)))
+        
+        with self.assertRaises(ValueError):
+            convert_woo_to_shopify(self.woo_test_file, lite_output, engine='lite', chunk_size=2)
+    
+    def test_stage_profiling(self):
+        """Test that the profiler records every conversion stage and can export a trace"""
+        profiler = StageProfiler()
+        convert_woo_to_shopify(self.woo_test_file, self.shopify_output_file, chunk_size=4, profiler=profiler)
+        
+        summary = {entry['stage']: entry for entry in profiler.summary()}
+        for stage in ('read', 'sku', 'seo', 'category', 'weight', 'booleans', 'render', 'write'):
+            self.assertIn(stage, summary)
+        self.assertEqual(summary['read']['rows'], 7)
+        self.assertEqual(summary['sku']['calls'], 2)
+        
+        trace_file = os.path.join(self.test_dir, 'test_trace.json')
+        try:
+            profiler.write_chrome_trace(trace_file)
+            with open(trace_file) as f:
+                trace = json.load(f)
+        finally:
+            os.remove(trace_file)
+        self.assertEqual(len(trace['traceEvents']), len(profiler.events))
+        self.assertTrue(all(event['ph'] == 'X' for event in trace['traceEvents']))
+    
     def test_real_woo_data_conversion(self):
         # Test with the actual woo.csv file if it exists
         woo_csv_path = os.path.join(self.project_root, 'csv', 'input', 'woo.csv')
@@ -0,0 +1,234 @@
+import base64
+import json
+from collections import deque
+
+import pandas as pd
+
+from api_client import PooledApiClient
+from woo_to_shopify import WOO_DESCRIPTION_COLUMN, WOO_READ_COLUMNS, WOO_SKU_COLUMN
+
+
+# Products per WooCommerce REST API page, the maximum the API allows
+WOO_API_PER_PAGE = 100
+
+
+class WooCommerceApi(PooledApiClient):
+    """
+    Input source that reads products and their variations from the
+    WooCommerce REST API (v3) instead of a CSV export.
+    
+    Product pages are requested concurrently (see PooledApiClient), while
+    pages are handed on in product id order as soon as they and their
+    predecessors have arrived. Every product becomes rows with the columns
+    of a WooCommerce CSV export: one row for a simple product, one row per
+    variation, sharing the product's handle, for a variable product (see
+    group_variants of convert_woo_to_shopify).
+    
+    Args:
+        store_url (str): Base URL of the store, e.g. https://shop.example.com
+        consumer_key (str): REST API consumer key
+        consumer_secret (str): REST API consumer secret
+        per_page (int, optional): Products requested per page
+        **client_options: concurrency, requests_per_second, retries,
+            backoff and timeout of PooledApiClient
+    """
+    
+    service = 'WooCommerce API'
+    
+    def __init__(self, store_url, consumer_key, consumer_secret, per_page=WOO_API_PER_PAGE, **client_options):
+        credentials = base64.b64encode(f"{consumer_key}:{consumer_secret}".encode()).decode()
+        headers = {'Authorization': f"Basic {credentials}", 'Accept': 'application/json'}
+        super().__init__(store_url.rstrip('/') + '/wp-json/wc/v3', headers, **client_options)
+        self.per_page = per_page
+    
+    async def _get(self, path, **params):
+        """
+        GET an API resource.
+        
+        Returns:
+            tuple: The decoded JSON body and the response headers
+        """
+        headers, body = await self.request('GET', path, **params)
+        return json.loads(body), headers
+    
+    async def _get_variations(self, product_id):
+        """
+        All variations of a variable product, in menu order.
+        """
+        import asyncio
+        params = {'per_page': self.per_page, 'orderby': 'menu_order', 'order': 'asc'}
+        variations, headers = await self._get(f"/products/{product_id}/variations", page=1, **params)
+        total_pages = int(headers.get('x-wp-totalpages', 1))
+        pages = await asyncio.gather(*[self._get(f"/products/{product_id}/variations", page=page, **params)
+                                       for page in range(2, total_pages + 1)])
+        for page_variations, _ in pages:
+            variations.extend(page_variations)
+        return variations
+    
+    async def _get_page(self, page):
+        """
+        The rows of the products on one page, and the number of pages.
+        """
+        import asyncio
+        products, headers = await self._get('/products', page=page, per_page=self.per_page, orderby='id',
+                                            order='asc')
+        variable = [product for product in products if product.get('type') == 'variable']
+        variations = await asyncio.gather(*[self._get_variations(product['id']) for product in variable])
+        variations = dict(zip([product['id'] for product in variable], variations))
+        rows = []
+        for product in products:
+            rows.extend(woo_api_product_rows(product, variations.get(product['id'])))
+        return rows, int(headers.get('x-wp-totalpages', 1))
+    
+    async def _produce(self, emit):
+        """
+        Fetch every page, keeping up to `concurrency` pages in flight, and
+        pass the rows of each to emit in page order.
+        """
+        import asyncio
+        self.open()
+        pending = deque()
+        try:
+            rows, total_pages = await self._get_page(1)
+            if not await emit(rows):
+                return
+            next_page = 2
+            while pending or next_page <= total_pages:
+                while next_page <= total_pages and len(pending) < self.concurrency:
+                    pending.append(asyncio.ensure_future(self._get_page(next_page)))
+                    next_page += 1
+                rows, _ = await pending.popleft()
+                if not await emit(rows):
+                    return
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            self.close()
+    
+    def iter_chunks(self, chunk_size):
+        """
+        Yield the store's products as DataFrames of WooCommerce CSV rows.
+        
+        The pages are fetched by an event loop in a background thread while
+        the caller processes earlier chunks; at most a few pages wait for
+        the caller at any time.
+        
+        Args:
+            chunk_size (int): Number of rows per chunk
+        """
+        import asyncio
+        import queue
+        import threading
+        pages = queue.Queue(maxsize=2)
+        stopped = threading.Event()
+        done = object()
+        
+        def put(item):
+            # Give up when the consumer has stopped reading
+            while not stopped.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        async def emit(rows):
+            return await asyncio.get_running_loop().run_in_executor(None, put, rows)
+        
+        def produce():
+            try:
+                asyncio.run(self._produce(emit))
+                put(done)
+            except BaseException as e:
+                put(e)
+        
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        rows = []
+        try:
+            while True:
+                item = pages.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                rows.extend(item)
+                while len(rows) >= chunk_size:
+                    yield _woo_api_frame(rows[:chunk_size])
+                    rows = rows[chunk_size:]
+            if rows:
+                yield _woo_api_frame(rows)
+        finally:
+            stopped.set()
+            thread.join()
+
+
+def woo_api_product_rows(product, variations=None):
+    """
+    Rows of a WooCommerce CSV export for a product of the REST API.
+    
+    The product type is its first category and the vendor its first brand.
+    A variable product gets a row per variation with the variation's SKU,
+    price, stock, image and attribute options; its first row also lists the
+    product's gallery. Products on sale keep their regular price as the
+    compare-at price. Empty values are None, as pandas reads empty CSV
+    fields.
+    
+    Args:
+        product (dict): Product resource of the REST API
+        variations (list, optional): Variation resources of a variable product
+    
+    Returns:
+        list: Dicts keyed on WOO_READ_COLUMNS
+    """
+    def text(value):
+        return None if value is None or value == '' else str(value)
+    
+    def names(items):
+        return [item['name'] for item in items or [] if item.get('name')]
+    
+    gallery = [image['src'] for image in product.get('images') or [] if image.get('src')]
+    base = {
+        'title': text(product.get('name')),
+        'vendor': text((names(product.get('brands')) or [None])[0]),
+        'product_type': text((names(product.get('categories')) or [None])[0]),
+        'tags': text(','.join(names(product.get('tags')))),
+        'handle': text(product.get('slug')),
+        WOO_DESCRIPTION_COLUMN: text(product.get('description') or product.get('short_description')),
+    }
+    if not variations:
+        return [dict(base, **{
+            'Variant Price': text(product.get('price')),
+            'Variant Compare At Price': text(product.get('regular_price')) if product.get('on_sale') else None,
+            'additional_image_link': text(', '.join(gallery)),
+            'inventory_quantity': text(product.get('stock_quantity')),
+            WOO_SKU_COLUMN: text(product.get('sku')),
+        })]
+    
+    rows = []
+    for position, variation in enumerate(variations):
+        images = [(variation.get('image') or {}).get('src')]
+        if position == 0:
+            images += gallery
+        row = dict(base, **{
+            'Variant Price': text(variation.get('price')),
+            'Variant Compare At Price': text(variation.get('regular_price')) if variation.get('on_sale') else None,
+            'additional_image_link': text(', '.join(dict.fromkeys(image for image in images if image))),
+            'inventory_quantity': text(variation.get('stock_quantity')),
+            WOO_SKU_COLUMN: text(variation.get('sku')),
+        })
+        for number, attribute in enumerate((variation.get('attributes') or [])[:3], start=1):
+            row[f'option{number}_name'] = text(attribute.get('name'))
+            row[f'option{number}_value'] = text(attribute.get('option'))
+        rows.append(row)
+    return rows
+
+
+def _woo_api_frame(rows):
+    """
+    DataFrame of rows from woo_api_product_rows, with the columns of a CSV
+    export read by read_woo_input.
+    """
+    return pd.DataFrame.from_records(rows, columns=WOO_READ_COLUMNS)
@@ -1,165 +1,3468 @@
-import pandas as pd
-import numpy as np
 import argparse
+import bz2
+import csv
+import functools
+import glob
+import gzip
+import hashlib
+import html
+import importlib
+import io
+import json
+import lzma
+import math
 import os
+import re
+import shutil
+import tempfile
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from html.parser import HTMLParser
 
-def convert_woo_to_shopify(woo_csv_path, shopify_csv_path):
+
+class _LazyModule:
+    """
+    Stand-in for a heavy module that is only imported on first use, so that
+    `--help` and the lite engine start without loading pandas and numpy.
+    The module global is replaced by the real module on first access.
+    """
+    
+    def __init__(self, name, alias):
+        self._name = name
+        self._alias = alias
+    
+    def __getattr__(self, attribute):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module
+        return getattr(module, attribute)
+
+
+pd = _LazyModule('pandas', 'pd')
+np = _LazyModule('numpy', 'np')
+
+# Columns of the Shopify product import CSV, in template order
+SHOPIFY_COLUMNS = [
+    'Title', 'URL handle', 'Description', 'Vendor', 'Product category', 
+    'Type', 'Tags', 'Published on online store', 'Status', 'SKU', 
+    'Barcode', 'Option1 name', 'Option1 value', 'Option2 name', 
+    'Option2 value', 'Option3 name', 'Option3 value', 'Price', 
+    'Price / International', 'Compare-at price', 'Compare-at price / International', 
+    'Cost per item', 'Charge tax', 'Tax code', 'Inventory tracker', 
+    'Inventory quantity', 'Continue selling when out of stock', 
+    'Weight value (grams)', 'Weight unit for display', 'Requires shipping', 
+    'Fulfillment service', 'Product image URL', 'Image position', 
+    'Image alt text', 'Variant image URL', 'Gift card', 'SEO title', 
+    'SEO description', 'Google Shopping / Google product category', 
+    'Google Shopping / Gender', 'Google Shopping / Age group', 
+    'Google Shopping / MPN', 'Google Shopping / AdWords Grouping', 
+    'Google Shopping / AdWords labels', 'Google Shopping / Condition', 
+    'Google Shopping / Custom product', 'Google Shopping / Custom label 0', 
+    'Google Shopping / Custom label 1', 'Google Shopping / Custom label 2', 
+    'Google Shopping / Custom label 3', 'Google Shopping / Custom label 4'
+]
+
+# WooCommerce columns the mapping reads; other columns of the export are skipped when reading
+WOO_INPUT_COLUMNS = [
+    'title', 'vendor', 'product_type', 'tags', 'Variant Price',
+    'additional_image_link', 'inventory_quantity', 'handle'
+]
+
+# Optional WooCommerce columns with the option names and values of variant rows
+WOO_OPTION_COLUMNS = [f'option{number}_{part}' for number in (1, 2, 3) for part in ('name', 'value')]
+
+# Optional WooCommerce column with the SKU of each row, used instead of a generated one
+WOO_SKU_COLUMN = 'variant_sku'
+
+# Optional WooCommerce column with the (HTML) description of each product
+WOO_DESCRIPTION_COLUMN = 'description'
+
+# Optional WooCommerce price columns and the Shopify columns they are parsed into
+WOO_PRICE_COLUMNS = {'Variant Compare At Price': 'Compare-at price', 'Variant Cost': 'Cost per item'}
+
+# Every WooCommerce column read from the export when present
+WOO_READ_COLUMNS = (WOO_INPUT_COLUMNS + [WOO_SKU_COLUMN] + WOO_OPTION_COLUMNS + list(WOO_PRICE_COLUMNS)
+                    + [WOO_DESCRIPTION_COLUMN])
+
+# Decimal mark and thousands separators of the number format of each store
+# locale, by locale or language code; a rules file picks one with "number_locale"
+NUMBER_LOCALES = {
+    'en': ('.', ','), 'ja': ('.', ','), 'zh': ('.', ','), 'ko': ('.', ','), 'he': ('.', ','),
+    'de': (',', '.'), 'nl': (',', '.'), 'es': (',', '.'), 'it': (',', '.'), 'pt': (',', '.'),
+    'da': (',', '.'), 'id': (',', '.'), 'tr': (',', '.'), 'el': (',', '.'),
+    'fr': (',', ' \u00a0\u202f'), 'sv': (',', ' \u00a0\u202f'), 'nb': (',', ' \u00a0\u202f'),
+    'fi': (',', ' \u00a0\u202f'), 'pl': (',', ' \u00a0\u202f'), 'cs': (',', ' \u00a0\u202f'),
+    'ru': (',', ' \u00a0\u202f'), 'uk': (',', ' \u00a0\u202f'),
+    'de_ch': ('.', "'\u2019"), 'it_ch': ('.', "'\u2019"),
+}
+DEFAULT_NUMBER_LOCALE = 'en'
+
+# Input extensions read through Arrow rather than as CSV
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+
+# Compressed CSV extensions, and those the Arrow CSV reader can decompress itself
+COMPRESSION_EXTENSIONS = ('.gz', '.bz2', '.xz', '.zst', '.zip')
+ARROW_CSV_COMPRESSIONS = ('', '.gz', '.bz2', '.zst')
+
+# Strings pandas reads as missing by default; the Arrow CSV reader is given the same list
+NA_STRINGS = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+
+# Fixed values of the Shopify columns that do not depend on the product
+SHOPIFY_DEFAULTS = {
+    'Published on online store': 'TRUE',
+    'Status': 'active',
+    'Charge tax': 'TRUE',
+    'Requires shipping': 'TRUE',
+    'Continue selling when out of stock': 'deny',
+    'Weight unit for display': 'g',
+    'Fulfillment service': 'manual',
+    'Image position': 1,
+    'Gift card': 'FALSE',
+    'Google Shopping / Gender': 'Unisex',
+    'Google Shopping / Age group': 'Adult',
+    'Google Shopping / Condition': 'new',
+}
+
+# Columns describing the product as a whole; when variants are grouped they are
+# only filled on the first row of each product
+PRODUCT_LEVEL_COLUMNS = [
+    'Title', 'Description', 'Vendor', 'Product category', 'Type', 'Tags', 'Published on online store',
+    'Status', 'Option1 name', 'Option2 name', 'Option3 name', 'Gift card', 'SEO title', 'SEO description'
+] + [column for column in SHOPIFY_COLUMNS if column.startswith('Google Shopping / ')]
+
+# Columns that Shopify expects as 'TRUE'/'FALSE' strings, and the (lowercased) values read as 'TRUE'
+BOOLEAN_COLUMNS = ['Published on online store', 'Charge tax', 'Requires shipping', 'Gift card']
+TRUE_STRINGS = ('true', 't', 'yes', 'y', '1')
+
+# Columns joining converted rows to the rows of a Shopify export when diffing,
+# and the columns compared once joined: those the converter fills from the
+# WooCommerce data, including the product images. Columns Shopify fills or
+# rewrites itself (barcodes, tax and inventory settings, ...) are left out so
+# they do not make every row look changed.
+DIFF_KEY_COLUMNS = ['URL handle', 'SKU']
+DIFF_COMPARED_COLUMNS = [
+    'Title', 'Description', 'Vendor', 'Product category', 'Type', 'Tags', 'Option1 name', 'Option1 value',
+    'Option2 name', 'Option2 value', 'Option3 name', 'Option3 value', 'Price', 'Compare-at price',
+    'Cost per item', 'Inventory quantity', 'Weight value (grams)', 'Product image URL', 'Image position',
+    'SEO title', 'SEO description', 'Google Shopping / Google product category'
+]
+
+# Columns compared as numbers when diffing against a Shopify export, so that
+# e.g. '25.00' in the export matches 25.0 in the converted data
+DIFF_NUMERIC_COLUMNS = [
+    'Price', 'Price / International', 'Compare-at price', 'Compare-at price / International',
+    'Cost per item', 'Inventory quantity', 'Weight value (grams)', 'Image position'
+]
+
+# Suffix of the SEO title generated from each product title
+SEO_TITLE_SUFFIX = ' - Buy Online'
+
+# Longest product title, SEO title and SEO description Shopify accepts
+SHOPIFY_TITLE_MAX_LENGTH = 255
+SHOPIFY_SEO_TITLE_MAX_LENGTH = 70
+SHOPIFY_SEO_DESCRIPTION_MAX_LENGTH = 320
+
+# HTML tags kept in product descriptions, with the attributes kept on each;
+# other tags are unwrapped and these are removed along with their content
+DESCRIPTION_TAGS = {
+    'p': (), 'div': (), 'br': (), 'ul': (), 'ol': (), 'li': (), 'strong': (), 'b': (), 'em': (), 'i': (), 'u': (),
+    'h2': (), 'h3': (), 'h4': (), 'h5': (), 'h6': (), 'blockquote': (), 'a': ('href', 'title'),
+    'img': ('src', 'alt'), 'table': (), 'thead': (), 'tbody': (), 'tr': (), 'th': (), 'td': (),
+}
+DESCRIPTION_DROPPED_TAGS = ('script', 'style', 'iframe', 'object', 'embed', 'form', 'noscript', 'template')
+
+# Tags that separate words in the text of a description
+DESCRIPTION_BLOCK_TAGS = ('p', 'div', 'ul', 'ol', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote',
+                          'table', 'thead', 'tbody', 'tr', 'th', 'td')
+
+# Characters of descriptions and their conversions each process keeps cached,
+# and the longest description cached; longer ones are rare and converted anew
+DESCRIPTION_CACHE_CHARS = 8 * 2 ** 20
+DESCRIPTION_CACHE_MAX_LENGTH = 32 * 2 ** 10
+
+# Rows per chunk handed to each worker process when no chunk size is given
+DEFAULT_WORKER_CHUNK_SIZE = 50000
+
+# The CLI converts CSV inputs up to this size with the lite engine, which
+# finishes small files before pandas would even have been imported
+LITE_ENGINE_MAX_BYTES = 2 * 2 ** 20
+
+# Input compressions the lite engine can read with the standard library
+LITE_COMPRESSIONS = ('', '.gz', '.bz2', '.xz')
+
+# Longest mantissa, in digits, that float() is known to parse exactly as
+# pandas does; longer numbers are handed to pandas by the lite engine
+LITE_EXACT_DIGITS = 15
+
+# Ordered keyword rules mapping product types to categories and weights
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'product_type_rules.json')
+
+# Shopify product CSV template the output columns follow
+DEFAULT_TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'csv', 'input', 'product_template.csv')
+
+# Rules loaded from DEFAULT_RULES_PATH, cached on first use
+_default_rules = None
+
+# Rules loaded from other files by path, with the modification time and size
+# of the file they were compiled from
+_rules_cache = {}
+
+# Bump whenever map_woo_to_shopify changes its output, to invalidate incremental caches
+INCREMENTAL_CACHE_VERSION = 6
+
+# Bump whenever the layout of checkpoint manifests changes
+CHECKPOINT_VERSION = 1
+
+
+def _current_rss_bytes():
+    """
+    Current resident set size of this process in bytes, or None where
+    /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StageProfiler:
+    """
+    Record wall time, row counts and memory deltas of conversion stages.
+    
+    Pass an instance as `profiler` to convert_woo_to_shopify. Every stage run
+    is kept as an event, so chunked and parallel conversions show each chunk;
+    summary() aggregates them per stage. A disabled profiler records nothing
+    and adds no overhead.
+    
+    Args:
+        enabled (bool): Whether stages are recorded
+    """
+    
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.events = []
+        self.origin = time.time()
+    
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        Time the enclosed block as one run of the named stage.
+        
+        Yields a dict whose 'rows' entry may be set inside the block when the
+        row count is only known afterwards.
+        """
+        info = {'rows': rows}
+        if not self.enabled:
+            yield info
+            return
+        rss_before = _current_rss_bytes()
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            seconds = time.perf_counter() - start
+            rss_after = _current_rss_bytes()
+            self.events.append({
+                'stage': name,
+                'start': started,
+                'seconds': seconds,
+                'rows': info['rows'],
+                'rss_delta': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+                'pid': os.getpid(),
+            })
+    
+    def summary(self):
+        """
+        Aggregate the events per stage, in order of first appearance.
+        
+        Returns:
+            list: One dict per stage with 'stage', 'calls', 'seconds', 'rows'
+            and 'rss_delta_mb'
+        """
+        stages = {}
+        for event in self.events:
+            entry = stages.setdefault(event['stage'], {
+                'stage': event['stage'], 'calls': 0, 'seconds': 0.0, 'rows': None, 'rss_delta_mb': None,
+            })
+            entry['calls'] += 1
+            entry['seconds'] += event['seconds']
+            if event['rows'] is not None:
+                entry['rows'] = (entry['rows'] or 0) + event['rows']
+            if event['rss_delta'] is not None:
+                entry['rss_delta_mb'] = (entry['rss_delta_mb'] or 0.0) + event['rss_delta'] / 2 ** 20
+        return list(stages.values())
+    
+    def print_summary(self):
+        """
+        Print the per-stage summary as a table.
+        """
+        summary = self.summary()
+        width = max([len(entry['stage']) for entry in summary] + [len('Stage')])
+        print(f"{'Stage':<{width}}  {'Calls':>6}  {'Seconds':>9}  {'Rows':>10}  {'RSS delta MB':>12}")
+        for entry in summary:
+            rows = '' if entry['rows'] is None else entry['rows']
+            rss = '' if entry['rss_delta_mb'] is None else f"{entry['rss_delta_mb']:.1f}"
+            print(f"{entry['stage']:<{width}}  {entry['calls']:>6}  {entry['seconds']:>9.3f}  {rows:>10}  {rss:>12}")
+    
+    def write_json(self, path):
+        """
+        Write the summary and the raw events as JSON.
+        """
+        with open(path, 'w') as f:
+            json.dump({'summary': self.summary(), 'events': self.events}, f, indent=2)
+    
+    def write_chrome_trace(self, path):
+        """
+        Write the events in Chrome trace format (chrome://tracing, Perfetto).
+        Worker processes appear as separate processes.
+        """
+        trace_events = [{
+            'name': event['stage'],
+            'ph': 'X',
+            'ts': (event['start'] - self.origin) * 1e6,
+            'dur': event['seconds'] * 1e6,
+            'pid': event['pid'],
+            'tid': 0,
+            'args': {'rows': event['rows'], 'rss_delta': event['rss_delta']},
+        } for event in self.events]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+
+
+# Shared no-op profiler used when the caller does not profile
+_NO_PROFILER = StageProfiler(enabled=False)
+
+
+def load_product_type_rules(rules_path=None):
+    """
+    Load and compile the product type rules from a JSON config file. The
+    compiled rules are kept and reused until the file changes.
+    
+    The file maps each target field ('category', 'weight') to a default value
+    and an ordered list of rules. A rule matches when any of its keywords
+    occurs in the lowercased product type; the first matching rule wins.
+    An optional "number_locale" (e.g. "de") sets the number format prices
+    and quantities of the store are written in, see parse_numbers.
+    
+    Args:
+        rules_path (str, optional): Path to the rules file. Defaults to
+            DEFAULT_RULES_PATH.
+    
+    Returns:
+        dict: Field name -> (default value, list of (compiled matcher, value)),
+        plus the store's 'number_format' (see number_format)
+    """
+    global _default_rules
+    if rules_path is None and _default_rules is not None:
+        return _default_rules
+    if rules_path is not None:
+        stat = os.stat(rules_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = _rules_cache.get(rules_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    
+    with open(rules_path or DEFAULT_RULES_PATH) as f:
+        config = json.load(f)
+    
+    rules = {'number_format': number_format(config.get('number_locale', DEFAULT_NUMBER_LOCALE))}
+    for field in ('category', 'weight'):
+        if field not in config:
+            raise ValueError(f"Rules file is missing the '{field}' section")
+        matchers = []
+        for rule in config[field].get('rules', []):
+            # One alternation per rule so each unique product type is scanned once per rule
+            pattern = '|'.join(re.escape(keyword.lower()) for keyword in rule['keywords'])
+            matchers.append((re.compile(pattern), rule['value']))
+        default = config[field]['default']
+        # Mixed integer and float values are all made floats, so the output
+        # type does not depend on which rules happen to match
+        values = [default] + [value for _, value in matchers]
+        numeric = all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values)
+        if numeric and any(isinstance(value, float) for value in values):
+            default = float(default)
+            matchers = [(matcher, float(value)) for matcher, value in matchers]
+        rules[field] = (default, matchers)
+    
+    if rules_path is None:
+        _default_rules = rules
+    else:
+        _rules_cache[rules_path] = (signature, rules)
+    return rules
+
+
+def match_product_type_rule(product_type, rules, field):
+    """
+    Value of the first rule for the field that matches a product type, or
+    the field's default when none does.
+    
+    Args:
+        product_type (str): Product type to match
+        rules (dict): Compiled rules as returned by load_product_type_rules
+        field (str): Rule section to evaluate ('category' or 'weight')
+    """
+    default, matchers = rules[field]
+    product_type = str(product_type).lower()
+    return next((value for matcher, value in matchers if matcher.search(product_type)), default)
+
+
+def apply_product_type_rules(product_types, rules, field):
+    """
+    Evaluate the rules for one field against a column of product types.
+    
+    Rules are evaluated once per distinct product type and the results are
+    mapped back to the rows, so the per-row cost does not grow with the
+    number of rules.
+    
+    Args:
+        product_types (Series): Product type of each row
+        rules (dict): Compiled rules as returned by load_product_type_rules
+        field (str): Rule section to evaluate ('category' or 'weight')
+    
+    Returns:
+        Series: The matched value of each row, aligned with product_types;
+        categorical when the values are text
+    """
+    codes, uniques = pd.factorize(product_types, use_na_sentinel=False)
+    values = np.asarray([match_product_type_rule(product_type, rules, field) for product_type in uniques])
+    if values.dtype.kind in 'iuf':
+        return pd.Series(values[codes], index=product_types.index)
+    # Text results repeat a handful of values, so keep them as a categorical
+    value_codes, categories = pd.factorize(values)
+    return pd.Series(pd.Categorical.from_codes(value_codes[codes], categories), index=product_types.index)
+
+
+def _import_pyarrow():
+    """
+    Import pyarrow on demand, so plain CSV conversions never pay for it.
+    
+    Returns:
+        module: pyarrow, or None if it is not installed
+    """
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.csv
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def split_data_path(path):
+    """
+    Split a data file path into its stem, format extension and compression
+    extension, e.g. 'woo.csv.gz' -> ('woo', '.csv', '.gz').
+    """
+    stem, compression = os.path.splitext(path)
+    if compression.lower() not in COMPRESSION_EXTENSIONS:
+        stem, compression = path, ''
+    stem, extension = os.path.splitext(stem)
+    return stem, extension.lower(), compression.lower()
+
+
+def _arrow_to_woo_frame(table):
+    """
+    Convert an Arrow table to a WooCommerce DataFrame of text columns, with
+    missing values as None, just like read_csv(dtype=str) would give.
+    """
+    pa = _import_pyarrow()
+    columns = []
+    for column in table.columns:
+        if not pa.types.is_string(column.type):
+            column = pa.compute.cast(column, pa.string())
+        columns.append(column)
+    return pa.Table.from_arrays(columns, names=table.column_names).to_pandas()
+
+
+def _rebatch(batches, chunk_size):
+    """
+    Regroup Arrow record batches of arbitrary sizes into DataFrames of
+    chunk_size rows (the last one may be shorter).
+    """
+    pa = _import_pyarrow()
+    buffered = []
+    buffered_rows = 0
+    for batch in batches:
+        buffered.append(batch)
+        buffered_rows += batch.num_rows
+        if buffered_rows < chunk_size:
+            continue
+        table = pa.Table.from_batches(buffered)
+        offset = 0
+        while buffered_rows - offset >= chunk_size:
+            yield _arrow_to_woo_frame(table.slice(offset, chunk_size))
+            offset += chunk_size
+        buffered = table.slice(offset).to_batches()
+        buffered_rows -= offset
+    if buffered_rows:
+        yield _arrow_to_woo_frame(pa.Table.from_batches(buffered))
+
+
+def read_woo_csv(woo_csv_path, chunk_size=None, engine=None, columns=WOO_READ_COLUMNS):
+    """
+    Read a WooCommerce CSV file, optionally compressed (.gz, .bz2, .xz,
+    .zst, .zip).
+    
+    Every column is read as text so that type inference cannot differ
+    between the whole file and its chunks; numeric fields are parsed
+    explicitly during mapping. Only the columns in WOO_READ_COLUMNS are read.
+    
+    Args:
+        woo_csv_path (str): Path to the WooCommerce CSV file
+        chunk_size (int, optional): Number of rows per chunk. When set, an
+            iterator of DataFrames is returned instead of a single DataFrame.
+        engine (str, optional): 'pyarrow' to parse with the multithreaded
+            Arrow CSV reader or 'c' for the pandas parser. Defaults to
+            'pyarrow' when it is installed and can read the compression.
+            Both give identical results.
+        columns (list, optional): Columns to read when present, a subset of
+            WOO_READ_COLUMNS
+    """
+    columns = [column for column in pd.read_csv(woo_csv_path, nrows=0).columns if column in columns]
+    
+    if engine is None:
+        arrow_readable = split_data_path(woo_csv_path)[2] in ARROW_CSV_COMPRESSIONS
+        engine = 'pyarrow' if arrow_readable and _import_pyarrow() is not None else 'c'
+    
+    if engine == 'c':
+        return pd.read_csv(woo_csv_path, dtype=str, usecols=columns, chunksize=chunk_size)
+    if engine != 'pyarrow':
+        raise ValueError(f"Unknown CSV engine '{engine}', expected 'pyarrow' or 'c'")
+    
+    pa = _import_pyarrow()
+    if pa is None:
+        raise ImportError("The 'pyarrow' CSV engine requires pyarrow to be installed")
+    parse_options = pa.csv.ParseOptions(newlines_in_values=True)
+    convert_options = pa.csv.ConvertOptions(
+        column_types={column: pa.string() for column in columns}, include_columns=columns,
+        null_values=NA_STRINGS, strings_can_be_null=True)
+    
+    if chunk_size is None:
+        table = pa.csv.read_csv(woo_csv_path, parse_options=parse_options, convert_options=convert_options)
+        return _arrow_to_woo_frame(table)
+    reader = pa.csv.open_csv(woo_csv_path, parse_options=parse_options, convert_options=convert_options)
+    return _rebatch(reader, chunk_size)
+
+
+def _woo_text_frame(woo_df):
+    """
+    The WOO_READ_COLUMNS of a caller's DataFrame as text, the way they are
+    read from an export; missing values stay missing.
+    """
+    columns = {}
+    for column in woo_df.columns:
+        if column in WOO_READ_COLUMNS:
+            values = woo_df[column]
+            columns[column] = values.astype(str).where(values.notna())
+    return pd.DataFrame(columns, columns=list(columns)).reset_index(drop=True)
+
+
+def _is_path(woo_input):
+    return isinstance(woo_input, (str, os.PathLike))
+
+
+def read_woo_input(woo_path, chunk_size=None, engine=None, columns=WOO_READ_COLUMNS):
+    """
+    Read a WooCommerce export from CSV (optionally compressed), Parquet or
+    Arrow IPC/Feather, chosen by the file extension, or take it from memory.
+    
+    Columnar inputs need pyarrow. Only the columns in WOO_READ_COLUMNS are
+    read, and all of them as text, so every format maps identically.
+    
+    Args:
+        woo_path (str, DataFrame, file object or iterable): Path to the
+            WooCommerce export; a DataFrame of it; a (text or binary) file
+            object with its CSV text, read with the 'c' engine; or an
+            iterable of DataFrame chunks, which are used as they come
+            whatever chunk_size is
+        chunk_size (int, optional): Number of rows per chunk. When set, an
+            iterator of DataFrames is returned instead of a single DataFrame.
+        engine (str, optional): CSV engine, see read_woo_csv
+        columns (list, optional): Columns to read from a file when present,
+            a subset of WOO_READ_COLUMNS
+    """
+    if isinstance(woo_path, pd.DataFrame):
+        if chunk_size is None:
+            return _woo_text_frame(woo_path)
+        # Convert slice by slice, so only one chunk's text copy exists at a time
+        return (_woo_text_frame(woo_path.iloc[start:start + chunk_size])
+                for start in range(0, len(woo_path), chunk_size))
+    if hasattr(woo_path, 'read'):
+        if engine not in (None, 'c'):
+            raise ValueError("File objects are read with the 'c' engine")
+        return pd.read_csv(woo_path, dtype=str, usecols=lambda column: column in columns,
+                           chunksize=chunk_size)
+    if not _is_path(woo_path):
+        woo_chunks = (_woo_text_frame(woo_chunk) for woo_chunk in woo_path)
+        if chunk_size is not None:
+            return woo_chunks
+        woo_chunks = list(woo_chunks)
+        return pd.concat(woo_chunks, ignore_index=True) if woo_chunks else _woo_text_frame(pd.DataFrame())
+    
+    extension = split_data_path(woo_path)[1]
+    if extension not in PARQUET_EXTENSIONS + ARROW_EXTENSIONS:
+        return read_woo_csv(woo_path, chunk_size=chunk_size, engine=engine, columns=columns)
+    
+    pa = _import_pyarrow()
+    if pa is None:
+        raise ImportError(f"Reading '{extension}' files requires pyarrow to be installed")
+    
+    if extension in PARQUET_EXTENSIONS:
+        parquet_file = pa.parquet.ParquetFile(woo_path)
+        columns = [column for column in parquet_file.schema_arrow.names if column in columns]
+        if chunk_size is None:
+            return _arrow_to_woo_frame(parquet_file.read(columns=columns))
+        return _rebatch(parquet_file.iter_batches(batch_size=chunk_size, columns=columns), chunk_size)
+    
+    # Arrow IPC files are memory-mapped, so selecting and slicing them copies nothing
+    table = pa.ipc.open_file(pa.memory_map(woo_path)).read_all()
+    table = table.select([column for column in table.column_names if column in columns])
+    if chunk_size is None:
+        return _arrow_to_woo_frame(table)
+    return _rebatch(table.to_batches(), chunk_size)
+
+
+def _woo_input_columns(woo_path):
+    """
+    Column names of a WooCommerce export file, from its header or schema
+    only.
+    """
+    extension = split_data_path(woo_path)[1]
+    if extension not in PARQUET_EXTENSIONS + ARROW_EXTENSIONS:
+        return list(pd.read_csv(woo_path, nrows=0).columns)
+    pa = _import_pyarrow()
+    if pa is None:
+        raise ImportError(f"Reading '{extension}' files requires pyarrow to be installed")
+    if extension in PARQUET_EXTENSIONS:
+        return pa.parquet.ParquetFile(woo_path).schema_arrow.names
+    return pa.ipc.open_file(pa.memory_map(woo_path)).schema.names
+
+
+def open_output(path, append=False):
+    """
+    Open an output file for binary writing, compressed according to its
+    extension (.gz, .bz2, .xz or .zst). With append, writing continues at
+    the end of the file; compressed output gets a new compressed member,
+    which the formats allow to follow the existing ones.
+    """
+    mode = 'ab' if append else 'wb'
+    compression = split_data_path(path)[2]
+    if compression == '.gz':
+        return gzip.open(path, mode)
+    if compression == '.bz2':
+        return bz2.open(path, mode)
+    if compression == '.xz':
+        return lzma.open(path, mode)
+    if compression == '.zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Writing '.zst' output requires zstandard to be installed")
+        return zstandard.open(path, mode)
+    if compression == '.zip':
+        raise ValueError("Streamed output cannot be written as '.zip', use '.gz', '.bz2', '.xz' or '.zst'")
+    return open(path, mode)
+
+
+def _constant_column(value, rows):
+    """
+    A column holding the same value in every row, stored once as a
+    single-category categorical (one byte per row) and only expanded to
+    text when the frame is written.
+    """
+    return pd.Categorical.from_codes(np.zeros(rows, dtype=np.int8), [value])
+
+
+def _normalize_booleans(values):
+    """
+    Normalize a column to 'TRUE'/'FALSE' strings, evaluating each distinct
+    value only once.
+    
+    Returns:
+        Categorical: The normalized column
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    normalized = ['TRUE' if str(value).lower() in TRUE_STRINGS else 'FALSE' for value in uniques]
+    normalized_codes, categories = pd.factorize(np.asarray(normalized, dtype=object))
+    return pd.Categorical.from_codes(normalized_codes[codes], categories)
+
+
+def number_format(locale):
+    """
+    Decimal mark and thousands separators of a store locale.
+    
+    Args:
+        locale (str): Locale or language code, e.g. 'de', 'de_CH' or 'fr-FR'
+    
+    Returns:
+        tuple: (decimal mark, string of thousands separators)
+    """
+    key = locale.lower().replace('-', '_')
+    for candidate in (key, key.split('_')[0]):
+        if candidate in NUMBER_LOCALES:
+            return NUMBER_LOCALES[candidate]
+    raise ValueError(f"Unknown number locale '{locale}', expected one of: {', '.join(NUMBER_LOCALES)}")
+
+
+@functools.lru_cache(maxsize=None)
+def _number_regex(decimal, thousands):
+    """
+    Regex matching a whole number in the given format, with an optional sign
+    and currency symbol or code before or after it.
+    """
+    separators = ''.join(re.escape(separator) for separator in thousands)
+    decimal = re.escape(decimal)
+    integer = rf"(?:\d{{1,3}}(?:[{separators}]\d{{3}})+|\d+)"
+    currency = r"(?:[^\d\s+\-.,'\u2019]+\.?)"
+    return re.compile(rf"\A\s*(?P<sign>[+-]?)\s*{currency}?\s*(?P<currency_sign>[+-]?)\s*"
+                      rf"(?P<number>{integer}(?:{decimal}\d*)?|{decimal}\d+)\s*{currency}?\s*\Z")
+
+
+def parse_numbers(values, number_format=NUMBER_LOCALES[DEFAULT_NUMBER_LOCALE]):
+    """
+    Parse a column of prices or quantities written in a store's number
+    format, e.g. '1.234,56' or '€ 19,99' for a German store.
+    
+    Values pandas can parse are taken as they are when the decimal mark is
+    a point. The others are matched against the format as a whole column:
+    a currency symbol or code before or after the number is dropped, and
+    thousands separators are only accepted in groups of three digits, so a
+    value in another format fails instead of being misread.
+    
+    Args:
+        values (Series): Text of each row, '' when empty
+        number_format (tuple): Decimal mark and thousands separators, see
+            number_format
+    
+    Returns:
+        Series: The float of each row, NaN where it is empty or could not
+        be parsed
+    """
+    decimal, thousands = number_format
+    if decimal == '.':
+        numbers = pd.to_numeric(values, errors='coerce').astype(float)
+    else:
+        numbers = pd.Series(np.nan, index=values.index)
+    retry = numbers.isna() & (values != '')
+    if not retry.any():
+        return numbers + 0.0
+    
+    # Prices repeat across rows, so each distinct value is matched only once
+    codes, uniques = pd.factorize(values[retry])
+    parts = pd.Series(uniques, dtype=object).astype(str).str.extract(_number_regex(decimal, thousands))
+    digits = parts['number'].str.replace(f"[{re.escape(thousands)}]", '', regex=True)
+    if decimal != '.':
+        digits = digits.str.replace(decimal, '.', regex=False)
+    negative = (parts['sign'] == '-') | (parts['currency_sign'] == '-')
+    parsed = pd.to_numeric(digits.where(~negative, '-' + digits), errors='coerce').astype(float).to_numpy()
+    numbers[retry] = parsed[codes]
+    # pandas reads '-0' as 0 in a column of integers and as -0.0 otherwise;
+    # adding 0.0 writes every zero as 0.0, whatever else the chunk holds
+    return numbers + 0.0
+
+
+class NumberParseReport:
+    """
+    Prices and quantities of a conversion that could not be parsed in the
+    store's number format. Their prices are left empty and their quantities
+    set to 0.
+    
+    Pass an instance as `number_report` to convert_woo_to_shopify to read
+    the failures afterwards.
+    
+    Args:
+        max_examples (int): Number of failures kept as examples
+    """
+    
+    def __init__(self, max_examples=20):
+        self.max_examples = max_examples
+        self.failures = {}
+        self.examples = []
+    
+    def add(self, column, handles, values):
+        """
+        Record the rows of a column whose values could not be parsed.
+        
+        Args:
+            column (str): WooCommerce column of the values
+            handles (iterable): Handle of each failed row
+            values (iterable): Text of each failed row
+        """
+        failed = [(column, handle, value) for handle, value in zip(handles, values)]
+        self.failures[column] = self.failures.get(column, 0) + len(failed)
+        self.examples.extend(failed[:self.max_examples - len(self.examples)])
+    
+    def merge(self, other):
+        """
+        Add the failures of another report, e.g. of a chunk mapped in a worker.
+        """
+        for column, count in other.failures.items():
+            self.failures[column] = self.failures.get(column, 0) + count
+        self.examples.extend(other.examples[:self.max_examples - len(self.examples)])
+    
+    def summary(self):
+        """
+        Returns:
+            dict: Total number of 'failures', the number per WooCommerce
+            column ('columns') and (column, handle, value) 'examples'
+        """
+        return {'failures': sum(self.failures.values()), 'columns': dict(self.failures),
+                'examples': list(self.examples)}
+
+
+class SkuIndex:
+    """
+    Index of the SKUs assigned so far in a conversion, to detect and resolve
+    SKU collisions in a single pass.
+    
+    A generated SKU that is already taken, or that is a source SKU reserved
+    with reserve(), gets the first free numeric suffix ('-2', '-3', ...).
+    Reserving every source SKU of the export first means a generated SKU
+    never takes one that a later row brings. SKUs taken from the source are
+    never changed; when they repeat, the duplicates are only counted.
+    Resolution depends only on the order of the rows, so chunked and
+    parallel conversions resolve exactly like whole-file ones. Lookups are
+    set operations, so the cost is linear in the number of rows.
+    
+    Pass an instance as `sku_index` to convert_woo_to_shopify to read the
+    collisions afterwards.
+    
+    Args:
+        max_examples (int): Number of collisions kept as examples
+    """
+    
+    def __init__(self, max_examples=20):
+        self.max_examples = max_examples
+        self.resolved = 0
+        self.duplicates = 0
+        self.examples = []
+        self._skus = set()
+        self._reserved = set()
+        self._next_suffix = {}
+    
+    def reserve(self, skus):
+        """
+        Keep generated SKUs from taking these source SKUs, whichever row
+        brings them. Empty values are ignored.
+        
+        Args:
+            skus (iterable): Source SKUs of the export
+        """
+        self._reserved.update(skus)
+        self._reserved.discard('')
+    
+    def add(self, sku, generated=True):
+        """
+        Assign one SKU.
+        
+        Args:
+            sku (str): Generated or source SKU of the row
+            generated (bool): Whether the SKU was generated and may be changed
+        
+        Returns:
+            str: The SKU, or its disambiguated form when it was taken
+        """
+        if sku not in self._skus and not (generated and sku in self._reserved):
+            self._skus.add(sku)
+            return sku
+        return self._resolve_collision(sku, generated)
+    
+    def add_many(self, skus, generated):
+        """
+        Assign the SKUs of consecutive rows, see add.
+        
+        Returns:
+            list: The SKU of each row
+        """
+        reserved = self._reserved
+        if len(set(skus)) == len(skus) and self._skus.isdisjoint(skus) \
+                and not any(flag and sku in reserved for sku, flag in zip(skus, generated)):
+            self._skus.update(skus)
+            return skus
+        # Inlined add(), since variant rows make collisions common
+        taken = self._skus
+        resolved = []
+        for sku, flag in zip(skus, generated):
+            if sku in taken or (flag and sku in reserved):
+                sku = self._resolve_collision(sku, flag)
+            else:
+                taken.add(sku)
+            resolved.append(sku)
+        return resolved
+    
+    def _resolve_collision(self, sku, generated):
+        if not generated:
+            self.duplicates += 1
+            self._record(sku, sku)
+            return sku
+        suffix = self._next_suffix.get(sku, 2)
+        while f"{sku}-{suffix}" in self._skus or f"{sku}-{suffix}" in self._reserved:
+            suffix += 1
+        self._next_suffix[sku] = suffix + 1
+        resolved = f"{sku}-{suffix}"
+        self._skus.add(resolved)
+        self.resolved += 1
+        self._record(sku, resolved)
+        return resolved
+    
+    def _record(self, sku, resolved):
+        if len(self.examples) < self.max_examples:
+            self.examples.append((sku, resolved))
+    
+    def summary(self):
+        """
+        Returns:
+            dict: Number of 'resolved' generated SKUs, number of repeated
+            source SKUs ('duplicates') and (original, resolved) 'examples'
+        """
+        return {'resolved': self.resolved, 'duplicates': self.duplicates, 'examples': list(self.examples)}
+
+
+def generate_sku(handle):
+    """
+    SKU generated for a row without one: the first 10 characters of its
+    handle without dashes, plus '-sku'.
+    """
+    return f"{handle.replace('-', '')[:10]}-sku"
+
+
+def assign_skus(woo_df, sku_index):
+    """
+    SKU of each row: its source SKU when it has one, otherwise a generated
+    one, with collisions resolved by sku_index. The source SKUs of woo_df
+    are reserved first; those of later chunks must already be reserved (see
+    _reserve_source_skus).
+    
+    Args:
+        woo_df (DataFrame): WooCommerce rows
+        sku_index (SkuIndex): SKUs assigned to earlier rows
+    
+    Returns:
+        Series: The SKU of each row, aligned with woo_df
+    """
+    skus = [generate_sku(handle) for handle in woo_df['handle'].fillna('')]
+    generated = [True] * len(skus)
+    if WOO_SKU_COLUMN in woo_df:
+        source = woo_df[WOO_SKU_COLUMN].fillna('').tolist()
+        sku_index.reserve(source)
+        generated = [sku == '' for sku in source]
+        skus = [generated_sku if flag else sku for sku, generated_sku, flag in zip(source, skus, generated)]
+    return pd.Series(sku_index.add_many(skus, generated), index=woo_df.index, dtype=object)
+
+
+class _DescriptionSanitizer(HTMLParser):
+    """
+    Rebuild description HTML from DESCRIPTION_TAGS only, collecting its text.
+    
+    Other tags are unwrapped (their text is kept), DESCRIPTION_DROPPED_TAGS
+    are removed with their content and open tags are closed, so the result
+    is well-formed whatever the input.
+    """
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.html = []
+        self.text = []
+        self._open = []
+        self._dropping = 0
+    
+    def _attributes(self, tag, attrs):
+        kept = []
+        for name, value in attrs:
+            if name not in DESCRIPTION_TAGS[tag] or value is None:
+                continue
+            # Links and images must not run script
+            if name in ('href', 'src') and not re.match(r'(?:https?:|mailto:|/|#)', value.strip(), re.IGNORECASE):
+                continue
+            kept.append(f' {name}="{html.escape(value.strip())}"')
+        return ''.join(kept)
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in DESCRIPTION_DROPPED_TAGS:
+            self._dropping += 1
+        if self._dropping:
+            return
+        if tag in DESCRIPTION_BLOCK_TAGS or tag == 'br':
+            self.text.append(' ')
+        # Shopify shows the title as the <h1> of a product page
+        if tag == 'h1':
+            tag = 'h2'
+        # A new list item or paragraph ends one left open
+        if tag in ('li', 'p') and self._open and self._open[-1] == tag:
+            self.handle_endtag(tag)
+        if tag in DESCRIPTION_TAGS:
+            self.html.append(f"<{tag}{self._attributes(tag, attrs)}>")
+            if tag not in ('br', 'img'):
+                self._open.append(tag)
+    
+    def handle_startendtag(self, tag, attrs):
+        if tag in ('br', 'img'):
+            self.handle_starttag(tag, attrs)
+    
+    def handle_endtag(self, tag):
+        if tag in DESCRIPTION_DROPPED_TAGS and self._dropping:
+            self._dropping -= 1
+            return
+        if self._dropping:
+            return
+        if tag in DESCRIPTION_BLOCK_TAGS:
+            self.text.append(' ')
+        if tag == 'h1':
+            tag = 'h2'
+        if tag in self._open:
+            # Close the tags left open inside this one as well
+            while self._open:
+                open_tag = self._open.pop()
+                self.html.append(f"</{open_tag}>")
+                if open_tag == tag:
+                    break
+    
+    def handle_data(self, data):
+        if not self._dropping:
+            self.html.append(html.escape(data, quote=False))
+            self.text.append(data)
+    
+    def close(self):
+        super().close()
+        self.html.extend(f"</{tag}>" for tag in reversed(self._open))
+        self._open = []
+
+
+class _DescriptionCache:
+    """
+    Least recently used conversions of descriptions, bounded by the total
+    length of the descriptions and their results rather than by their
+    number, so memory stays bounded however long the descriptions are and
+    however long the process (e.g. a watcher) lives.
+    
+    Args:
+        max_chars (int): Characters kept in total
+        max_length (int): Longest description kept
+    """
+    
+    def __init__(self, max_chars=DESCRIPTION_CACHE_CHARS, max_length=DESCRIPTION_CACHE_MAX_LENGTH):
+        self.max_chars = max_chars
+        self.max_length = max_length
+        self.chars = 0
+        self._entries = OrderedDict()
+    
+    def get(self, description):
+        result = self._entries.get(description)
+        if result is not None:
+            self._entries.move_to_end(description)
+        return result
+    
+    def put(self, description, result):
+        if len(description) > self.max_length or description in self._entries:
+            return
+        self._entries[description] = result
+        self.chars += len(description) + len(result[0]) + len(result[1])
+        while self.chars > self.max_chars:
+            evicted, (body, text) = self._entries.popitem(last=False)
+            self.chars -= len(evicted) + len(body) + len(text)
+
+
+# Conversions of the descriptions seen by this process
+_description_cache = _DescriptionCache()
+
+
+def convert_description(description):
+    """
+    Sanitize the HTML description of a product and derive its SEO
+    description.
+    
+    WordPress shortcodes are removed, plain-text paragraphs (separated by
+    blank lines) become <p> elements, only DESCRIPTION_TAGS are kept and
+    whitespace is collapsed. The SEO description is the text of the result,
+    cut at a word boundary to SHOPIFY_SEO_DESCRIPTION_MAX_LENGTH characters.
+    Results are cached (see _DescriptionCache), since variants and product
+    lines share descriptions.
+    
+    Args:
+        description (str): HTML or plain text description
+    
+    Returns:
+        tuple: (sanitized HTML, SEO description); both '' when the
+        description has no text
+    """
+    result = _description_cache.get(description)
+    if result is None:
+        result = _convert_description(description)
+        _description_cache.put(description, result)
+    return result
+
+
+def _convert_description(description):
+    """
+    convert_description without the cache.
+    """
+    description = re.sub(r'\[/?[A-Za-z][\w-]*(?:\s[^\]]*)?\]', '', description)
+    if '\n' in description and not re.search(r'<(?:p|div|br|ul|ol|h[1-6]|table)\b', description, re.IGNORECASE):
+        paragraphs = re.split(r'\n\s*\n', description.strip())
+        description = ''.join(f"<p>{paragraph.strip()}</p>".replace('\n', '<br>') for paragraph in paragraphs)
+    
+    parser = _DescriptionSanitizer()
+    parser.feed(description)
+    parser.close()
+    
+    text = ' '.join(''.join(parser.text).split())
+    if not text:
+        return '', ''
+    body = re.sub(r'\s+', ' ', ''.join(parser.html))
+    # Whitespace around block tags is not rendered, and empty blocks are noise
+    body = re.sub(rf"\s*(</?(?:{'|'.join(DESCRIPTION_BLOCK_TAGS)})>|<br>)\s*", r'\1', body).strip()
+    body = re.sub(r'<(p|div|li|h[2-6])>(?:<br>)*</\1>', '', body)
+    
+    limit = SHOPIFY_SEO_DESCRIPTION_MAX_LENGTH
+    if len(text) > limit:
+        cut = text[:limit - 1]
+        text = (cut.rsplit(' ', 1)[0] if ' ' in cut else cut).rstrip(' ,;:-') + '…'
+    return body, text
+
+
+def _product_groups(handles):
+    """
+    Group rows into products by URL handle with a hash table, so rows of a
+    product need not be adjacent. Rows without a handle are products of
+    their own.
+    
+    Args:
+        handles (Series): Handle of each row, without missing values
+    
+    Returns:
+        tuple: (product number of each row, numbered in order of first
+        appearance, and the position of the first row of each product)
+    """
+    handles = handles.to_numpy(dtype=object)
+    keys = np.where(handles == '', np.arange(len(handles)), handles)
+    codes, _ = pd.factorize(keys)
+    first_rows = np.flatnonzero(~pd.Series(codes).duplicated().to_numpy())
+    return codes, first_rows
+
+
+def _group_product_rows(woo_df, shopify_df, codes, first_rows):
+    """
+    Lay out mapped rows as Shopify products: the first row of each product
+    carries the product fields, its other rows become variant rows, and every
+    image of the product gallery after the first gets an image row.
+    
+    The gallery is the comma-separated additional_image_link values of all
+    rows of the product, without duplicates. A variant row's own first image
+    also becomes its 'Variant image URL'. Option names are taken from the
+    first row of the product that has one; products with several rows but no
+    option name get a 'Title' option numbering their variants.
+    
+    Args:
+        woo_df (DataFrame): WooCommerce rows, without missing values
+        shopify_df (DataFrame): Their mapped Shopify rows
+        codes (ndarray): Product number of each row (see _product_groups)
+        first_rows (ndarray): Position of the first row of each product
+    
+    Returns:
+        DataFrame: Parent, variant and image rows, product by product
+    """
+    rows = len(shopify_df)
+    is_first = np.zeros(rows, dtype=bool)
+    is_first[first_rows] = True
+    product_sizes = np.bincount(codes, minlength=len(first_rows))
+    
+    # Options: names once per product, values on every variant
+    for number in (1, 2, 3):
+        if f'option{number}_value' in woo_df:
+            shopify_df[f'Option{number} value'] = woo_df[f'option{number}_value']
+        if f'option{number}_name' in woo_df:
+            names = woo_df[f'option{number}_name'].replace('', np.nan)
+            shopify_df[f'Option{number} name'] = names.groupby(codes).transform('first')
+    names = shopify_df['Option1 name'].astype(object)
+    unnamed = (product_sizes[codes] > 1) & (names.isna() | (names == '')).to_numpy()
+    if unnamed.any():
+        shopify_df['Option1 name'] = names.where(~unnamed, 'Title')
+        values = shopify_df['Option1 value'].astype(object)
+        numbered = unnamed & (values == '').to_numpy()
+        variant_number = pd.Series(codes[numbered]).groupby(codes[numbered]).cumcount().to_numpy() + 1
+        values[numbered] = [f"Variant {number}" for number in variant_number]
+        shopify_df['Option1 value'] = values
+    
+    # Image lists repeat across rows, so each distinct one is split only once
+    link_codes, link_uniques = pd.factorize(woo_df['additional_image_link'])
+    split_links = [[url.strip() for url in link.split(',') if url.strip()] for link in link_uniques]
+    url_codes, url_uniques = pd.factorize(np.asarray([url for urls in split_links for url in urls], dtype=object))
+    link_sizes = np.asarray([len(urls) for urls in split_links], dtype=np.int64)
+    link_starts = np.cumsum(link_sizes) - link_sizes
+    first_urls = np.asarray([urls[0] if urls else '' for urls in split_links], dtype=object)
+    own_image = pd.Series(first_urls[link_codes], dtype=object)
+    shopify_df['Variant image URL'] = own_image.where(~is_first & (own_image != ''))
+    
+    # Gallery of each product: the images of its rows in row order, without duplicates
+    row_sizes = link_sizes[link_codes]
+    image_rows = np.repeat(np.arange(rows), row_sizes)
+    offsets = np.arange(len(image_rows)) - np.repeat(np.cumsum(row_sizes) - row_sizes, row_sizes)
+    image_urls = url_codes[link_starts[link_codes][image_rows] + offsets]
+    image_products = codes[image_rows]
+    keep = ~pd.Series(image_products * np.int64(len(url_uniques)) + image_urls).duplicated().to_numpy()
+    image_products, image_urls = image_products[keep], url_uniques[image_urls[keep]]
+    image_positions = pd.Series(image_products).groupby(image_products).cumcount().to_numpy() + 1
+    
+    cover = image_positions == 1
+    cover_url = np.full(len(first_rows), np.nan, dtype=object)
+    cover_url[image_products[cover]] = image_urls[cover]
+    images = pd.DataFrame({'product': image_products[~cover], 'url': image_urls[~cover],
+                           'position': image_positions[~cover]})
+    
+    # Product fields are left empty on variant rows; numeric columns become
+    # nullable so that the empty cells of image rows do not turn them into floats
+    for column in PRODUCT_LEVEL_COLUMNS:
+        shopify_df[column] = shopify_df[column].where(is_first)
+    for column in shopify_df.columns:
+        kind = shopify_df[column].dtype.kind
+        if kind in 'iuf':
+            shopify_df[column] = shopify_df[column].astype('Int64' if kind in 'iu' else 'Float64')
+    
+    # Image rows follow the rows of their product; a stable sort on the
+    # product keeps both in their order (and is near linear when products
+    # are already contiguous)
+    products = np.concatenate([codes, images['product'].to_numpy()])
+    order = np.argsort(products * 2 + np.repeat([0, 1], [rows, len(images)]), kind='stable')
+    labels = np.concatenate([np.arange(rows), np.full(len(images), -1)])[order]
+    grouped = shopify_df.reindex(labels)
+    
+    handles = woo_df['handle'].to_numpy(dtype=object)
+    grouped['URL handle'] = np.concatenate([handles, handles[first_rows][images['product'].to_numpy()]])[order]
+    grouped['Product image URL'] = np.concatenate([np.where(is_first, cover_url[codes], np.nan),
+                                                   images['url'].to_numpy()])[order]
+    has_cover = is_first & pd.notna(cover_url[codes])
+    positions = np.concatenate([np.where(has_cover, 1, 0), images['position'].to_numpy()])[order]
+    grouped['Image position'] = pd.array(np.where(positions > 0, positions, None), dtype='Int64')
+    grouped.index = pd.RangeIndex(len(grouped))
+    return grouped
+
+
+def map_woo_to_shopify(woo_df, rules=None, profiler=None, group_variants=False, sku_index=None, number_report=None):
+    """
+    Map a WooCommerce DataFrame to a Shopify DataFrame.
+    
+    Every output row depends only on its input row, so this can be applied
+    to a whole file or to consecutive chunks of it with the same result.
+    With group_variants every output product depends only on its own rows,
+    so chunks must not split products (see _iter_whole_products).
+    
+    Args:
+        woo_df (DataFrame): WooCommerce rows as read by read_woo_input
+        rules (dict, optional): Compiled product type rules. Defaults to the
+            rules in DEFAULT_RULES_PATH.
+        profiler (StageProfiler, optional): Records the time of each mapping
+            stage
+        group_variants (bool, optional): Group rows sharing a handle into one
+            product with variant rows, and add image rows for the extra
+            images of each product (see _group_product_rows)
+        sku_index (SkuIndex or False, optional): SKUs of earlier rows to keep
+            the SKUs of these rows distinct from. Defaults to a new index, so
+            SKUs are only distinct within woo_df. False when the SKUs of woo_df
+            are already assigned (see _iter_with_skus); its source SKUs are
+            then used as they are.
+        number_report (NumberParseReport, optional): Collects the prices and
+            quantities that could not be parsed
+    
+    Returns:
+        DataFrame: Shopify rows with SHOPIFY_COLUMNS, aligned with woo_df
+        unless variants are grouped
+    """
+    if rules is None:
+        rules = load_product_type_rules()
+    profiler = profiler or _NO_PROFILER
+    rows = len(woo_df)
+    
+    with profiler.stage('fill empty', rows):
+        # Handle NaN values in the input data to avoid issues
+        woo_df = woo_df.fillna('').reset_index(drop=True)
+    
+    if group_variants:
+        with profiler.stage('group products', rows):
+            codes, first_rows = _product_groups(woo_df['handle'])
+            # Variant rows without a product type of their own are weighed like their product
+            product_types = woo_df['product_type']
+            parent_types = product_types.to_numpy(dtype=object)[first_rows][codes]
+            woo_df = woo_df.assign(product_type=product_types.where(product_types != '', parent_types))
+    
+    columns = {}
+    
+    with profiler.stage('copy fields', rows):
+        # Map WooCommerce fields to Shopify fields
+        columns['Title'] = woo_df['title']
+        columns['URL handle'] = woo_df['handle']
+        columns['Vendor'] = woo_df['vendor']
+        columns['Type'] = woo_df['product_type']
+        
+        # Handle tags - ensure they're strings, not NaN
+        columns['Tags'] = woo_df['tags']
+        
+        # Set product image URL
+        columns['Product image URL'] = woo_df['additional_image_link']
+    
+    with profiler.stage('price and quantity', rows):
+        # Parse prices and quantities in the store's number format; values that still fail are reported
+        parsed = {}
+        for column in ['Variant Price', 'inventory_quantity'] + [column for column in WOO_PRICE_COLUMNS if column in woo_df]:
+            parsed[column] = parse_numbers(woo_df[column], rules['number_format'])
+            failed = parsed[column].isna() & (woo_df[column] != '')
+            if number_report is not None and failed.any():
+                number_report.add(column, woo_df['handle'][failed], woo_df[column][failed])
+        
+        # Prices are floats, unparseable ones are left empty. Always floats,
+        # so a chunk of whole-number prices is written like the rest of the file
+        for column, shopify_column in [('Variant Price', 'Price')] + list(WOO_PRICE_COLUMNS.items()):
+            if column in parsed:
+                columns[shopify_column] = parsed[column].astype(object).where(parsed[column].notna(), '')
+        
+        # Unparseable inventory quantities are 0
+        columns['Inventory quantity'] = parsed['inventory_quantity'].fillna(0).astype(int)
+    
+    with profiler.stage('weight', rows):
+        # Set a default weight based on product type (see config/product_type_rules.json)
+        columns['Weight value (grams)'] = apply_product_type_rules(woo_df['product_type'], rules, 'weight')
+    
+    with profiler.stage('sku', rows):
+        # Generate SKUs based on handle if they don't exist, keeping every SKU distinct
+        if sku_index is False:
+            columns['SKU'] = woo_df[WOO_SKU_COLUMN]
+        else:
+            columns['SKU'] = assign_skus(woo_df, sku_index or SkuIndex())
+    
+    with profiler.stage('seo', rows):
+        # Set SEO titles and descriptions based on product names
+        columns['SEO title'] = woo_df['title'].apply(lambda x: f"{x}{SEO_TITLE_SUFFIX}")
+        columns['SEO description'] = woo_df['title'].apply(lambda x: f"Shop {x} at our store. Quality products with fast shipping and excellent customer service.")
+    
+    if WOO_DESCRIPTION_COLUMN in woo_df:
+        with profiler.stage('description', rows):
+            # Convert each distinct description once; products without one keep the SEO description above
+            description_codes, descriptions = pd.factorize(woo_df[WOO_DESCRIPTION_COLUMN])
+            converted = np.array([convert_description(description) for description in descriptions],
+                                 dtype=object).reshape(-1, 2)
+            columns['Description'] = pd.Series(converted[description_codes, 0], index=woo_df.index)
+            seo = pd.Series(converted[description_codes, 1], index=woo_df.index)
+            columns['SEO description'] = seo.where(seo != '', columns['SEO description'])
+    
+    with profiler.stage('category', rows):
+        # Assign appropriate product category based on product type
+        columns['Product category'] = apply_product_type_rules(woo_df['product_type'], rules, 'category')
+        columns['Google Shopping / Google product category'] = columns['Product category']
+    
+    with profiler.stage('defaults', rows):
+        # Constant and unused columns are stored once per column rather than once per row
+        for column, value in SHOPIFY_DEFAULTS.items():
+            columns[column] = _constant_column(value, rows)
+        for column in SHOPIFY_COLUMNS:
+            if column not in columns:
+                columns[column] = _constant_column('', rows)
+        shopify_df = pd.DataFrame(columns, index=woo_df.index, columns=SHOPIFY_COLUMNS)
+    
+    with profiler.stage('booleans', rows):
+        # Ensure boolean-like columns are saved as 'TRUE'/'FALSE' strings
+        for column in BOOLEAN_COLUMNS:
+            shopify_df[column] = _normalize_booleans(shopify_df[column])
+    
+    if group_variants:
+        with profiler.stage('variant rows', rows) as info:
+            shopify_df = _group_product_rows(woo_df, shopify_df, codes, first_rows)
+            info['rows'] = len(shopify_df)
+    
+    return shopify_df
+
+
+def _hash_shopify_rows(shopify_df, columns):
+    """
+    Hash the given columns of each Shopify row in a normalized form.
+    
+    Numeric columns are compared as numbers and boolean columns
+    case-insensitively, so rows read back from a Shopify export hash the same
+    as freshly converted rows with the same content.
+    
+    Returns:
+        ndarray: One uint64 hash per row
+    """
+    normalized = {}
+    for column in columns:
+        if column in DIFF_NUMERIC_COLUMNS:
+            normalized[column] = pd.to_numeric(shopify_df[column], errors='coerce').astype(float)
+        elif column in BOOLEAN_COLUMNS:
+            normalized[column] = shopify_df[column].astype(str).str.upper().where(shopify_df[column].notna(), '')
+        else:
+            normalized[column] = shopify_df[column].astype(str).where(shopify_df[column].notna(), '')
+    if not normalized:
+        return np.zeros(len(shopify_df), dtype=np.uint64)
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized), index=False).values
+
+
+def load_export_index(export_csv_path, chunk_size=DEFAULT_WORKER_CHUNK_SIZE):
+    """
+    Build a hash index of the rows of an existing Shopify export.
+    
+    Every row is reduced to a hash of its DIFF_KEY_COLUMNS and a hash of its
+    DIFF_COMPARED_COLUMNS, so exports with millions of rows can be indexed.
+    Other columns of the export are not read. The export is expected to
+    have the columns of csv/input/product_template.csv; compared columns
+    missing from it are not compared.
+    
+    Args:
+        export_csv_path (str): Path to the Shopify product export CSV
+        chunk_size (int): Number of export rows hashed at a time
+    
+    Returns:
+        dict: 'key_columns' and 'columns' compared, and the (key hash,
+        content hash) 'rows' of the export
+    """
+    export_columns = pd.read_csv(export_csv_path, nrows=0).columns
+    if 'URL handle' not in export_columns:
+        raise ValueError(f"Shopify export '{export_csv_path}' has no 'URL handle' column")
+    key_columns = [column for column in DIFF_KEY_COLUMNS if column in export_columns]
+    columns = [column for column in DIFF_COMPARED_COLUMNS if column in export_columns]
+    
+    keys, contents = [], []
+    for export_chunk in pd.read_csv(export_csv_path, dtype=str, keep_default_na=False,
+                                    usecols=key_columns + columns, chunksize=chunk_size):
+        keys.append(_hash_shopify_rows(export_chunk, key_columns))
+        contents.append(_hash_shopify_rows(export_chunk, columns))
+    
+    rows = pd.MultiIndex.from_arrays([np.concatenate(keys) if keys else np.array([], dtype=np.uint64),
+                                      np.concatenate(contents) if contents else np.array([], dtype=np.uint64)])
+    return {'key_columns': key_columns, 'columns': columns, 'rows': rows.unique()}
+
+
+def filter_changed_rows(shopify_df, export_index, whole_products=False):
+    """
+    Keep only the Shopify rows that are added or changed compared to an export.
+    
+    Rows are joined to the export on their URL handle and SKU. A row is
+    added when the export has no row with its key, and changed when none of
+    the export rows with its key has the same DIFF_COMPARED_COLUMNS. The
+    join is on hashes, so it is linear in the number of rows.
+    
+    Args:
+        shopify_df (DataFrame): Converted Shopify rows
+        export_index (dict): Export hash index as returned by load_export_index
+        whole_products (bool, optional): Keep every row of a product (rows
+            sharing a URL handle) when any of them is added or changed.
+            Needed for grouped products, since an import that overwrites
+            products by handle rebuilds a product from the rows given for
+            it. shopify_df must hold whole products.
+    
+    Returns:
+        DataFrame: The added or changed rows, in their original order
+    """
+    rows = pd.MultiIndex.from_arrays([_hash_shopify_rows(shopify_df, export_index['key_columns']),
+                                      _hash_shopify_rows(shopify_df, export_index['columns'])])
+    changed = ~rows.isin(export_index['rows'])
+    if whole_products:
+        # Rows without a handle are products of their own
+        handles = shopify_df['URL handle']
+        changed |= (handles.isin(handles[changed]) & (handles != '')).to_numpy()
+    return shopify_df[changed]
+
+
+def _map_chunk_to_csv(woo_chunk, rules, export_index=None, profiler=None, group_variants=False, number_report=None):
+    """
+    Map a WooCommerce chunk and render it as Shopify CSV text without header.
+    
+    Rendering happens here rather than in the writer so that worker processes
+    do the formatting work and only send plain text back to the parent.
+    
+    Returns:
+        tuple: (CSV text, array with the URL handle of each row)
+    """
+    profiler = profiler or _NO_PROFILER
+    shopify_chunk = map_woo_to_shopify(woo_chunk, rules, profiler, group_variants, False, number_report)
+    if export_index is not None:
+        with profiler.stage('diff', len(shopify_chunk)):
+            shopify_chunk = filter_changed_rows(shopify_chunk, export_index, group_variants)
+    with profiler.stage('render', len(shopify_chunk)):
+        csv_text = shopify_chunk.to_csv(index=False, header=False)
+    return csv_text, shopify_chunk['URL handle'].to_numpy()
+
+
+# State shared by every task of a worker process, set once by _init_worker
+_worker_context = {}
+
+
+def _init_worker(rules, export_index, profile, group_variants):
+    _worker_context['rules'] = rules
+    _worker_context['export_index'] = export_index
+    _worker_context['profile'] = profile
+    _worker_context['group_variants'] = group_variants
+
+
+def _map_chunk_to_csv_in_worker(woo_chunk):
+    """
+    Worker task: map one chunk and return its profiling events and number
+    parse failures along with it.
+    """
+    profiler = StageProfiler(enabled=_worker_context['profile'])
+    number_report = NumberParseReport()
+    csv_text, handles = _map_chunk_to_csv(woo_chunk, _worker_context['rules'], _worker_context['export_index'],
+                                          profiler, _worker_context['group_variants'], number_report)
+    return csv_text, handles, profiler.events, number_report
+
+
+def _iter_profiled(iterable, profiler, name):
+    """
+    Yield the items of an iterable, timing the production of each as a stage.
+    """
+    iterator = iter(iterable)
+    while True:
+        with profiler.stage(name) as info:
+            item = next(iterator, None)
+            info['rows'] = len(item) if item is not None else 0
+        if item is None:
+            return
+        yield item
+
+
+def _reserve_source_skus(woo_input, sku_index, engine=None):
+    """
+    Reserve every source SKU of an export in sku_index before its chunks
+    are assigned SKUs, so a generated SKU never takes one that a later chunk
+    brings. Only the SKU column is read. Inputs that cannot be read twice
+    (iterables of chunks, the REST API and unseekable file objects) are not
+    scanned; their generated SKUs only avoid the source SKUs of earlier
+    chunks.
+    """
+    if isinstance(woo_input, pd.DataFrame):
+        if WOO_SKU_COLUMN in woo_input:
+            sku_index.reserve(woo_input[WOO_SKU_COLUMN].dropna().astype(str))
+        return
+    if hasattr(woo_input, 'read'):
+        if not (hasattr(woo_input, 'seekable') and woo_input.seekable()):
+            return
+        start = woo_input.tell()
+        sku_chunks = read_woo_input(woo_input, DEFAULT_WORKER_CHUNK_SIZE, 'c', [WOO_SKU_COLUMN])
+    elif _is_path(woo_input):
+        if WOO_SKU_COLUMN not in _woo_input_columns(woo_input):
+            return
+        sku_chunks = read_woo_input(woo_input, DEFAULT_WORKER_CHUNK_SIZE, engine, [WOO_SKU_COLUMN])
+    else:
+        return
+    
+    for sku_chunk in sku_chunks:
+        if WOO_SKU_COLUMN in sku_chunk:
+            sku_index.reserve(sku_chunk[WOO_SKU_COLUMN].dropna())
+    if hasattr(woo_input, 'read'):
+        woo_input.seek(start)
+
+
+def _iter_with_skus(woo_chunks, sku_index, profiler):
+    """
+    Assign the final SKU of every row of each chunk, in input order, before
+    the chunks are mapped (possibly in other processes). The SKUs are stored
+    as the chunk's source SKUs and the chunks are mapped with sku_index=False,
+    so they are used as they are.
+    """
+    for woo_chunk in woo_chunks:
+        with profiler.stage('sku index', len(woo_chunk)):
+            woo_chunk = woo_chunk.assign(**{WOO_SKU_COLUMN: assign_skus(woo_chunk, sku_index)})
+        yield woo_chunk
+
+
+def _iter_skipping_rows(woo_chunks, rows, sku_index):
+    """
+    Drop the first rows of a chunk stream, e.g. the rows an interrupted run
+    already converted. Their SKUs are still added to sku_index so the
+    remaining rows resolve collisions exactly as in an uninterrupted run.
+    """
+    for woo_chunk in woo_chunks:
+        if rows > 0:
+            skipped = woo_chunk.iloc[:rows]
+            assign_skus(skipped, sku_index)
+            rows -= len(skipped)
+            woo_chunk = woo_chunk.iloc[len(skipped):]
+            if len(woo_chunk) == 0:
+                continue
+        yield woo_chunk
+
+
+def _iter_counted(woo_chunks, counts):
+    """
+    Yield the chunks unchanged, appending the row count of each to counts
+    (a deque) so a consumer further down the pipeline can tell how many
+    input rows every output chunk covers.
+    """
+    for woo_chunk in woo_chunks:
+        counts.append(len(woo_chunk))
+        yield woo_chunk
+
+
+def _iter_whole_products(woo_chunks):
+    """
+    Regroup chunks so that no product is split between two of them: the
+    trailing rows of a chunk that share the handle of its last row are moved
+    to the next chunk.
+    
+    Only consecutive rows are kept together, so the rows of each product
+    must be adjacent in the input for chunked and whole-file grouping to
+    agree.
+    """
+    carried = None
+    for woo_chunk in woo_chunks:
+        if carried is not None:
+            woo_chunk = pd.concat([carried, woo_chunk], ignore_index=True)
+            carried = None
+        if len(woo_chunk) == 0:
+            continue
+        handles = woo_chunk['handle'].fillna('').to_numpy(dtype=object)
+        if handles[-1] == '':
+            yield woo_chunk
+            continue
+        others = np.flatnonzero(handles != handles[-1])
+        split = others[-1] + 1 if len(others) else 0
+        if split > 0:
+            yield woo_chunk.iloc[:split]
+        carried = woo_chunk.iloc[split:]
+    if carried is not None:
+        yield carried
+
+
+def _iter_prepared_chunks(woo_chunks, sku_index, profiler, group_variants, skip_rows=0):
+    """
+    Prepare chunks to be mapped independently of each other: time their
+    reading, drop the rows an interrupted run already converted, keep each
+    product in one chunk when grouping and assign the final SKUs.
+    """
+    woo_chunks = _iter_profiled(woo_chunks, profiler, 'read')
+    if skip_rows:
+        woo_chunks = _iter_skipping_rows(woo_chunks, skip_rows, sku_index)
+    if group_variants:
+        woo_chunks = _iter_whole_products(woo_chunks)
+    return _iter_with_skus(woo_chunks, sku_index, profiler)
+
+
+def _iter_mapped_csv(woo_chunks, rules, workers=1, export_index=None, profiler=None, group_variants=False,
+                     number_report=None):
+    """
+    Yield the mapped CSV text of each chunk, in input order.
+    
+    With more than one worker the chunks are mapped in a process pool. The
+    rules and export index are sent to each worker once rather than with
+    every chunk. At most two chunks per worker are in flight so memory stays
+    bounded while the pool is kept busy.
+    
+    Args:
+        woo_chunks (iterable): WooCommerce DataFrame chunks
+        rules (dict): Compiled product type rules
+        workers (int): Number of worker processes
+        export_index (dict, optional): Only emit rows that differ from this
+            Shopify export index
+        profiler (StageProfiler, optional): Collects the stages of every
+            chunk, including those run in worker processes
+        group_variants (bool, optional): Group the rows of each product, see
+            map_woo_to_shopify. Chunks must not split products.
+        number_report (NumberParseReport, optional): Collects the prices and
+            quantities that could not be parsed, including those of chunks
+            mapped in worker processes
+    
+    Yields:
+        tuple: (CSV text, array of URL handles) for each chunk
+    """
+    profiler = profiler or _NO_PROFILER
+    if workers <= 1:
+        for woo_chunk in woo_chunks:
+            yield _map_chunk_to_csv(woo_chunk, rules, export_index, profiler, group_variants, number_report)
+        return
+    
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(rules, export_index, profiler.enabled, group_variants)) as executor:
+        pending = deque()
+        
+        def collect():
+            csv_text, handles, events, chunk_report = pending.popleft().result()
+            profiler.events.extend(events)
+            if number_report is not None:
+                number_report.merge(chunk_report)
+            return csv_text, handles
+        
+        for woo_chunk in woo_chunks:
+            pending.append(executor.submit(_map_chunk_to_csv_in_worker, woo_chunk))
+            if len(pending) >= 2 * workers:
+                yield collect()
+        while pending:
+            yield collect()
+
+
+def _csv_record_ends(data):
+    """
+    Byte offsets just past the end of each record of CSV data.
+    
+    A newline ends a record unless it is inside a quoted field, i.e. unless an
+    odd number of quote characters precede it (escaped quotes are doubled, so
+    they do not change the parity).
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buffer == ord('\n'))
+    quotes = np.flatnonzero(buffer == ord('"'))
+    quotes_before = np.searchsorted(quotes, newlines)
+    return newlines[quotes_before % 2 == 0] + 1
+
+
+class ShardedCsvWriter:
+    """
+    Stream Shopify CSV rows into one file, or into numbered shards.
+    
+    Without limits every row goes to `path`. With a byte and/or row limit,
+    rows are written to `<name>_001.csv`, `<name>_002.csv`, ... next to
+    `path`, each with its own header and within the limits. Rows sharing a
+    URL handle (a product's variant and image rows) are never split across
+    shards; a single product larger than the limits gets a shard of its own.
+    
+    Rows arrive as rendered CSV text so the writer never holds more than the
+    current chunk plus the trailing, possibly incomplete, product of the
+    previous one.
+    
+    Args:
+        path (str): Output path, or the base name of the shards
+        max_bytes (int, optional): Maximum size of a shard in bytes,
+            including its header
+        max_rows (int, optional): Maximum number of data rows in a shard
+        resume_state (dict, optional): State returned by commit() during an
+            earlier run. Output written after that commit is cut off and
+            writing continues from there.
+    """
+    
+    def __init__(self, path, max_bytes=None, max_rows=None, resume_state=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.sharded = max_bytes is not None or max_rows is not None
+        self.header = pd.DataFrame(columns=SHOPIFY_COLUMNS).to_csv(index=False).encode('utf-8')
+        if max_bytes is not None and max_bytes <= len(self.header):
+            raise ValueError(f"max_bytes must be larger than the CSV header ({len(self.header)} bytes)")
+        if max_rows is not None and max_rows < 1:
+            raise ValueError(f"max_rows must be a positive integer, got {max_rows}")
+        
+        self.paths = []
+        self.row_count = 0
+        self._file = None
+        self._shard_bytes = 0
+        self._shard_rows = 0
+        self._carry_data = b''
+        self._carry_handles = np.array([], dtype=object)
+        # Set when commit() closed the current shard, which is reopened for appending
+        self._reopen = False
+        
+        if resume_state is not None:
+            self._restore(resume_state)
+        elif not self.sharded:
+            self._open_shard()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _open_shard(self):
+        if self._file is not None:
+            self._file.close()
+        self._reopen = False
+        if self.sharded:
+            stem, extension, compression = split_data_path(self.path)
+            path = f"{stem}_{len(self.paths) + 1:03d}{extension or '.csv'}{compression}"
+        else:
+            path = self.path
+        self._file = open_output(path)
+        self._file.write(self.header)
+        self.paths.append(path)
+        self._shard_bytes = len(self.header)
+        self._shard_rows = 0
+    
+    def _ensure_shard(self):
+        if self._file is not None:
+            return
+        if self._reopen:
+            self._file = open_output(self.paths[-1], append=True)
+            self._reopen = False
+        else:
+            self._open_shard()
+    
+    def write(self, csv_text, handles):
+        """
+        Append rendered CSV rows (without header) and their URL handles.
+        """
+        data = csv_text.encode('utf-8')
+        self.row_count += len(handles)
+        if not self.sharded:
+            self._ensure_shard()
+            self._file.write(data)
+            return
+        
+        # The last product of the previous chunk may continue in this one
+        data = self._carry_data + data
+        handles = np.concatenate([self._carry_handles, np.asarray(handles, dtype=object)])
+        if len(handles) == 0:
+            return
+        
+        # A product starts wherever the handle changes; rows without a handle stand alone
+        starts = np.flatnonzero((handles[1:] != handles[:-1]) | (handles[1:] == '')) + 1
+        starts = np.concatenate([[0], starts])
+        record_starts = np.concatenate([[0], _csv_record_ends(data)[:-1]])
+        
+        # Keep the trailing product back until the next chunk shows where it ends
+        last_start = starts[-1]
+        self._carry_data = data[record_starts[last_start]:]
+        self._carry_handles = handles[last_start:]
+        self._write_products(data, record_starts[starts], starts)
+    
+    def _write_products(self, data, byte_bounds, row_bounds):
+        """
+        Write complete products to shards. Product i spans
+        data[byte_bounds[i]:byte_bounds[i + 1]]; the last bound closes the
+        final product.
+        """
+        byte_bounds = np.asarray(byte_bounds, dtype=np.int64)
+        row_bounds = np.asarray(row_bounds, dtype=np.int64)
+        position = 0
+        last = len(byte_bounds) - 1
+        while position < last:
+            self._ensure_shard()
+            
+            # Furthest product boundary that still fits in the current shard
+            end = last
+            if self.max_bytes is not None:
+                byte_limit = byte_bounds[position] + self.max_bytes - self._shard_bytes
+                end = min(end, np.searchsorted(byte_bounds, byte_limit, side='right') - 1)
+            if self.max_rows is not None:
+                row_limit = row_bounds[position] + self.max_rows - self._shard_rows
+                end = min(end, np.searchsorted(row_bounds, row_limit, side='right') - 1)
+            
+            if end <= position:
+                if self._shard_rows > 0:
+                    self._open_shard()
+                    continue
+                # A product larger than the limits gets a shard of its own
+                end = position + 1
+            
+            self._file.write(data[byte_bounds[position]:byte_bounds[end]])
+            self._shard_bytes += int(byte_bounds[end] - byte_bounds[position])
+            self._shard_rows += int(row_bounds[end] - row_bounds[position])
+            position = end
+            if position < last:
+                self._open_shard()
+    
+    def commit(self):
+        """
+        Make everything written so far durable and return the state to resume
+        from (see the resume_state argument). Products still held back for the
+        next chunk are part of the state rather than of the files.
+        
+        Returns:
+            dict: JSON-serializable writer state
+        """
+        file_bytes = None
+        if self._file is not None:
+            if split_data_path(self.paths[-1])[2]:
+                # End the compressed member so the file can be cut back to this point
+                self._file.close()
+                self._file = None
+                self._reopen = True
+            else:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+        if self.paths:
+            file_bytes = os.path.getsize(self.paths[-1])
+        return {
+            'paths': list(self.paths),
+            'file_bytes': file_bytes,
+            'row_count': self.row_count,
+            'shard_bytes': self._shard_bytes,
+            'shard_rows': self._shard_rows,
+            'carry_data': self._carry_data.decode('utf-8'),
+            'carry_handles': list(self._carry_handles),
+        }
+    
+    def _restore(self, state):
+        self.paths = list(state['paths'])
+        self.row_count = state['row_count']
+        self._shard_bytes = state['shard_bytes']
+        self._shard_rows = state['shard_rows']
+        self._carry_data = state['carry_data'].encode('utf-8')
+        self._carry_handles = np.array(state['carry_handles'], dtype=object)
+        if self.paths:
+            # Drop whatever was written after the commit
+            os.truncate(self.paths[-1], state['file_bytes'])
+            self._reopen = True
+    
+    def close(self):
+        """
+        Flush the last product and close the current shard.
+        """
+        if self.sharded and len(self._carry_handles):
+            self._write_products(self._carry_data, [0, len(self._carry_data)], [0, len(self._carry_handles)])
+            self._carry_data = b''
+            self._carry_handles = np.array([], dtype=object)
+        # Even an empty conversion produces one file with a header
+        if self._file is None and not self.paths:
+            self._open_shard()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _is_binary_sink(sink):
+    return isinstance(sink, (io.RawIOBase, io.BufferedIOBase)) or 'b' in str(getattr(sink, 'mode', ''))
+
+
+class _SinkCsvWriter:
+    """
+    Stream Shopify CSV rows into a caller's (text or binary) file object,
+    with the calls of ShardedCsvWriter. Without a sink the rows are only
+    counted. The sink is left open.
+    """
+    
+    def __init__(self, sink):
+        self.sink = sink
+        self.binary = _is_binary_sink(sink)
+        self.row_count = 0
+        self._write(pd.DataFrame(columns=SHOPIFY_COLUMNS).to_csv(index=False))
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _write(self, text):
+        if self.sink is not None:
+            self.sink.write(text.encode('utf-8') if self.binary else text)
+    
+    def write(self, csv_text, handles):
+        self._write(csv_text)
+        self.row_count += len(handles)
+    
+    def close(self):
+        if self.sink is not None and hasattr(self.sink, 'flush'):
+            self.sink.flush()
+
+
+def _open_text_input(path):
+    """
+    Open a CSV file, optionally compressed (.gz, .bz2, .xz, or .zst with
+    zstandard installed), for reading with the csv module. A leading byte
+    order mark is skipped like pandas does.
+    """
+    compression = split_data_path(path)[2]
+    if compression == '.zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading '.zst' files requires zstandard to be installed")
+        # Resumed outputs hold one frame per commit
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True)
+        return io.TextIOWrapper(reader, encoding='utf-8-sig', newline='')
+    if compression not in LITE_COMPRESSIONS:
+        raise ValueError(f"The lite engine cannot read '{compression}' files, use the 'c' or 'pyarrow' engine")
+    opener = {'': open, '.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}[compression]
+    return opener(path, 'rt', encoding='utf-8-sig', newline='')
+
+
+def _parse_number_lite(text):
+    """
+    Parse a number the way pd.to_numeric(errors='coerce') does, returning
+    NaN for text that is not a number.
+    
+    float() accepts a few spellings pandas does not (underscores, non-ASCII
+    digits) and overflows to infinity where pandas gives NaN; both are
+    rejected here. Numbers with more than LITE_EXACT_DIGITS digits are parsed
+    by pandas itself, since the two parsers may round them differently.
+    Negative zero is returned as 0.0, like parse_numbers does.
+    """
+    if not text.isascii() or '_' in text:
+        return math.nan
+    mantissa = text.lower().partition('e')[0]
+    if sum(character.isdigit() for character in mantissa) > LITE_EXACT_DIGITS:
+        return float(pd.to_numeric(pd.Series([text], dtype=object), errors='coerce').astype(float)[0]) + 0.0
+    try:
+        value = float(text)
+    except ValueError:
+        return math.nan
+    if math.isinf(value) and 'inf' not in mantissa:
+        return math.nan
+    return value + 0.0
+
+
+def _parse_localized_number_lite(text, number_format):
+    """
+    Parse one price or quantity exactly like parse_numbers, returning NaN
+    for text that is empty or not a number.
+    """
+    decimal, thousands = number_format
+    if decimal == '.':
+        value = _parse_number_lite(text)
+        if not math.isnan(value) or text == '':
+            return value
+    elif text == '':
+        return math.nan
+    match = _number_regex(decimal, thousands).search(text)
+    if match is None:
+        return math.nan
+    digits = re.sub(f"[{re.escape(thousands)}]", '', match['number']).replace(decimal, '.')
+    negative = '-' in (match['sign'], match['currency_sign'])
+    return _parse_number_lite(f"-{digits}" if negative else digits)
+
+
+def convert_woo_to_shopify_lite(woo_csv_path, shopify_csv_path, rules_path=None, sku_index=None,
+                                number_report=None):
+    """
+    Convert a WooCommerce CSV file to Shopify CSV format row by row with
+    the csv module, without importing pandas.
+    
+    For the small files of a typical store this finishes in a fraction of
+    the time it takes to import pandas. The output is byte-identical to
+    convert_woo_to_shopify with the other engines.
+    
+    Args:
+        woo_csv_path (str): Path to the WooCommerce CSV file, optionally
+            compressed (.gz, .bz2, .xz)
+        shopify_csv_path (str): Path to save the converted Shopify CSV file.
+            A .gz, .bz2, .xz or .zst extension compresses the output.
+        rules_path (str, optional): Path to a product type rules file.
+            Defaults to DEFAULT_RULES_PATH.
+        sku_index (SkuIndex, optional): Collects the SKU collisions resolved
+            during the conversion
+        number_report (NumberParseReport, optional): Collects the prices and
+            quantities that could not be parsed
+    
+    Returns:
+        int: The number of written rows
+    """
+    rules = load_product_type_rules(rules_path)
+    sku_index = sku_index if sku_index is not None else SkuIndex()
+    na_strings = frozenset(NA_STRINGS)
+    position = {column: index for index, column in enumerate(SHOPIFY_COLUMNS)}
+    
+    # Every output row starts as a copy of the constant columns
+    template = [''] * len(SHOPIFY_COLUMNS)
+    for column, value in SHOPIFY_DEFAULTS.items():
+        template[position[column]] = str(value)
+    for column in BOOLEAN_COLUMNS:
+        template[position[column]] = 'TRUE' if template[position[column]].lower() in TRUE_STRINGS else 'FALSE'
+    
+    # Category and weight of each distinct product type, evaluated once
+    rule_values = {}
+    
+    # Reserve the source SKUs of the whole file before any SKU is generated
+    with _open_text_input(woo_csv_path) as input_file:
+        reader = csv.reader(input_file)
+        header = next(reader, None) or []
+        if WOO_SKU_COLUMN in header:
+            sku_column = header.index(WOO_SKU_COLUMN)
+            sku_index.reserve(record[sku_column] for record in reader
+                              if len(record) > sku_column and record[sku_column] not in na_strings)
+    
+    os.makedirs(os.path.dirname(shopify_csv_path) or '.', exist_ok=True)
+    row_count = 0
+    with _open_text_input(woo_csv_path) as input_file, \
+            io.TextIOWrapper(open_output(shopify_csv_path), encoding='utf-8', newline='') as output_file:
+        reader = csv.reader(input_file)
+        writer = csv.writer(output_file, lineterminator=os.linesep)
+        
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"'{woo_csv_path}' is empty, expected a header row")
+        # First occurrence of each column name, like pandas
+        input_position = {column: index for index, column in reversed(list(enumerate(header)))}
+        title, vendor, product_type, tags, price, image, quantity, handle = [
+            input_position[column] for column in WOO_INPUT_COLUMNS]
+        source_sku = input_position.get(WOO_SKU_COLUMN)
+        description = input_position.get(WOO_DESCRIPTION_COLUMN)
+        extra_prices = [(input_position[column], column, position[shopify_column])
+                        for column, shopify_column in WOO_PRICE_COLUMNS.items() if column in input_position]
+        number_format = rules['number_format']
+        writer.writerow(SHOPIFY_COLUMNS)
+        
+        for record in reader:
+            # Skip blank lines, like pandas
+            if not record or (len(record) == 1 and not record[0].strip()):
+                continue
+            if len(record) > len(header):
+                raise ValueError(f"Expected {len(header)} fields in line {reader.line_num}, saw {len(record)}")
+            if len(record) < len(header):
+                record += [''] * (len(header) - len(record))
+            record = ['' if value in na_strings else value for value in record]
+            
+            row = template.copy()
+            row[position['Title']] = record[title]
+            row[position['URL handle']] = record[handle]
+            row[position['Vendor']] = record[vendor]
+            row[position['Type']] = record[product_type]
+            row[position['Tags']] = record[tags]
+            row[position['Product image URL']] = record[image]
+            
+            # Unparseable prices are left empty and unparseable quantities are 0
+            prices = [(price, 'Variant Price', position['Price'])] + extra_prices
+            values = {}
+            for index, column, _ in prices + [(quantity, 'inventory_quantity', None)]:
+                values[column] = _parse_localized_number_lite(record[index], number_format)
+                if number_report is not None and math.isnan(values[column]) and record[index] != '':
+                    number_report.add(column, [record[handle]], [record[index]])
+            for _, column, output_index in prices:
+                row[output_index] = '' if math.isnan(values[column]) else str(values[column])
+            quantity_value = values['inventory_quantity']
+            if math.isinf(quantity_value):
+                raise ValueError("Cannot convert non-finite values (NA or inf) to integer")
+            row[position['Inventory quantity']] = str(0 if math.isnan(quantity_value) else int(quantity_value))
+            
+            if record[product_type] not in rule_values:
+                rule_values[record[product_type]] = (
+                    str(match_product_type_rule(record[product_type], rules, 'category')),
+                    str(match_product_type_rule(record[product_type], rules, 'weight')))
+            category, weight = rule_values[record[product_type]]
+            row[position['Product category']] = category
+            row[position['Google Shopping / Google product category']] = category
+            row[position['Weight value (grams)']] = weight
+            
+            if source_sku is not None and record[source_sku] != '':
+                row[position['SKU']] = sku_index.add(record[source_sku], generated=False)
+            else:
+                row[position['SKU']] = sku_index.add(generate_sku(record[handle]))
+            row[position['SEO title']] = f"{record[title]}{SEO_TITLE_SUFFIX}"
+            row[position['SEO description']] = f"Shop {record[title]} at our store. Quality products with fast shipping and excellent customer service."
+            if description is not None:
+                body, seo_text = convert_description(record[description])
+                row[position['Description']] = body
+                if seo_text:
+                    row[position['SEO description']] = seo_text
+            
+            writer.writerow(row)
+            row_count += 1
+    
+    return row_count
+
+
+def lite_engine_suitable(woo_path, shopify_csv_path):
+    """
+    Whether a conversion is small and simple enough for the lite engine to
+    be picked automatically: a CSV input of at most LITE_ENGINE_MAX_BYTES
+    that the standard library can decompress, and an output other than .zip.
+    """
+    _, extension, compression = split_data_path(woo_path)
+    return (extension not in PARQUET_EXTENSIONS + ARROW_EXTENSIONS
+            and compression in LITE_COMPRESSIONS
+            and split_data_path(shopify_csv_path)[2] != '.zip'
+            and os.path.getsize(woo_path) <= LITE_ENGINE_MAX_BYTES)
+
+
+def iter_shopify_products(shopify_csv_path):
+    """
+    Read a converted Shopify CSV and yield the rows of one product at a time:
+    consecutive rows sharing a URL handle, as written with group_variants.
+    Rows without a handle are products of their own.
+    
+    Args:
+        shopify_csv_path (str): Converted CSV, optionally compressed (.gz,
+            .bz2, .xz, .zst)
+    
+    Yields:
+        list: The rows (dicts keyed on SHOPIFY_COLUMNS) of a product
+    """
+    with _open_text_input(shopify_csv_path) as f:
+        product = []
+        for row in csv.DictReader(f):
+            if product and (row['URL handle'] != product[0]['URL handle'] or not row['URL handle']):
+                yield product
+                product = []
+            product.append(row)
+        if product:
+            yield product
+
+
+def _file_sha256(path):
+    """
+    SHA-256 of a file's content, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2 ** 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _checkpoint_settings(shopify_csv_path, rules_path, diff_against, max_shard_bytes, max_shard_rows,
+                         group_variants):
+    """
+    Fingerprint of everything besides the input that shapes the output of a
+    checkpointed conversion. The chunk size and worker count are left out:
+    they do not change the output.
+    """
+    settings = [INCREMENTAL_CACHE_VERSION, shopify_csv_path, max_shard_bytes, max_shard_rows, group_variants,
+                _file_sha256(rules_path or DEFAULT_RULES_PATH),
+                _file_sha256(diff_against) if diff_against else None]
+    return hashlib.sha256(json.dumps(settings).encode()).hexdigest()
+
+
+def _load_checkpoint(checkpoint_path, input_sha256, settings):
+    """
+    Load the manifest of an interrupted conversion, if there is one.
+    
+    Raises:
+        ValueError: If the input or the settings changed since it was written
+    """
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('version') != CHECKPOINT_VERSION or checkpoint['settings'] != settings:
+        raise ValueError(f"Checkpoint {checkpoint_path} was written by a conversion with other settings; "
+                         f"delete it to start over")
+    if checkpoint['input_sha256'] != input_sha256:
+        raise ValueError(f"The input changed since checkpoint {checkpoint_path} was written; "
+                         f"delete it to start over")
+    return checkpoint
+
+
+def _write_checkpoint(checkpoint_path, checkpoint):
+    """
+    Replace the checkpoint manifest atomically, so an interruption leaves
+    either the previous or the new manifest behind.
+    """
+    temp_path = f"{checkpoint_path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, checkpoint_path)
+
+
+def _is_api_input(woo_input):
+    """
+    Whether a conversion input is an API source with an iter_chunks(chunk_size)
+    method, such as woo_api.WooCommerceApi, rather than an export.
+    """
+    return hasattr(woo_input, 'iter_chunks')
+
+
+def _input_rules(rules_path, woo_input):
+    """
+    Compiled rules for a conversion of woo_input.
+    """
+    rules = load_product_type_rules(rules_path)
+    # The REST API writes numbers the same way in every store
+    if _is_api_input(woo_input):
+        rules = dict(rules, number_format=NUMBER_LOCALES[DEFAULT_NUMBER_LOCALE])
+    return rules
+
+
+def _read_woo_chunks(woo_input, chunk_size, engine=None):
+    """
+    Iterator of the WooCommerce DataFrame chunks of any conversion input.
+    """
+    if _is_api_input(woo_input):
+        return woo_input.iter_chunks(chunk_size)
+    return read_woo_input(woo_input, chunk_size=chunk_size, engine=engine)
+
+
+def iter_shopify_chunks(woo_input, chunk_size=DEFAULT_WORKER_CHUNK_SIZE, rules_path=None, diff_against=None,
+                        profiler=None, engine=None, group_variants=False, sku_index=None, number_report=None):
+    """
+    Convert a WooCommerce export chunk by chunk in this process, yielding
+    the Shopify rows of each chunk instead of writing them.
+    
+    Concatenating the chunks gives the same rows as convert_woo_to_shopify.
+    Only the current chunk is held in memory.
+    
+    Args:
+        woo_input (str, DataFrame, file object, iterable or API source):
+            The WooCommerce export, see convert_woo_to_shopify
+        chunk_size (int, optional): Number of input rows per chunk (chunks
+            of an iterable input are used as they come)
+        rules_path (str, optional): Path to a product type rules file.
+            Defaults to DEFAULT_RULES_PATH.
+        diff_against (str, optional): Path to an existing Shopify product
+            export. Only rows that are added or changed compared to it are
+            yielded.
+        profiler (StageProfiler, optional): Records the stages of every chunk
+        engine (str, optional): CSV parser, see read_woo_csv
+        group_variants (bool, optional): Group the rows of each product, see
+            convert_woo_to_shopify
+        sku_index (SkuIndex, optional): Collects the SKU collisions resolved
+        number_report (NumberParseReport, optional): Collects the prices and
+            quantities that could not be parsed
+    
+    Yields:
+        DataFrame: Shopify rows with SHOPIFY_COLUMNS of each chunk, in input
+        order
+    """
+    profiler = profiler or _NO_PROFILER
+    sku_index = sku_index if sku_index is not None else SkuIndex()
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be a positive integer, got {chunk_size}")
+    rules = _input_rules(rules_path, woo_input)
+    export_index = load_export_index(diff_against) if diff_against else None
+    with profiler.stage('reserve skus'):
+        _reserve_source_skus(woo_input, sku_index, engine)
+    
+    woo_chunks = _iter_prepared_chunks(_read_woo_chunks(woo_input, chunk_size, engine), sku_index, profiler,
+                                       group_variants)
+    for woo_chunk in woo_chunks:
+        shopify_chunk = map_woo_to_shopify(woo_chunk, rules, profiler, group_variants, False, number_report)
+        if export_index is not None:
+            with profiler.stage('diff', len(shopify_chunk)):
+                shopify_chunk = filter_changed_rows(shopify_chunk, export_index, group_variants).reset_index(drop=True)
+        yield shopify_chunk
+
+
+def convert_woo_to_shopify(woo_csv_path, shopify_csv_path, chunk_size=None, rules_path=None, workers=1,
+                           diff_against=None, max_shard_bytes=None, max_shard_rows=None, profiler=None,
+                           engine=None, group_variants=False, sku_index=None, checkpoint_path=None,
+                           number_report=None, return_frame=True):
     """
     Convert a WooCommerce CSV file to Shopify CSV format.
     
+    Args:
+        woo_csv_path (str, DataFrame, file object, iterable or
+            API source): Path to the WooCommerce export: CSV (optionally
+            compressed), Parquet or Arrow IPC/Feather. The export can also
+            be passed in memory as a DataFrame, a file object with its CSV
+            text or an iterable of DataFrame chunks (see read_woo_input);
+            an iterable implies chunked streaming. An API source, such as
+            woo_api.WooCommerceApi, reads the products from the store
+            instead and implies chunked streaming.
+        shopify_csv_path (str, file object or None): Path to save the
+            converted Shopify CSV file. A .gz, .bz2, .xz or .zst extension
+            compresses the output. A (text or binary) file object is written
+            to and left open; with None nothing is written. Sharding and
+            checkpoints need a path. See iter_shopify_chunks to receive the
+            converted chunks instead.
+        chunk_size (int, optional): Stream the conversion in chunks of this
+            many rows so memory stays bounded regardless of the input size.
+            The output is byte-identical to a conversion without chunking.
+        rules_path (str, optional): Path to a product type rules file.
+            Defaults to DEFAULT_RULES_PATH.
+        workers (int, optional): Number of processes to convert chunks in.
+            Output rows keep the input order. Implies chunked streaming with
+            DEFAULT_WORKER_CHUNK_SIZE rows per chunk unless chunk_size is set.
+        diff_against (str, optional): Path to an existing Shopify product
+            export. Only rows that are added or changed compared to it are
+            written.
+        max_shard_bytes (int, optional): Split the output into numbered
+            shards of at most this many bytes (see ShardedCsvWriter). Implies
+            chunked streaming.
+        max_shard_rows (int, optional): Split the output into numbered
+            shards of at most this many rows. Implies chunked streaming.
+        profiler (StageProfiler, optional): Records wall time, rows and
+            memory delta of every stage of the conversion
+        engine (str, optional): CSV parser, 'pyarrow' or 'c' (see
+            read_woo_csv), or 'lite' to convert with the standard library
+            only (see convert_woo_to_shopify_lite)
+        group_variants (bool, optional): Write the rows sharing a handle as
+            one product with variant rows, plus image rows for every extra
+            image of its comma-separated additional_image_link values.
+            Chunked output matches whole-file output when the rows of each
+            product are adjacent in the input.
+        sku_index (SkuIndex, optional): Collects the SKU collisions resolved
+            during the conversion
+        checkpoint_path (str, optional): Make the conversion resumable. The
+            output is committed after every chunk and the progress recorded
+            in this manifest. If it holds the progress of an interrupted run
+            with the same input and settings, the conversion continues from
+            its last commit. The manifest is removed once the conversion
+            completes. Implies chunked streaming.
+        number_report (NumberParseReport, optional): Collects the prices and
+            quantities that could not be parsed in the number format of the
+            rules file
+        return_frame (bool, optional): Return the converted DataFrame of an
+            unchunked conversion. When False only its row count is returned,
+            so the caller does not keep a second copy of the data.
+    
+    Returns:
+        DataFrame: The converted (and written) Shopify data, or the number of
+        written rows (int) when the conversion is streamed in chunks, uses
+        the lite engine or return_frame is False.
+    """
+    profiler = profiler or _NO_PROFILER
+    sku_index = sku_index if sku_index is not None else SkuIndex()
+    api_input = _is_api_input(woo_csv_path)
+    path_input = _is_path(woo_csv_path)
+    path_output = _is_path(shopify_csv_path)
+    chunked_input = api_input or not (path_input or isinstance(woo_csv_path, pd.DataFrame)
+                                      or hasattr(woo_csv_path, 'read'))
+    sharded = max_shard_bytes is not None or max_shard_rows is not None
+    if engine == 'lite':
+        if chunk_size is not None or workers != 1 or diff_against or sharded or group_variants \
+                or checkpoint_path or not path_input or not path_output:
+            raise ValueError("The lite engine does not support chunking, workers, diffing, sharding, "
+                             "variant grouping, checkpoints or inputs and outputs other than files")
+        with profiler.stage('lite conversion') as info:
+            info['rows'] = convert_woo_to_shopify_lite(woo_csv_path, shopify_csv_path, rules_path, sku_index,
+                                                       number_report)
+        return info['rows']
+    if checkpoint_path and not (path_input and path_output):
+        raise ValueError("Checkpoints need a file input and output; the WooCommerce API, in-memory inputs "
+                         "and file objects cannot be resumed")
+    if sharded and not path_output:
+        raise ValueError("Sharding needs an output path")
+    
+    with profiler.stage('load rules'):
+        rules = _input_rules(rules_path, woo_csv_path)
+    export_index = None
+    if diff_against:
+        with profiler.stage('load export index') as info:
+            export_index = load_export_index(diff_against)
+            info['rows'] = len(export_index['rows'])
+    
+    if workers < 1:
+        raise ValueError(f"workers must be a positive integer, got {workers}")
+    if (workers > 1 or sharded or checkpoint_path or chunked_input) and chunk_size is None:
+        chunk_size = DEFAULT_WORKER_CHUNK_SIZE
+    
+    # Create output directory if it doesn't exist
+    if path_output:
+        os.makedirs(os.path.dirname(shopify_csv_path) or '.', exist_ok=True)
+    
+    if chunk_size is None:
+        with profiler.stage('read') as info:
+            woo_df = read_woo_input(woo_csv_path, engine=engine)
+            info['rows'] = len(woo_df)
+        shopify_df = map_woo_to_shopify(woo_df, rules, profiler, group_variants, sku_index, number_report)
+        del woo_df
+        if export_index is not None:
+            with profiler.stage('diff', len(shopify_df)):
+                shopify_df = filter_changed_rows(shopify_df, export_index, group_variants).reset_index(drop=True)
+        if shopify_csv_path is not None:
+            with profiler.stage('write', len(shopify_df)):
+                shopify_df.to_csv(shopify_csv_path, index=False)
+        return shopify_df if return_frame else len(shopify_df)
+    
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be a positive integer, got {chunk_size}")
+    
+    checkpoint = None
+    if checkpoint_path:
+        with profiler.stage('verify checkpoint'):
+            checkpoint = {
+                'version': CHECKPOINT_VERSION,
+                'input_sha256': _file_sha256(woo_csv_path),
+                'settings': _checkpoint_settings(shopify_csv_path, rules_path, diff_against, max_shard_bytes,
+                                                 max_shard_rows, group_variants),
+                'input_rows': 0,
+                'writer': None,
+            }
+            checkpoint = _load_checkpoint(checkpoint_path, checkpoint['input_sha256'],
+                                          checkpoint['settings']) or checkpoint
+    
+    # Append each mapped chunk in input order; the writer adds the header(s)
+    resume_state = checkpoint['writer'] if checkpoint else None
+    if path_output:
+        writer = ShardedCsvWriter(shopify_csv_path, max_shard_bytes, max_shard_rows, resume_state)
+    else:
+        writer = _SinkCsvWriter(shopify_csv_path)
+    with profiler.stage('reserve skus'):
+        _reserve_source_skus(woo_csv_path, sku_index, engine)
+    with writer:
+        woo_chunks = _iter_prepared_chunks(_read_woo_chunks(woo_csv_path, chunk_size, engine), sku_index, profiler,
+                                           group_variants, checkpoint['input_rows'] if checkpoint else 0)
+        chunk_rows = deque()
+        woo_chunks = _iter_counted(woo_chunks, chunk_rows)
+        for csv_text, handles in _iter_mapped_csv(woo_chunks, rules, workers, export_index, profiler,
+                                                  group_variants, number_report):
+            with profiler.stage('write', len(handles)):
+                writer.write(csv_text, handles)
+            input_rows = chunk_rows.popleft()
+            if checkpoint:
+                with profiler.stage('checkpoint'):
+                    checkpoint['writer'] = writer.commit()
+                    checkpoint['input_rows'] += input_rows
+                    _write_checkpoint(checkpoint_path, checkpoint)
+    
+    if checkpoint and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return writer.row_count
+
+
+class ValidationReport:
+    """
+    Problems found by validate_woo_input, counted per check, with the first
+    few kept as examples.
+    
+    Args:
+        max_examples (int): Number of problems kept as examples
+    """
+    
+    def __init__(self, max_examples=20):
+        self.max_examples = max_examples
+        self.rows = 0
+        self.problems = {}
+        self.examples = []
+    
+    def add(self, check, rows, details):
+        """
+        Record the rows that failed a check.
+        
+        Args:
+            check (str): Name of the check
+            rows (iterable): Number of each failed row (1 for the first row
+                after the header), or None for problems of the whole file
+            details (iterable): The offending value of each row
+        """
+        failed = [(None if row is None else int(row), check, detail) for row, detail in zip(rows, details)]
+        if not failed:
+            return
+        self.problems[check] = self.problems.get(check, 0) + len(failed)
+        self.examples.extend(failed[:self.max_examples - len(self.examples)])
+    
+    @property
+    def valid(self):
+        return not self.problems
+    
+    def summary(self):
+        """
+        Returns:
+            dict: Number of 'rows' read, whether the input is 'valid', the
+            number of 'problems' per check and (row, check, detail) 'examples'
+        """
+        return {'rows': self.rows, 'valid': self.valid, 'problems': dict(self.problems),
+                'examples': list(self.examples)}
+
+
+def _template_column_problems(template_path):
+    """
+    Differences between SHOPIFY_COLUMNS and the header of a Shopify template.
+    """
+    with _open_text_input(template_path) as f:
+        header = next(csv.reader(f), [])
+    problems = [f"'{column}' is missing from the output" for column in header if column not in SHOPIFY_COLUMNS]
+    problems += [f"'{column}' is not in the template" for column in SHOPIFY_COLUMNS if column not in header]
+    if not problems and header != SHOPIFY_COLUMNS:
+        problems.append("the output columns are in a different order than in the template")
+    return problems
+
+
+def validate_woo_input(woo_path, rules_path=None, chunk_size=DEFAULT_WORKER_CHUNK_SIZE, engine=None,
+                       group_variants=False, template_path=DEFAULT_TEMPLATE_PATH, max_examples=20):
+    """
+    Check whether a WooCommerce export will convert cleanly, without
+    converting it.
+    
+    The input is streamed in chunks and every check runs on whole columns:
+    
+    - 'missing column': a column of WOO_INPUT_COLUMNS is not in the input;
+      no rows are checked then
+    - 'template column': the output columns do not match the template
+    - 'empty handle', 'empty title': rows without them (with
+      group_variants only the first row of each product needs a title)
+    - 'duplicate handle': a handle used by an earlier row; with
+      group_variants only by an earlier, separate product, since rows
+      sharing a handle are its variants
+    - 'unparseable <column>': prices and quantities that cannot be parsed in
+      the number format of the rules file
+    - 'long title', 'long SEO title': longer than Shopify accepts
+    
+    Args:
+        woo_path (str): Path to the WooCommerce export, see read_woo_input
+        rules_path (str, optional): Path to a product type rules file, for
+            its number format. Defaults to DEFAULT_RULES_PATH.
+        chunk_size (int, optional): Number of rows per chunk
+        engine (str, optional): CSV engine, see read_woo_csv
+        group_variants (bool, optional): Validate for a conversion with
+            group_variants
+        template_path (str, optional): Shopify product CSV template whose
+            header the output columns must match
+        max_examples (int, optional): Number of problems kept as examples
+    
+    Returns:
+        ValidationReport: The problems found
+    """
+    report = ValidationReport(max_examples)
+    number_format = load_product_type_rules(rules_path)['number_format']
+    problems = _template_column_problems(template_path)
+    report.add('template column', [None] * len(problems), problems)
+    
+    seen_handles = set()
+    previous_handle = None
+    columns = None
+    for woo_chunk in read_woo_input(woo_path, chunk_size=chunk_size, engine=engine):
+        if columns is None:
+            columns = list(woo_chunk.columns)
+            missing = [column for column in WOO_INPUT_COLUMNS if column not in columns]
+            report.add('missing column', [None] * len(missing), missing)
+            # The conversion would fail on the first row, so there is nothing more to learn
+            if missing:
+                break
+        rows = np.arange(report.rows + 1, report.rows + len(woo_chunk) + 1)
+        report.rows += len(woo_chunk)
+        woo_chunk = woo_chunk.fillna('').reset_index(drop=True)
+        
+        handles = woo_chunk['handle']
+        empty = handles.str.strip() == ''
+        report.add('empty handle', rows[empty], handles[empty])
+        # Rows starting a product: every row, or with grouping each run of a handle
+        if group_variants:
+            starts = (handles != handles.shift(fill_value=previous_handle)) & ~empty
+        else:
+            starts = ~empty
+        product_handles = handles[starts]
+        # Set lookups keep the cost per row constant however many handles were seen
+        seen = np.fromiter(map(seen_handles.__contains__, product_handles), dtype=bool, count=len(product_handles))
+        duplicate = product_handles.duplicated() | seen
+        report.add('duplicate handle', rows[starts][duplicate], product_handles[duplicate])
+        seen_handles.update(product_handles)
+        if len(handles):
+            previous_handle = handles.iloc[-1]
+        
+        titles = woo_chunk['title']
+        empty = titles.str.strip() == ''
+        if group_variants:
+            empty &= starts
+        report.add('empty title', rows[empty], titles[empty])
+        lengths = titles.str.len()
+        too_long = lengths > SHOPIFY_TITLE_MAX_LENGTH
+        report.add('long title', rows[too_long], titles[too_long])
+        too_long = (lengths + len(SEO_TITLE_SUFFIX) > SHOPIFY_SEO_TITLE_MAX_LENGTH) & ~too_long
+        report.add('long SEO title', rows[too_long], titles[too_long])
+        
+        for column in ['Variant Price', 'inventory_quantity'] + list(WOO_PRICE_COLUMNS):
+            if column in woo_chunk:
+                values = woo_chunk[column]
+                failed = parse_numbers(values, number_format).isna() & (values != '')
+                report.add(f'unparseable {column}', rows[failed], values[failed])
+    
+    if columns is None:
+        # A file without rows has no chunks; its header is all there is to check
+        columns = list(read_woo_input(woo_path, engine=engine).columns)
+        missing = [column for column in WOO_INPUT_COLUMNS if column not in columns]
+        report.add('missing column', [None] * len(missing), missing)
+    return report
+
+
+def _incremental_cache_fingerprint(woo_columns, rules_path):
+    """
+    Fingerprint of everything besides the row content that affects the mapping.
+    """
+    digest = hashlib.sha256(f"{INCREMENTAL_CACHE_VERSION}\x1f{list(woo_columns)}".encode())
+    with open(rules_path or DEFAULT_RULES_PATH, 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _incremental_row_keys(woo_df):
+    """
+    Key each row by its handle and its position among rows sharing that handle,
+    so that the variant rows of a product get distinct keys.
+    """
+    handles = woo_df['handle'].fillna('')
+    return handles + '\x1f' + handles.groupby(handles, sort=False).cumcount().astype(str)
+
+
+def _open_incremental_cache(cache_path, fingerprint):
+    """
+    Open the SQLite cache of convert_incremental, emptying it when it was
+    built with another fingerprint. A file that is not such a cache, e.g.
+    one written by an older version, is replaced.
+    """
+    import sqlite3
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    cache = sqlite3.connect(cache_path)
+    try:
+        cache.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    except sqlite3.DatabaseError:
+        cache.close()
+        os.remove(cache_path)
+        cache = sqlite3.connect(cache_path)
+        cache.execute("CREATE TABLE settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    cache.execute("CREATE TABLE IF NOT EXISTS rows (key TEXT PRIMARY KEY, row_hash INTEGER NOT NULL, "
+                  "content_hash INTEGER, head BLOB NOT NULL, tail BLOB NOT NULL)")
+    stored = cache.execute("SELECT value FROM settings WHERE name = 'fingerprint'").fetchone()
+    if stored is None or stored[0] != fingerprint:
+        cache.execute("DELETE FROM rows")
+        cache.execute("INSERT OR REPLACE INTO settings VALUES ('fingerprint', ?)", (fingerprint,))
+    return cache
+
+
+def _csv_records(csv_text):
+    """
+    Split CSV text into the encoded bytes of each record, line terminator
+    included.
+    """
+    data = csv_text.encode('utf-8')
+    ends = _csv_record_ends(data).tolist()
+    return [data[start:end] for start, end in zip([0] + ends[:-1], ends)]
+
+
+def convert_incremental(woo_csv_path, shopify_csv_path, cache_path, rules_path=None, diff_against=None):
+    """
+    Convert a WooCommerce CSV file, reusing the rendered rows of earlier runs.
+    
+    The cache is an SQLite database holding, for every source row keyed on
+    its handle (see _incremental_row_keys), a hash of its content and its
+    rendered Shopify CSV line without the SKU. Only rows that are new or
+    whose content changed are mapped and rendered again; the lines of the
+    others are written as cached, and only the changed and deleted rows are
+    updated in the cache. SKUs can depend on earlier rows, so they are
+    assigned over the whole file on every run and written into the lines;
+    deleting a row therefore renumbers generated SKUs without invalidating
+    cached lines. It only invalidates the later rows sharing its handle,
+    whose keys shift. The cache is emptied when the input columns, the
+    rules file or the mapping version change.
+    
     Args:
         woo_csv_path (str): Path to the WooCommerce CSV file
         shopify_csv_path (str): Path to save the converted Shopify CSV file
+        cache_path (str): Path of the on-disk cache; created if missing
+        rules_path (str, optional): Path to a product type rules file.
+            Defaults to DEFAULT_RULES_PATH.
+        diff_against (str, optional): Path to an existing Shopify product
+            export. Only rows that are added or changed compared to it are
+            written; the cache still holds every row.
+    
+    Returns:
+        tuple: (number of rows written, dict with the number of 'reused' and
+        'converted' rows)
     """
-    # Load WooCommerce data
-    woo_df = pd.read_csv(woo_csv_path)
-    
-    # Handle NaN values in the input data to avoid issues
-    woo_df = woo_df.fillna('')
-    
-    # Create an empty Shopify dataframe with all required columns
-    shopify_columns = [
-        'Title', 'URL handle', 'Description', 'Vendor', 'Product category', 
-        'Type', 'Tags', 'Published on online store', 'Status', 'SKU', 
-        'Barcode', 'Option1 name', 'Option1 value', 'Option2 name', 
-        'Option2 value', 'Option3 name', 'Option3 value', 'Price', 
-        'Price / International', 'Compare-at price', 'Compare-at price / International', 
-        'Cost per item', 'Charge tax', 'Tax code', 'Inventory tracker', 
-        'Inventory quantity', 'Continue selling when out of stock', 
-        'Weight value (grams)', 'Weight unit for display', 'Requires shipping', 
-        'Fulfillment service', 'Product image URL', 'Image position', 
-        'Image alt text', 'Variant image URL', 'Gift card', 'SEO title', 
-        'SEO description', 'Google Shopping / Google product category', 
-        'Google Shopping / Gender', 'Google Shopping / Age group', 
-        'Google Shopping / MPN', 'Google Shopping / AdWords Grouping', 
-        'Google Shopping / AdWords labels', 'Google Shopping / Condition', 
-        'Google Shopping / Custom product', 'Google Shopping / Custom label 0', 
-        'Google Shopping / Custom label 1', 'Google Shopping / Custom label 2', 
-        'Google Shopping / Custom label 3', 'Google Shopping / Custom label 4'
-    ]
-    
-    # Initialize an empty dataframe with the correct number of rows
-    shopify_df = pd.DataFrame(index=range(len(woo_df)), columns=shopify_columns)
-    
-    # Set default values for required fields - ensuring string capitalization for booleans
-    shopify_df['Published on online store'] = 'TRUE'
-    shopify_df['Status'] = 'active'
-    shopify_df['Charge tax'] = 'TRUE'
-    shopify_df['Requires shipping'] = 'TRUE'
-    shopify_df['Continue selling when out of stock'] = 'deny'
-    shopify_df['Weight unit for display'] = 'g'
-    shopify_df['Fulfillment service'] = 'manual'
-    shopify_df['Image position'] = 1
-    shopify_df['Gift card'] = 'FALSE'
-    
-    # Map WooCommerce fields to Shopify fields
-    shopify_df['Title'] = woo_df['title']
-    shopify_df['URL handle'] = woo_df['handle']
-    shopify_df['Vendor'] = woo_df['vendor']
-    shopify_df['Type'] = woo_df['product_type']
-    
-    # Handle tags - ensure they're strings, not NaN
-    shopify_df['Tags'] = woo_df['tags']
-    
-    # Convert price from string to float, handle any formatting issues
-    shopify_df['Price'] = pd.to_numeric(woo_df['Variant Price'], errors='coerce')
-    
-    # Convert inventory quantity from string to integer, handle any formatting issues
-    shopify_df['Inventory quantity'] = pd.to_numeric(woo_df['inventory_quantity'], errors='coerce').fillna(0).astype(int)
-    
-    # Set product image URL
-    shopify_df['Product image URL'] = woo_df['additional_image_link']
-    
-    # Set a default weight based on product type
-    # You might want to adjust these values based on your products
-    def assign_weight(product_type):
-        product_type = str(product_type).lower()
-        if 'gaming' in product_type:
-            return 5000  # Gaming products are heavier
-        elif 'smart home' in product_type:
-            return 1000  # Smart home products medium weight
-        elif 'music' in product_type or 'hi-tech' in product_type:
-            return 500   # Smaller tech items
-        else:
-            return 1500  # Default weight
-    
-    shopify_df['Weight value (grams)'] = woo_df['product_type'].apply(assign_weight)
-    
-    # Generate SKUs based on handle if they don't exist
-    shopify_df['SKU'] = woo_df['handle'].apply(lambda x: f"{x.replace('-', '')[:10]}-sku")
-    
-    # Set SEO titles and descriptions based on product names
-    shopify_df['SEO title'] = woo_df['title'].apply(lambda x: f"{x} - Buy Online")
-    shopify_df['SEO description'] = woo_df['title'].apply(lambda x: f"Shop {x} at our store. Quality products with fast shipping and excellent customer service.")
-    
-    # Assign appropriate product category based on product type
-    def assign_category(product_type):
-        product_type = str(product_type).lower()
-        if 'gaming' in product_type:
-            return 'Electronics > Video Game Consoles & Accessories'
-        elif 'smart home' in product_type:
-            return 'Electronics > Smart Home Automation'
-        elif 'outdoor' in product_type:
-            return 'Sports & Outdoors > Outdoor Recreation'
-        elif 'music' in product_type:
-            return 'Electronics > Audio'
+    rules = load_product_type_rules(rules_path)
+    woo_df = read_woo_input(woo_csv_path)
+    fingerprint = _incremental_cache_fingerprint(woo_df.columns, rules_path)
+    keys = _incremental_row_keys(woo_df).tolist()
+    # Hashed before SKUs are assigned, so a row only counts as changed when its own content did
+    row_hashes = pd.util.hash_pandas_object(woo_df.fillna(''), index=False).to_numpy().view(np.int64).tolist()
+    woo_df[WOO_SKU_COLUMN] = assign_skus(woo_df, SkuIndex())
+    
+    export_index = load_export_index(diff_against) if diff_against else None
+    cache = _open_incremental_cache(cache_path, fingerprint)
+    try:
+        cached = {entry[0]: entry for entry in cache.execute("SELECT key, row_hash, content_hash, head, tail FROM rows")}
+        entries = [cached.get(key) for key in keys]
+        reuse = np.array([entry is not None and entry[1] == row_hash for entry, row_hash in zip(entries, row_hashes)],
+                         dtype=bool)
+        # Content hashes are only computed for diffs and kept when they cover
+        # every compared column; rows without a usable one are mapped again
+        keep_content_hashes = export_index is not None and export_index['columns'] == DIFF_COMPARED_COLUMNS
+        if export_index is not None:
+            reuse &= np.array([keep_content_hashes and entry is not None and entry[2] is not None
+                               for entry in entries], dtype=bool)
+        
+        # Only new and changed rows go through the mapping and rendering
+        changed = np.flatnonzero(~reuse)
+        converted_df = map_woo_to_shopify(woo_df.iloc[changed], rules, sku_index=False)
+        sku_at = SHOPIFY_COLUMNS.index('SKU')
+        line_end = len(os.linesep)
+        heads = [record[:-line_end] for record in
+                 _csv_records(converted_df[SHOPIFY_COLUMNS[:sku_at]].to_csv(index=False, header=False))]
+        tails = _csv_records(converted_df[SHOPIFY_COLUMNS[sku_at + 1:]].to_csv(index=False, header=False))
+        content_hashes = [None] * len(changed)
+        if export_index is not None:
+            content_hashes = _hash_shopify_rows(converted_df, export_index['columns']).view(np.int64).tolist()
+        updates = []
+        for position, head, tail, content_hash in zip(changed.tolist(), heads, tails, content_hashes):
+            entries[position] = (keys[position], row_hashes[position], content_hash, head, tail)
+            updates.append(entries[position] if keep_content_hashes else
+                           (keys[position], row_hashes[position], None, head, tail))
+        
+        written = np.ones(len(keys), dtype=bool)
+        if export_index is not None:
+            keys_df = pd.DataFrame({'URL handle': woo_df['handle'].fillna(''), 'SKU': woo_df[WOO_SKU_COLUMN]})
+            content_hashes = np.array([entry[2] for entry in entries], dtype=np.int64).view(np.uint64)
+            rows = pd.MultiIndex.from_arrays([_hash_shopify_rows(keys_df, export_index['key_columns']), content_hashes])
+            written = ~rows.isin(export_index['rows'])
+        
+        # SKU fields rendered the way pandas renders them in the full row
+        skus = _csv_records(woo_df[[WOO_SKU_COLUMN]].to_csv(index=False, header=False))
+        os.makedirs(os.path.dirname(shopify_csv_path) or '.', exist_ok=True)
+        with open_output(shopify_csv_path) as f:
+            f.write(pd.DataFrame(columns=SHOPIFY_COLUMNS).to_csv(index=False).encode('utf-8'))
+            for start in range(0, len(keys), DEFAULT_WORKER_CHUNK_SIZE):
+                f.write(b''.join(entries[row][3] + b',' + skus[row][:-line_end] + b',' + entries[row][4]
+                                 for row in range(start, min(start + DEFAULT_WORKER_CHUNK_SIZE, len(keys)))
+                                 if written[row]))
+        
+        # Update the cache in place once the output is written; the transaction
+        # leaves the old cache intact if the run is interrupted
+        cache.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?)", updates)
+        cache.executemany("DELETE FROM rows WHERE key = ?", [(key,) for key in cached.keys() - set(keys)])
+        cache.commit()
+    finally:
+        cache.close()
+    
+    stats = {'reused': int(reuse.sum()), 'converted': len(changed)}
+    return int(written.sum()), stats
+
+
+def find_batch_inputs(input_pattern):
+    """
+    Resolve a batch input to the list of WooCommerce exports to convert.
+    
+    Args:
+        input_pattern (str): A directory (all CSV, compressed CSV, Parquet and
+            Arrow files in it are used) or a glob pattern
+    
+    Returns:
+        list: Sorted input file paths
+    """
+    if os.path.isdir(input_pattern):
+        extensions = ('.csv',) + PARQUET_EXTENSIONS + ARROW_EXTENSIONS
+        return sorted(path for path in glob.glob(os.path.join(input_pattern, '*'))
+                      if os.path.isfile(path) and split_data_path(path)[1] in extensions)
+    return sorted(path for path in glob.glob(input_pattern) if os.path.isfile(path))
+
+
+def batch_output_path(woo_csv_path, output_dir, input_root=None):
+    """
+    Output path of one batch input: <output_dir>/<input name>_shopify.csv.
+    With input_root the input's directory below it is kept, as in
+    <output_dir>/<store>/<input name>_shopify.csv.
+    """
+    name = split_data_path(os.path.basename(woo_csv_path))[0]
+    if input_root is not None:
+        subdirectory = os.path.relpath(os.path.dirname(woo_csv_path), input_root)
+        output_dir = os.path.normpath(os.path.join(output_dir, subdirectory))
+    return os.path.join(output_dir, f"{name}_shopify.csv")
+
+
+def batch_output_paths(woo_csv_paths, output_dir):
+    """
+    Output path of every batch input (see batch_output_path). When inputs in
+    different directories share a name, e.g. exports/*/products.csv, each
+    output keeps the input's directory below their common directory so no
+    two inputs write the same file.
+    
+    Raises:
+        ValueError: If two inputs would still be written to the same file,
+            e.g. products.csv and products.csv.gz in one directory
+    """
+    def key(path):
+        return os.path.normcase(os.path.normpath(path))
+    
+    shopify_paths = [batch_output_path(path, output_dir) for path in woo_csv_paths]
+    if len(set(map(key, shopify_paths))) < len(shopify_paths):
+        input_root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in woo_csv_paths])
+        shopify_paths = [batch_output_path(os.path.abspath(path), output_dir, input_root) for path in woo_csv_paths]
+    
+    inputs = {}
+    for woo_path, shopify_path in zip(woo_csv_paths, shopify_paths):
+        other = inputs.setdefault(key(shopify_path), woo_path)
+        if other != woo_path:
+            raise ValueError(f"'{other}' and '{woo_path}' would both be converted to '{shopify_path}'; "
+                             "rename one of them")
+    return shopify_paths
+
+
+def _convert_batch_file(woo_csv_path, shopify_csv_path, convert_kwargs):
+    """
+    Convert one batch file and report its outcome instead of raising, so one
+    bad export does not abort the rest of the batch.
+    """
+    start = time.perf_counter()
+    try:
+        result = convert_woo_to_shopify(woo_csv_path, shopify_csv_path, **convert_kwargs)
+        rows, error = (result if isinstance(result, int) else len(result)), None
+    except Exception as e:
+        rows, error = 0, str(e)
+    return {
+        'input': woo_csv_path,
+        'output': shopify_csv_path,
+        'rows': rows,
+        'seconds': time.perf_counter() - start,
+        'error': error,
+    }
+
+
+def convert_batch(input_pattern, output_dir='csv/output', workers=1, **convert_kwargs):
+    """
+    Convert many WooCommerce CSV files in a single process.
+    
+    Args:
+        input_pattern (str): Directory or glob pattern of the input files
+        output_dir (str): Directory the converted files are written to
+        workers (int): Number of processes to convert files in. Each file is
+            converted by a single process.
+        **convert_kwargs: Extra arguments passed to convert_woo_to_shopify
+    
+    Returns:
+        list: One dict per input file with 'input', 'output', 'rows',
+        'seconds' and 'error' (None on success), in input order.
+    
+    Raises:
+        ValueError: If two inputs would be written to the same output file
+    """
+    woo_paths = find_batch_inputs(input_pattern)
+    jobs = list(zip(woo_paths, batch_output_paths(woo_paths, output_dir)))
+    
+    if workers <= 1 or len(jobs) <= 1:
+        return [_convert_batch_file(woo_path, shopify_path, convert_kwargs) for woo_path, shopify_path in jobs]
+    
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        futures = [executor.submit(_convert_batch_file, woo_path, shopify_path, convert_kwargs)
+                   for woo_path, shopify_path in jobs]
+        return [future.result() for future in futures]
+
+
+def print_batch_summary(results):
+    """
+    Print a per-file summary of a batch conversion.
+    """
+    width = max([len(result['input']) for result in results] + [len('File')])
+    print(f"{'File':<{width}}  {'Rows':>10}  {'Seconds':>8}  Status")
+    for result in results:
+        status = f"error: {result['error']}" if result['error'] else result['output']
+        print(f"{result['input']:<{width}}  {result['rows']:>10}  {result['seconds']:>8.2f}  {status}")
+    total_rows = sum(result['rows'] for result in results)
+    total_seconds = sum(result['seconds'] for result in results)
+    print(f"{'Total':<{width}}  {total_rows:>10}  {total_seconds:>8.2f}")
+
+
+def run_batch(args):
+    """
+    Execute a batch conversion from parsed command line arguments.
+    """
+    convert_kwargs = {
+        'chunk_size': args.chunk_size,
+        'rules_path': args.rules,
+        'diff_against': args.diff_against,
+        'max_shard_bytes': args.max_shard_bytes,
+        'max_shard_rows': args.max_shard_rows,
+        'engine': args.engine,
+        'group_variants': args.group_variants,
+    }
+    try:
+        results = convert_batch(args.batch, args.output_dir, workers=args.workers, **convert_kwargs)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    
+    if not results:
+        print(f"Error: No input files match '{args.batch}'")
+        return 1
+    
+    print_batch_summary(results)
+    return 1 if any(result['error'] for result in results) else 0
+
+
+def _convert_watched_file(woo_path, shopify_path, convert_kwargs):
+    """
+    Convert one watched file into a private directory next to its output and
+    move the finished file(s) into place, so readers of the output directory
+    never see a partial file.
+    """
+    output_dir = os.path.dirname(shopify_path) or '.'
+    temp_dir = tempfile.mkdtemp(prefix='.converting-', dir=output_dir)
+    try:
+        result = _convert_batch_file(woo_path, os.path.join(temp_dir, os.path.basename(shopify_path)), convert_kwargs)
+        result['output'] = shopify_path
+        if result['error'] is None:
+            # Shards are moved one by one, each of them complete
+            for name in sorted(os.listdir(temp_dir)):
+                os.replace(os.path.join(temp_dir, name), os.path.join(output_dir, name))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return result
+
+
+def _init_watch_worker(rules_path, ignore_interrupts=False):
+    # Ctrl+C is handled by the watching process, which lets running conversions finish
+    if ignore_interrupts:
+        import signal
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Import pandas and compile the rules before the first file arrives
+    pd.DataFrame()
+    load_product_type_rules(rules_path)
+
+
+def _converted_before(woo_path, shopify_path, input_mtime):
+    """
+    Whether an earlier run already wrote the output (or its shards) after the
+    input was last modified.
+    """
+    outputs = [shopify_path] if os.path.exists(shopify_path) else shard_paths(shopify_path)
+    return bool(outputs) and min(os.path.getmtime(path) for path in outputs) >= input_mtime
+
+
+def watch_directory(input_dir, output_dir='csv/output', workers=1, poll_interval=0.5, stop_event=None,
+                    on_result=None, **convert_kwargs):
+    """
+    Convert WooCommerce exports as they arrive in a directory, until
+    stop_event is set.
+    
+    The directory is polled for CSV, compressed CSV, Parquet and Arrow files
+    (see find_batch_inputs). A file is converted once its size and
+    modification time are the same in two consecutive polls, so files still
+    being written are left alone; it is converted again whenever it changes.
+    Files whose output is newer than the input were converted by an earlier
+    run and are skipped.
+    
+    Conversions run in long-lived workers that keep pandas and the rules
+    loaded: a thread for one worker, otherwise a process pool. At most two
+    files per worker are queued; further files wait for the next poll.
+    Every output is written to a temporary directory inside output_dir and
+    moved into place when complete. A conversion that raises, or whose
+    worker process dies, is reported as a failed result and watching goes
+    on, with a new process pool when the old one broke.
+    
+    Args:
+        input_dir (str): Directory to watch
+        output_dir (str): Directory the converted files are written to, see
+            batch_output_path. Must differ from input_dir.
+        workers (int): Number of files converted at the same time
+        poll_interval (float): Seconds between polls of the directory
+        stop_event (threading.Event, optional): Stops watching when set;
+            files being converted are finished first. Defaults to watching
+            until interrupted.
+        on_result (callable, optional): Called with the result of every
+            converted file, a dict like those of convert_batch
+        **convert_kwargs: Extra arguments passed to convert_woo_to_shopify
+    
+    Returns:
+        int: The number of files converted, including failed ones
+    """
+    import threading
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+    from concurrent.futures.process import BrokenProcessPool
+    if os.path.abspath(input_dir) == os.path.abspath(output_dir):
+        raise ValueError("The output directory must differ from the watched directory")
+    if workers < 1:
+        raise ValueError(f"workers must be a positive integer, got {workers}")
+    stop_event = stop_event or threading.Event()
+    os.makedirs(output_dir, exist_ok=True)
+    
+    rules_path = convert_kwargs.get('rules_path')
+    if workers == 1:
+        _init_watch_worker(rules_path)
+    
+    def start_executor():
+        if workers == 1:
+            return ThreadPoolExecutor(max_workers=1)
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_watch_worker, initargs=(rules_path, True))
+    
+    # Size and modification time of every file in the last poll, and of the
+    # version of each file that was converted
+    last_seen = {}
+    converted = {}
+    pending = {}
+    count = 0
+    
+    def report(future):
+        """
+        Pass the result of a finished conversion on, turning an exception it
+        raised into a failed result. Returns whether its process pool broke.
+        """
+        nonlocal count
+        woo_path, shopify_path, start = pending.pop(future)
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'input': woo_path, 'output': shopify_path, 'rows': 0,
+                      'seconds': time.perf_counter() - start, 'error': str(e) or type(e).__name__}
+            broken = isinstance(e, BrokenProcessPool)
         else:
-            return 'Electronics > Gadgets'
+            broken = False
+        count += 1
+        if on_result is not None:
+            on_result(result)
+        return broken
     
-    shopify_df['Product category'] = woo_df['product_type'].apply(assign_category)
-    shopify_df['Google Shopping / Google product category'] = shopify_df['Product category']
+    executor = start_executor()
+    try:
+        while not stop_event.is_set():
+            queued = {woo_path for woo_path, _, _ in pending.values()}
+            for woo_path in find_batch_inputs(input_dir):
+                if len(pending) >= 2 * workers:
+                    break
+                try:
+                    stat = os.stat(woo_path)
+                except FileNotFoundError:
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if converted.get(woo_path) == signature or woo_path in queued:
+                    continue
+                settled = last_seen.get(woo_path) == signature
+                last_seen[woo_path] = signature
+                if not settled:
+                    continue
+                shopify_path = batch_output_path(woo_path, output_dir)
+                converted[woo_path] = signature
+                if _converted_before(woo_path, shopify_path, stat.st_mtime):
+                    continue
+                future = executor.submit(_convert_watched_file, woo_path, shopify_path, convert_kwargs)
+                pending[future] = (woo_path, shopify_path, time.perf_counter())
+            
+            if not pending:
+                stop_event.wait(poll_interval)
+                continue
+            done, _ = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                broken |= report(future)
+            if broken:
+                # A dead worker fails every queued conversion of its pool, which accepts no more
+                for future in list(pending):
+                    report(future)
+                executor.shutdown()
+                executor = start_executor()
+        
+        for future in list(pending):
+            report(future)
+    finally:
+        executor.shutdown()
+    return count
+
+
+def run_watch(args):
+    """
+    Watch a directory from parsed command line arguments until interrupted,
+    printing a line per converted file.
+    """
+    convert_kwargs = {
+        'chunk_size': args.chunk_size,
+        'rules_path': args.rules,
+        'diff_against': args.diff_against,
+        'max_shard_bytes': args.max_shard_bytes,
+        'max_shard_rows': args.max_shard_rows,
+        'engine': args.engine,
+        'group_variants': args.group_variants,
+    }
     
-    # Set default Google Shopping values
-    shopify_df['Google Shopping / Gender'] = 'Unisex'
-    shopify_df['Google Shopping / Age group'] = 'Adult'
-    shopify_df['Google Shopping / Condition'] = 'new'
+    def report(result):
+        status = f"error: {result['error']}" if result['error'] else result['output']
+        print(f"{result['input']}  {result['rows']} rows  {result['seconds']:.2f}s  {status}", flush=True)
     
-    # Fill NaN values with empty strings to avoid errors in CSV
-    shopify_df = shopify_df.fillna('')
+    if args.verbose:
+        print(f"Watching '{args.watch}' for WooCommerce exports, writing to '{args.output_dir}' (Ctrl+C to stop)")
+    try:
+        watch_directory(args.watch, args.output_dir, workers=args.workers, poll_interval=args.poll_interval,
+                        on_result=report, **convert_kwargs)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run_validation(args):
+    """
+    Validate the input from parsed command line arguments and print a
+    compact report.
     
-    # Save to CSV - using string boolean representations
-    # Ensure boolean-like columns are saved as 'TRUE'/'FALSE' strings
-    for column in ['Published on online store', 'Charge tax', 'Requires shipping', 'Gift card']:
-        shopify_df[column] = shopify_df[column].apply(lambda x: 'TRUE' if str(x).lower() in ('true', 't', 'yes', 'y', '1') else 'FALSE')
+    Returns:
+        int: Exit code, 1 when a problem was found
+    """
+    start = time.perf_counter()
+    report = validate_woo_input(args.input, rules_path=args.rules,
+                                chunk_size=args.chunk_size or DEFAULT_WORKER_CHUNK_SIZE,
+                                engine=None if args.engine == 'lite' else args.engine,
+                                group_variants=args.group_variants)
+    seconds = time.perf_counter() - start
     
-    # Create output directory if it doesn't exist
-    os.makedirs(os.path.dirname(shopify_csv_path), exist_ok=True)
+    if report.valid:
+        print(f"Validated {report.rows} rows in {seconds:.2f}s: no problems found")
+    else:
+        print(f"Validated {report.rows} rows in {seconds:.2f}s: {sum(report.problems.values())} problems")
+        for check, count in report.problems.items():
+            print(f"  {check}: {count}")
+        print("Examples:")
+        for row, check, detail in report.examples[:10]:
+            print(f"  {'file' if row is None else f'row {row}'}: {check}: {detail!r}")
+    if args.validation_json:
+        with open(args.validation_json, 'w') as f:
+            json.dump(dict(report.summary(), seconds=seconds), f, indent=2)
+    return 0 if report.valid else 1
+
+
+def shard_paths(shopify_csv_path):
+    """
+    Paths of the numbered shards written by ShardedCsvWriter for a base path.
+    """
+    stem, extension, compression = split_data_path(shopify_csv_path)
+    return sorted(glob.glob(f"{glob.escape(stem)}_[0-9][0-9][0-9]{extension or '.csv'}{compression}"))
+
+
+def run_image_check(args):
+    """
+    Check the image URLs of the converted output(s) as requested on the
+    command line and print a summary.
+    """
+    from image_check import IMAGE_CACHE_TTL, ImageUrlValidator, validate_output_images
+    sharded = args.max_shard_bytes or args.max_shard_rows
+    paths = shard_paths(args.output) if sharded else [args.output]
+    cache_path = args.image_cache or os.path.join(os.path.dirname(args.output) or '.', 'image_url_cache.sqlite')
+    ttl = IMAGE_CACHE_TTL if args.image_cache_ttl is None else args.image_cache_ttl * 3600
+    validator = ImageUrlValidator(cache_path, ttl=ttl, concurrency=args.image_concurrency,
+                                  per_host=args.image_per_host)
+    if args.verbose:
+        print(f"Checking image URLs (cache: '{cache_path}')...")
+    stats = validate_output_images(paths, validator, drop_dead=args.drop_dead_images, report_path=args.image_report)
+    print(f"Checked {stats['urls']} image URLs in {stats['seconds']:.1f}s ({stats['urls_per_second']:.1f} URLs/s, "
+          f"{stats['cached']} from cache): {stats['dead']} dead, {stats['unreachable']} unreachable")
+    if args.drop_dead_images and stats['changed_rows']:
+        print(f"Removed dead images from {stats['changed_rows']} rows")
+    if args.image_report and (stats['dead'] or stats['unreachable']):
+        print(f"Dead and unreachable image URLs written to '{args.image_report}'")
+
+
+def run_output_stages(args):
+    """
+    Run the optional stages on the converted output: image checks, then the
+    upload to Shopify.
     
-    shopify_df.to_csv(shopify_csv_path, index=False)
+    Returns:
+        int: Exit code
+    """
+    if args.check_images or args.drop_dead_images:
+        run_image_check(args)
+    return run_upload(args) if args.upload_to else 0
+
+
+def run_upload(args):
+    """
+    Upload the converted output to the Shopify store given on the command
+    line and print the upload report.
     
-    return shopify_df
+    Returns:
+        int: Exit code, 1 if any product was rejected
+    """
+    from shopify_upload import ShopifyUploader
+    uploader = ShopifyUploader(args.upload_to, os.environ['SHOPIFY_ACCESS_TOKEN'],
+                               location_id=args.shopify_location, concurrency=args.upload_concurrency)
+    if args.verbose:
+        print(f"Uploading '{args.output}' to {args.upload_to}...")
+    report = uploader.upload(args.output, mode=args.upload_mode)
+    if report['bulk_error']:
+        print(f"Bulk operation unavailable ({report['bulk_error']}), uploaded product by product instead")
+    print(f"Uploaded {report['products']} products with {report['mode']} in {report['seconds']:.1f}s "
+          f"({report['products_per_second']:.1f} products/s, {report['requests']} requests)")
+    for handle, message in report['errors'][:10]:
+        print(f"  {handle}: {message}")
+    if report['errors']:
+        print(f"Warning: Shopify rejected {len(report['errors'])} products")
+        return 1
+    return 0
+
 
-def main():
+def main(argv=None):
     """
     Main function to handle command line arguments and execute the conversion.
+    
+    Args:
+        argv (list, optional): Command line arguments. Defaults to sys.argv.
     """
     parser = argparse.ArgumentParser(description='Convert WooCommerce CSV to Shopify CSV format')
     parser.add_argument('--input', '-i', default='csv/input/woo.csv',
-                        help='Path to the WooCommerce CSV file (default: csv/input/woo.csv)')
+                        help='Path to the WooCommerce CSV (optionally compressed), Parquet or Arrow file (default: csv/input/woo.csv)')
     parser.add_argument('--output', '-o', default='csv/output/shopify_output.csv', 
                         help='Path to save the converted Shopify CSV file (default: csv/output/shopify_output.csv)')
+    parser.add_argument('--woo-api', default=None,
+                        help='Read the products from the REST API of this WooCommerce store instead of --input; '
+                             'credentials are taken from WOO_CONSUMER_KEY and WOO_CONSUMER_SECRET')
+    parser.add_argument('--api-concurrency', type=int, default=8,
+                        help='Number of concurrent WooCommerce API requests (default: 8)')
+    parser.add_argument('--api-rate', type=float, default=None,
+                        help='Maximum number of WooCommerce API requests per second')
     parser.add_argument('--verbose', '-v', action='store_true', 
                         help='Print verbose output')
+    parser.add_argument('--engine', choices=['lite', 'pyarrow', 'c'], default=None,
+                        help='CSV parser; lite converts without pandas (default: lite for small CSV files, '
+                             'otherwise pyarrow when installed, otherwise c)')
+    parser.add_argument('--group-variants', action='store_true',
+                        help='Write rows sharing a handle as one product with variant rows, and extra images as image rows')
+    parser.add_argument('--rules', default=None,
+                        help='Path to a product type rules file (default: config/product_type_rules.json)')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='Stream the conversion in chunks of this many rows to bound memory use')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes to convert chunks in, or files in batch mode (default: 1)')
+    parser.add_argument('--max-shard-bytes', type=int, default=None,
+                        help='Split the output into numbered files of at most this many bytes, keeping products whole')
+    parser.add_argument('--max-shard-rows', type=int, default=None,
+                        help='Split the output into numbered files of at most this many rows, keeping products whole')
+    parser.add_argument('--diff-against', default=None,
+                        help='Only write rows that are added or changed compared to this Shopify product export')
+    parser.add_argument('--resume', action='store_true',
+                        help='Commit the output after every chunk and, if an earlier run was interrupted, '
+                             'continue where it stopped (progress is kept in <output>.checkpoint.json)')
+    parser.add_argument('--validate-only', action='store_true',
+                        help='Check whether the input will convert cleanly and report its problems, without writing output')
+    parser.add_argument('--validation-json', default=None,
+                        help='Write the --validate-only report as JSON to this path')
+    parser.add_argument('--cache', default=None,
+                        help='Incremental mode: reuse converted rows from this cache file and only convert new or changed rows')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print the time, rows and memory delta of each conversion stage')
+    parser.add_argument('--profile-json', default=None,
+                        help='Write the stage profile as JSON to this path (implies --profile)')
+    parser.add_argument('--profile-trace', default=None,
+                        help='Write the stage profile as a Chrome trace to this path (implies --profile)')
+    parser.add_argument('--check-images', action='store_true',
+                        help='Check that every image URL of the output can be fetched and report dead ones')
+    parser.add_argument('--drop-dead-images', action='store_true',
+                        help='Check image URLs (like --check-images) and remove dead ones from the output')
+    parser.add_argument('--image-report', default=None,
+                        help='Write the dead and unreachable image URLs to this CSV file')
+    parser.add_argument('--image-cache', default=None,
+                        help='SQLite cache of checked image URLs (default: image_url_cache.sqlite next to the output)')
+    parser.add_argument('--image-cache-ttl', type=float, default=None,
+                        help='Hours a cached image URL check stays valid (default: 168)')
+    parser.add_argument('--image-concurrency', type=int, default=64,
+                        help='Number of concurrent image URL checks (default: 64)')
+    parser.add_argument('--image-per-host', type=int, default=8,
+                        help='Number of concurrent image URL checks per host (default: 8)')
+    parser.add_argument('--upload-to', default=None,
+                        help='Upload the converted products to this Shopify store (e.g. my-store.myshopify.com); '
+                             'the Admin API token is taken from SHOPIFY_ACCESS_TOKEN')
+    parser.add_argument('--upload-mode', choices=['auto', 'bulk', 'mutations'], default='auto',
+                        help='Upload as one bulk operation, one mutation per product, or a bulk operation '
+                             'falling back to mutations (default: auto)')
+    parser.add_argument('--upload-concurrency', type=int, default=4,
+                        help='Number of concurrent product mutations when not uploading in bulk (default: 4)')
+    parser.add_argument('--shopify-location', default=None,
+                        help='Location ID (gid://shopify/Location/...) to set inventory quantities at when uploading')
+    parser.add_argument('--batch', default=None,
+                        help='Convert every CSV in this directory, or matching this glob pattern, in one run')
+    parser.add_argument('--watch', default=None,
+                        help='Keep running and convert every export that appears in this directory')
+    parser.add_argument('--poll-interval', type=float, default=0.5,
+                        help='Seconds between checks of the watched directory (default: 0.5)')
+    parser.add_argument('--output-dir', default='csv/output',
+                        help='Directory for batch and watch outputs (default: csv/output)')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
+    profile = bool(args.profile or args.profile_json or args.profile_trace)
+    multi_file = args.batch or args.watch
+    if args.batch and args.watch:
+        print("Error: --batch and --watch cannot be combined")
+        return 1
+    if profile and (args.cache or multi_file):
+        print("Error: --profile cannot be combined with --cache, --batch or --watch")
+        return 1
+    if args.resume and (args.cache or multi_file):
+        print("Error: --resume cannot be combined with --cache, --batch or --watch")
+        return 1
+    if (args.check_images or args.drop_dead_images) and multi_file:
+        print("Error: --check-images and --drop-dead-images cannot be combined with --batch or --watch")
+        return 1
+    if args.upload_to:
+        if multi_file or args.diff_against or args.max_shard_bytes or args.max_shard_rows:
+            print("Error: --upload-to cannot be combined with --batch, --watch, --diff-against or output sharding")
+            return 1
+        if not os.environ.get('SHOPIFY_ACCESS_TOKEN'):
+            print("Error: --upload-to needs the SHOPIFY_ACCESS_TOKEN environment variable")
+            return 1
+    if args.woo_api and (args.cache or multi_file or args.resume or args.engine == 'lite'):
+        print("Error: --woo-api cannot be combined with --cache, --batch, --watch, --resume or the lite engine")
+        return 1
+    if args.watch and args.cache:
+        print("Error: --watch cannot be combined with --cache")
+        return 1
+    if args.validate_only and (multi_file or args.woo_api or args.cache or args.resume or profile or args.upload_to):
+        print("Error: --validate-only cannot be combined with --batch, --watch, --woo-api, --cache, --resume, "
+              "--profile or --upload-to")
+        return 1
+    
+    if args.batch:
+        return run_batch(args)
+    if args.watch:
+        return run_watch(args)
+    
+    woo_input = args.input
+    if args.woo_api:
+        consumer_key = os.environ.get('WOO_CONSUMER_KEY')
+        consumer_secret = os.environ.get('WOO_CONSUMER_SECRET')
+        if not consumer_key or not consumer_secret:
+            print("Error: --woo-api needs the WOO_CONSUMER_KEY and WOO_CONSUMER_SECRET environment variables")
+            return 1
+        from woo_api import WooCommerceApi
+        try:
+            woo_input = WooCommerceApi(args.woo_api, consumer_key, consumer_secret,
+                                       concurrency=args.api_concurrency, requests_per_second=args.api_rate)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
     # Check if input file exists
-    if not os.path.exists(args.input):
+    elif not os.path.exists(args.input):
         print(f"Error: Input file '{args.input}' not found")
         return 1
     
+    if args.validate_only:
+        try:
+            return run_validation(args)
+        except Exception as e:
+            print(f"Error during validation: {str(e)}")
+            return 1
+    
+    if args.cache and (args.chunk_size or args.workers > 1 or args.max_shard_bytes or args.max_shard_rows
+                       or args.group_variants):
+        print("Error: --cache cannot be combined with --chunk-size, --workers, output sharding or --group-variants")
+        return 1
+    
     try:
         if args.verbose:
-            print(f"Converting '{args.input}' to Shopify format...")
+            print(f"Converting '{args.woo_api or args.input}' to Shopify format...")
+        
+        if args.cache:
+            _, stats = convert_incremental(args.input, args.output, args.cache, rules_path=args.rules,
+                                          diff_against=args.diff_against)
+            if args.verbose:
+                print(f"Conversion complete! Output saved to '{args.output}'")
+                print(f"Converted {stats['converted']} new or changed products, reused {stats['reused']} from cache")
+            return run_output_stages(args)
+        
+        # Small plain conversions skip pandas altogether
+        engine = args.engine
+        streamed = args.chunk_size or args.workers > 1 or args.max_shard_bytes or args.max_shard_rows \
+            or args.resume or args.woo_api
+        if engine is None and not (streamed or args.diff_against or profile or args.group_variants) \
+                and lite_engine_suitable(args.input, args.output):
+            engine = 'lite'
+        
+        checkpoint_path = None
+        if args.resume:
+            checkpoint_path = f"{args.output}.checkpoint.json"
+            if args.verbose and os.path.exists(checkpoint_path):
+                print(f"Resuming the interrupted conversion recorded in '{checkpoint_path}'")
         
         # Perform the conversion
-        result_df = convert_woo_to_shopify(args.input, args.output)
+        profiler = StageProfiler(enabled=profile)
+        sku_index = SkuIndex()
+        number_report = NumberParseReport()
+        result = convert_woo_to_shopify(woo_input, args.output, chunk_size=args.chunk_size,
+                                        rules_path=args.rules, workers=args.workers,
+                                        diff_against=args.diff_against,
+                                        max_shard_bytes=args.max_shard_bytes,
+                                        max_shard_rows=args.max_shard_rows,
+                                        profiler=profiler, engine=engine,
+                                        group_variants=args.group_variants, sku_index=sku_index,
+                                        checkpoint_path=checkpoint_path, number_report=number_report)
+        row_count = result if isinstance(result, int) else len(result)
+        
+        if profile:
+            profiler.print_summary()
+            if args.profile_json:
+                profiler.write_json(args.profile_json)
+            if args.profile_trace:
+                profiler.write_chrome_trace(args.profile_trace)
         
         if args.verbose:
             print(f"Conversion complete! Output saved to '{args.output}'")
-            print(f"Converted {len(result_df)} products")
+            if args.diff_against:
+                print(f"Wrote {row_count} added or changed products")
+            else:
+                print(f"Converted {row_count} products")
+            if sku_index.resolved:
+                print(f"Resolved {sku_index.resolved} SKU collisions by adding a numeric suffix, e.g.:")
+                for sku, resolved in sku_index.examples[:5]:
+                    if sku != resolved:
+                        print(f"  {sku} -> {resolved}")
+        if sku_index.duplicates:
+            print(f"Warning: {sku_index.duplicates} rows repeat a SKU given in the input; they were kept as is")
+        if number_report.failures:
+            columns = ', '.join(f"{column}: {count}" for column, count in number_report.failures.items())
+            print(f"Warning: {sum(number_report.failures.values())} prices and quantities could not be parsed "
+                  f"({columns}); prices were left empty and quantities set to 0, e.g.:")
+            for column, handle, value in number_report.examples[:5]:
+                print(f"  {handle}: {column} = {value!r}")
         
-        return 0
+        return run_output_stages(args)
     except Exception as e:
         print(f"Error during conversion: {str(e)}")
         return 1